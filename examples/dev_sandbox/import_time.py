@@ -0,0 +1,73 @@
+"""A cold-import benchmark of clearwater_modules.
+
+Every stage is timed in fresh interpreters (so nothing is cached in
+sys.modules), and the median over the repeats is printed in milliseconds:
+
+    package: import clearwater_modules
+    tsm_model / nsm1_model: import the model class (xarray, numba, processes)
+    tsm_catalogue / nsm1_catalogue: register the model variables, which is
+        deferred to the first model constructed (or catalogue access)
+
+Usage:
+    python import_time.py [repeats]
+"""
+import statistics
+import subprocess
+import sys
+import pandas as pd
+
+STAGES: dict[str, tuple[str, str]] = {
+    # name: (setup, timed statement)
+    'package': ('', 'import clearwater_modules'),
+    'tsm_model': ('', 'from clearwater_modules.tsm.model import EnergyBudget'),
+    'tsm_catalogue': (
+        'from clearwater_modules.tsm.model import EnergyBudget',
+        'EnergyBudget.get_variable_names()',
+    ),
+    'nsm1_model': ('', 'from clearwater_modules.nsm1.model import NutrientBudget'),
+    'nsm1_catalogue': (
+        'from clearwater_modules.nsm1.model import NutrientBudget',
+        'NutrientBudget.get_variable_names()',
+    ),
+}
+
+TEMPLATE: str = '''
+import time
+{setup}
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+'''
+
+
+def time_stage(setup: str, statement: str, repeats: int) -> list[float]:
+    """Return the times (in seconds) of a statement run in fresh interpreters."""
+    code: str = TEMPLATE.format(setup=setup, statement=statement)
+    return [
+        float(
+            subprocess.run(
+                [sys.executable, '-c', code],
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout.split()[-1]
+        )
+        for _ in range(repeats)
+    ]
+
+
+def main(repeats: int = 5) -> pd.DataFrame:
+    """Time every stage, returning the median and min times in milliseconds."""
+    rows: dict[str, dict[str, float]] = {}
+    for name, (setup, statement) in STAGES.items():
+        times: list[float] = time_stage(setup, statement, repeats)
+        rows[name] = {
+            'median_ms': statistics.median(times) * 1000,
+            'min_ms': min(times) * 1000,
+        }
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+if __name__ == '__main__':
+    repeats: int = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(main(repeats).round(2).to_string())
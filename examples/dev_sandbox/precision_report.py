@@ -0,0 +1,110 @@
+"""A precision-regression report of the float32 dtype mode against float64.
+
+Runs the TSM and NSM1 models on the same spatially varying 10x10 grid as the
+test suite with dtype=np.float64 and dtype=np.float32, and prints the maximum
+absolute and relative difference of every recorded variable. Only cells with a
+finite float64 value are compared (with the default parameters NSM1 diverges
+after a few timesteps), the others are counted as 'non_finite'.
+
+Usage:
+    python precision_report.py [time_steps] [engine]
+"""
+import sys
+import numpy as np
+import pandas as pd
+import xarray as xr
+import clearwater_modules
+
+NSM1_STATE_NAMES: list[str] = [
+    'Ap', 'Ab', 'NH4', 'NO3', 'OrgN', 'N2', 'TIP', 'OrgP',
+    'POC', 'DOC', 'DIC', 'POM', 'CBOD', 'DOX', 'PX', 'Alk',
+]
+
+
+def varying_array() -> xr.DataArray:
+    """Return a spatially varying 10x10 array in [1, 2)."""
+    rng = np.random.default_rng(seed=42)
+    return xr.DataArray(
+        1.0 + rng.random((10, 10)),
+        dims=['y', 'x'],
+        coords={'y': np.arange(10), 'x': np.arange(10)},
+    )
+
+
+def compare(
+    model_class: type[clearwater_modules.base.Model],
+    initial_state_values: dict[str, xr.DataArray],
+    time_steps: int,
+    engine: str,
+) -> pd.DataFrame:
+    """Run a model in float64 and float32 and compare the recorded variables."""
+    datasets: list[xr.Dataset] = []
+    for dtype in [np.float64, np.float32]:
+        model = model_class(
+            time_steps=time_steps,
+            initial_state_values=initial_state_values.copy(),
+            engine=engine,
+            dtype=dtype,
+        )
+        datasets.append(model.run())
+    reference, single = datasets
+
+    rows: list[dict] = []
+    for var_name in model.temporal_variables:
+        expected: np.ndarray = reference[var_name].values
+        actual: np.ndarray = single[var_name].values.astype(np.float64)
+        finite: np.ndarray = np.isfinite(expected)
+        error: np.ndarray = np.abs(actual[finite] - expected[finite])
+        scale: np.ndarray = np.abs(expected[finite])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative: np.ndarray = np.where(scale > 0, error / scale, 0.0)
+        rows.append({
+            'variable': var_name,
+            'max_abs_error': np.nanmax(error, initial=0.0),
+            'max_rel_error': np.nanmax(relative, initial=0.0),
+            'non_finite': int((~finite).sum()),
+            'bytes_float64': reference[var_name].nbytes,
+            'bytes_float32': single[var_name].nbytes,
+        })
+    return pd.DataFrame(rows).set_index('variable')
+
+
+def main(time_steps: int, engine: str) -> None:
+    array: xr.DataArray = varying_array()
+    reports: dict[str, pd.DataFrame] = {
+        'TSM': compare(
+            clearwater_modules.tsm.EnergyBudget,
+            {
+                'water_temp_c': array * 20.0,
+                'surface_area': array,
+                'volume': array * 100.0,
+            },
+            time_steps,
+            engine,
+        ),
+        'NSM1': compare(
+            clearwater_modules.nsm1.NutrientBudget,
+            {name: array for name in NSM1_STATE_NAMES},
+            time_steps,
+            engine,
+        ),
+    }
+    with pd.option_context(
+        'display.max_rows', None,
+        'display.max_columns', None,
+        'display.width', 200,
+    ):
+        for name, report in reports.items():
+            print(f'\n{name}: float32 vs float64 after {time_steps} timesteps ({engine})')
+            print(report.sort_values('max_rel_error', ascending=False).head(25))
+            print(
+                f'Worst relative error: {report["max_rel_error"].max():.3e}, '
+                f'history bytes: {report["bytes_float32"].sum()} / '
+                f'{report["bytes_float64"].sum()}'
+            )
+
+
+if __name__ == '__main__':
+    time_steps: int = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    engine: str = sys.argv[2] if len(sys.argv) > 2 else 'numpy'
+    main(time_steps, engine)
@@ -0,0 +1,57 @@
+"""Profiles the NSM1 processes at several grid sizes with Model.profiler.
+
+Unlike wrapping the whole run in cProfile (see cprofile_tsm.py), this
+records each variable's process separately, so it shows which kinetic
+functions dominate at a given grid size. For each grid size the slowest
+processes are printed, and a Chrome trace is written to
+profiling/nsm1_<gridsize>.json (open it in https://ui.perfetto.dev).
+
+Usage:
+    python profile_nsm1.py [engine] [steps]
+"""
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import xarray as xr
+from clearwater_modules.nsm1 import constants
+from clearwater_modules.nsm1.model import NutrientBudget
+
+GRIDSIZES: list[int] = [10, 100, 500]
+STATE_VARIABLES: list[str] = [
+    'Ap', 'Ab', 'NH4', 'NO3', 'OrgN', 'N2', 'TIP', 'OrgP',
+    'POC', 'DOC', 'DIC', 'POM', 'CBOD', 'DOX', 'PX', 'Alk',
+]
+
+
+def profile_nsm1(gridsize: int, engine: str, steps: int) -> NutrientBudget:
+    """Run NSM1 on a gridsize x gridsize grid with profiling on."""
+    rng = np.random.default_rng(seed=42)
+    initial_state_values: dict[str, xr.DataArray] = {
+        name: xr.DataArray(rng.random((gridsize, gridsize)) + 1.0, dims=['y', 'x'])
+        for name in STATE_VARIABLES
+    }
+    model = NutrientBudget(
+        time_steps=steps,
+        initial_state_values=initial_state_values,
+        global_parameters=dict(constants.DEFAULT_GLOBALPARAMETERS),
+        engine=engine,
+        profile=True,
+    )
+    with np.errstate(all='ignore'):
+        model.run()
+    model.close()
+    return model
+
+
+if __name__ == '__main__':
+    engine: str = sys.argv[1] if len(sys.argv) > 1 else 'numpy'
+    steps: int = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    root = Path(__file__).parent / 'profiling'
+    root.mkdir(exist_ok=True)
+    with pd.option_context('display.width', 120, 'display.max_columns', None):
+        for gridsize in GRIDSIZES:
+            model = profile_nsm1(gridsize, engine, steps)
+            print(f'\n{gridsize}x{gridsize} cells, {steps} steps ({engine})')
+            print(model.profiler.table().head(10))
+            model.profiler.write_trace(root / f'nsm1_{gridsize}.json')
@@ -1,4 +1,36 @@
+"""Clearwater water quality modules.
+
+Sub-modules are imported on first attribute access (e.g. clearwater_modules.tsm),
+so importing the package itself doesn't import xarray, numba or the models.
+"""
+import importlib
+
 __version__ = "0.2.0"
-from clearwater_modules import shared
-from clearwater_modules import tsm
-from clearwater_modules import nsm1
+
+_SUBMODULES: tuple[str, ...] = (
+    'base',
+    'benchmarks',
+    'checkpoint',
+    'chunked',
+    'execution',
+    'kernels',
+    'nsm1',
+    'output',
+    'parallel',
+    'profiling',
+    'shared',
+    'sorter',
+    'specialize',
+    'tsm',
+    'utils',
+)
+
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + list(_SUBMODULES))
@@ -1,18 +1,48 @@
 """Stored base types shared by all sub-modules."""
+import concurrent.futures
+import importlib
+import importlib.util
+import json
+from pathlib import Path
 import warnings
+import math
 import xarray as xr
 import numpy as np
+import pandas as pd
+import numpy.typing as npt
 import clearwater_modules.utils as utils
 import clearwater_modules.sorter as sorter
+import clearwater_modules.kernels as kernels
+import clearwater_modules.execution as execution
+import clearwater_modules.specialize as specialize
+import clearwater_modules.checkpoint as checkpoint
+import clearwater_modules.profiling as profiling
 from clearwater_modules.shared.types import (
+    AggregationTypes,
+    DependencyTypes,
+    EngineTypes,
     InitialVariablesDict,
+    MemoryFallbackTypes,
+    Process,
     Variable,
 )
 from typing import (
+    Any,
+    get_args,
     runtime_checkable,
     Protocol,
     Optional,
     Iterable,
+    Callable,
+)
+
+
+# the categories of Model.memory_report()
+MEMORY_CATEGORIES: tuple[str, ...] = (
+    'state_history',
+    'dynamic_history',
+    'statics',
+    'scratch',
 )
 
 
@@ -26,6 +56,10 @@ class CanRegisterVariable(Protocol):
 
 class Model(CanRegisterVariable):
     _variables: list[Variable] = []
+    # modules registering the variables of a model class, imported on first use
+    _variable_modules: tuple[str, ...] = ()
+    # incremented whenever variables are registered or unregistered
+    _variables_version: int = 0
 
     def __init__(
         self,
@@ -37,6 +71,23 @@ class Model(CanRegisterVariable):
         hotstart_dataset: Optional[xr.Dataset] = None,
         time_dim: Optional[str] = None,
         timestep: Optional[int] = 0,
+        engine: EngineTypes = 'xarray',
+        history_length: Optional[int] = None,
+        history_sink: Optional[Callable[[xr.Dataset], None]] = None,
+        output_interval: int = 1,
+        output_aggregation: Optional[list[AggregationTypes]] = None,
+        output_variables: Optional[list[str]] = None,
+        dtype: Optional[npt.DTypeLike] = None,
+        frozen_variables: Optional[list[str]] = None,
+        fold_constants: bool = False,
+        threads: Optional[int] = None,
+        chunks: Optional[dict[str, int]] = None,
+        ensemble_dim: Optional[str] = None,
+        history_dir: Optional[str | Path] = None,
+        kernel_cache: Optional[str | Path | kernels.KernelCache] = None,
+        profile: bool | profiling.ProcessProfiler = False,
+        max_memory: Optional[int] = None,
+        memory_fallback: MemoryFallbackTypes = 'raise',
     ) -> None:
         """Initialize the model, should be accessed by subclasses.
 
@@ -56,48 +107,306 @@ class Model(CanRegisterVariable):
                 This skips the initialization of the model dataset, and uses the
                 provided dataset instead after validating the presence of all static
                 and state variables.
+            timestep: The timestep of the initial record, i.e. of a restored
+                checkpoint. Model.time_dim is labelled from it, and records
+                are counted (with output_interval) from it. Defaults to 0.
             time_dim: The name of the time dimension. If not provided, defaults
                 to 'time_step'.
+            engine: The storage/compute engine used by increment_timestep().
+                'xarray' (default) slices and writes Model.dataset every timestep.
+                'numpy' binds NumPy views of the dataset arrays once, and computes
+                each timestep on plain arrays, writing results in place.
+                'numba' uses the 'numpy' engine storage, but compiles the
+                computation order into fused numba kernels (see kernels.py).
+                'dask' builds Model.dataset from dask arrays chunked along the
+                spatial dimensions, and computes the processes blockwise and
+                lazily (see chunked.py). Requires dask.
+            history_length: If provided, only the last history_length records
+                of the temporal variables are kept, in a ring buffer along
+                Model.time_dim. Requires the 'numpy' or 'numba' engine.
+            history_sink: An optional callable receiving a dataset of records
+                before they are evicted from the ring buffer (and on
+                Model.flush_history()). Requires history_length.
+                NOTE: the dataset wraps the ring buffer arrays, which are
+                overwritten afterwards. Write it out or copy it within the call.
+            output_interval: Record the temporal variables every output_interval
+                timesteps, Model.time_dim is labelled by the recorded timesteps.
+                Requires the 'numpy' or 'numba' engine.
+                NOTE: if time_steps is not a multiple of output_interval, the
+                timesteps after the last record (and their partial aggregation
+                window) are computed but never recorded, a warning is issued.
+            output_aggregation: A list of reductions ('mean', 'min', 'max',
+                'sum') accumulated over the timesteps since the last record,
+                stored as '{variable}_{reduction}' temporal variables.
+                Requires the 'numpy' or 'numba' engine.
+            output_variables: An optional list of state, updateable static and
+                dynamic variable names to record, overriding
+                track_dynamic_variables. Other dynamic variables are only
+                computed into scratch buffers. Other state variables are held in
+                Model.dataset without Model.time_dim, as their last recorded
+                value (this requires the 'numpy' or 'numba' engine).
+            dtype: An optional floating point dtype (e.g. np.float32) used to
+                store and compute all state, dynamic and float static variables.
+                Bool statics are stored as np.bool_ and integer option flags
+                ('*_option') as np.int8. By default, arrays are float64 and
+                statics keep the Python type of their value.
+            frozen_variables: An optional list of state variable names that are
+                not computed. They keep their initial values, unless updated
+                between timesteps, and processes only they depend on are skipped.
+            fold_constants: If True, bool static variables with a single value
+                (i.e. module switches) are folded into the process functions,
+                and processes that reduce to a constant are removed from the
+                computation order (see specialize.py).
+            threads: If provided, the 'numpy' and 'xarray' engines compute
+                independent processes (see ExecutionPlan.loop_levels)
+                concurrently on a pool of this many threads. This relies on
+                NumPy (and the nogil numba processes) releasing the GIL, so it
+                only pays off on large grids. Not supported with profile.
+            chunks: An optional dict of chunk sizes along the spatial
+                dimensions, used by the 'dask' engine. Defaults to dask's
+                'auto' chunks.
+            ensemble_dim: The name of the ensemble member dimension. If not
+                provided, defaults to 'member'. Initial state and static values
+                may be DataArrays with this dimension (i.e. one parameter value
+                per member), all initial states are then broadcast across the
+                members, and every member is computed in the same vectorized
+                timestep.
+            history_dir: An optional scratch directory. If provided, the arrays
+                of the temporal variables (i.e. the history, along
+                Model.time_dim) are memory mapped .npy files named by variable
+                in this directory, rather than held in memory. Model.dataset
+                wraps them without copying, so the OS pages out history as the
+                run advances, and the files can be opened with
+                np.load(path, mmap_mode='r') while or after the model runs.
+                Existing files of the same name are overwritten.
+            kernel_cache: An optional directory (or kernels.KernelCache) where
+                the 'numba' engine stores its fused layout and compiled
+                kernels, keyed by the model class, variables, 'use_*' switches,
+                dtype and engine. Later models of the same configuration (i.e.
+                ensemble members, restarts, other processes) load them instead
+                of compiling. Requires the 'numba' engine.
+            profile: If True (or a profiling.ProcessProfiler), every process
+                call is recorded in Model.profiler: wall time, calls, bytes
+                allocated and output NaN count, see profiling.py. With the
+                'numba' engine, processes are then called one at a time
+                rather than in fused kernels. Not supported by the 'dask'
+                engine, which computes lazily.
+            max_memory: An optional memory budget in bytes. The in-memory
+                footprint (history, grid statics and scratch buffers, see
+                Model.memory_report()) is projected before any array is
+                allocated, and if it exceeds the budget memory_fallback applies.
+                History memory mapped with history_dir doesn't count.
+            memory_fallback: What to do when max_memory is exceeded. 'raise'
+                (default) raises a MemoryError. 'stream' keeps only the records
+                that fit in a ring buffer (see history_length), pass a
+                history_sink to write out older records. 'decimate' increases
+                output_interval to the smallest divisor of time_steps for
+                which the records fit, so the last timestep is still recorded
+                (unless a single record fits). 'stream' and 'decimate' require
+                the 'numpy' or 'numba' engine.
         """
+        self._load_variables()
+        if engine not in get_args(EngineTypes):
+            raise ValueError(
+                f'Invalid engine: {engine}. Must be one of {get_args(EngineTypes)}.'
+            )
+        if output_aggregation is None:
+            output_aggregation = []
+        for stat in output_aggregation:
+            if stat not in get_args(AggregationTypes):
+                raise ValueError(
+                    f'Invalid aggregation: {stat}. Must be one of {get_args(AggregationTypes)}.'
+                )
+        if dtype is not None:
+            dtype = np.dtype(dtype)
+            if dtype.kind != 'f':
+                raise ValueError(
+                    f'dtype must be a floating point dtype, got {dtype}.'
+                )
+        self.dtype: Optional[np.dtype] = dtype
+        if output_interval < 1:
+            raise ValueError(
+                f'output_interval must be at least 1, got {output_interval}.'
+            )
+        if history_length is not None and history_length < 1:
+            raise ValueError(
+                f'history_length must be at least 1, got {history_length}.'
+            )
+        if history_sink is not None and history_length is None:
+            raise ValueError('history_sink requires history_length.')
+        if engine in ['xarray', 'dask'] and (
+            history_length is not None or output_interval != 1 or output_aggregation
+        ):
+            raise ValueError(
+                "history_length, output_interval and output_aggregation require "
+                "the 'numpy' or 'numba' engine."
+            )
+        if chunks is not None and engine != 'dask':
+            raise ValueError("chunks requires the 'dask' engine.")
+        if engine == 'dask' and importlib.util.find_spec('dask') is None:
+            raise ImportError("The 'dask' engine requires dask to be installed.")
+        if kernel_cache is not None and engine != 'numba':
+            raise ValueError("kernel_cache requires the 'numba' engine.")
+        if memory_fallback not in get_args(MemoryFallbackTypes):
+            raise ValueError(
+                f'Invalid memory_fallback: {memory_fallback}. '
+                f'Must be one of {get_args(MemoryFallbackTypes)}.'
+            )
+        if memory_fallback != 'raise' and engine not in ['numpy', 'numba']:
+            raise ValueError(
+                f"memory_fallback '{memory_fallback}' requires the 'numpy' or 'numba' engine."
+            )
+        if profile is not False and engine == 'dask':
+            raise ValueError("profile is not supported by the 'dask' engine.")
+        if history_dir is not None and engine == 'dask':
+            raise ValueError("history_dir is not supported by the 'dask' engine.")
+        if threads is not None and (
+            threads < 1 or engine not in ('numpy', 'xarray') or profile
+        ):
+            raise ValueError(
+                "threads must be at least 1, requires the 'numpy' or 'xarray' "
+                "engine, and is not supported with profile."
+            )
+        if frozen_variables is None:
+            frozen_variables = []
+        self.engine = engine
+        self.frozen_variables = list(frozen_variables)
+        self.fold_constants = fold_constants
+        self.folded_constants: dict[str, specialize.ConstantValue] = {}
+        self.history_length = history_length
+        self.history_sink = history_sink
+        self.output_interval = output_interval
+        self.output_aggregation = list(output_aggregation)
+        self._sunk_record: int = -1
+        self._window: Optional[tuple[int, xr.Dataset]] = None
+        self._aggregate_history: Optional[dict[tuple[str, str], np.ndarray]] = None
+        self._aggregates: Optional[dict[str, dict[str, np.ndarray]]] = None
+        self._window_steps: int = 0
+        self._buffers: Optional[dict[str, np.ndarray]] = None
+        self._history: Optional[dict[str, np.ndarray]] = None
+        self._current: Optional[dict[str, np.ndarray]] = None
+        self._fused_step: Optional[kernels.FusedStep] = None
+        if kernel_cache is not None and not isinstance(kernel_cache, kernels.KernelCache):
+            kernel_cache = kernels.KernelCache(kernel_cache)
+        self.kernel_cache: Optional[kernels.KernelCache] = kernel_cache
+        if profile is True:
+            profile = profiling.ProcessProfiler()
+        self.profiler: Optional[profiling.ProcessProfiler] = profile or None
+        self.threads = threads
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._active_mask: Optional[xr.DataArray] = None
+        self._active_index: Optional[np.ndarray] = None
+        self._compact_statics: Optional[dict[str, np.ndarray]] = None
+        self.chunks = chunks
+        self._chunked: Optional[dict[str, Any]] = None
+        self._records: Optional[dict[str, dict[int, Any]]] = None
+        self.history_dir: Optional[Path] = None
+        if history_dir is not None:
+            self.history_dir = Path(history_dir)
+            self.history_dir.mkdir(parents=True, exist_ok=True)
+        self._history_files: dict[str, np.memmap] = {}
+        self.__variables_version: int = self._variables_version
+        self.__plan_order: Optional[list[Variable]] = None
+        self.__execution_plan: Optional[execution.ExecutionPlan] = None
+        self.__step_order: list[Variable] = []
+        self.__process_args: list[tuple[str, Process, list[str]]] = []
+        self.__hoisted_args: list[tuple[str, Process, list[str]]] = []
+        self.__process_levels: list[list[tuple[str, Process, list[str]]]] = []
+        self._hoisted: Optional[dict[str, np.ndarray]] = None
+
         self.initial_state_values = initial_state_values
         self.static_variable_values = static_variable_values
         self.hotstart_dataset = hotstart_dataset
         self._track_dynamic_variables = track_dynamic_variables
-        self.timestep = timestep
+        self.timestep = timestep or 0
+        self._first_timestep: int = self.timestep
         self.time_steps = time_steps + 1  # xarray indexing
         self.temporal_variables: list = []
+        self.max_memory = max_memory
+        self.memory_fallback = memory_fallback
 
         if not time_dim:
             time_dim = 'time_step'
         self.time_dim = time_dim
+        if not ensemble_dim:
+            ensemble_dim = 'member'
+        self.ensemble_dim = ensemble_dim
 
         if not isinstance(updateable_static_variables, list):
             updateable_static_variables = []
         self.updateable_static_variables = updateable_static_variables
+        for var_name in self.frozen_variables:
+            if var_name not in self.state_variables_names:
+                raise ValueError(
+                    f'Variable {var_name} cannot be frozen, it must be a state variable.'
+                )
         self.__non_updateable_static_variables: list[str] | None = None
 
         # create list of temporal variables
-        if self._track_dynamic_variables:
+        self.output_variables = output_variables
+        if output_variables is not None:
+            recordable: list[str] = self.state_variables_names + \
+                    self.updateable_static_variables + self.dynamic_variables_names
+            for var_name in output_variables:
+                if var_name not in recordable:
+                    raise ValueError(
+                        f'Variable {var_name} cannot be recorded, it must be a '
+                        'state, updateable static or dynamic variable.'
+                    )
+            self.temporal_variables = [
+                var_name for var_name in recordable if var_name in output_variables
+            ]
+            if engine == 'xarray' and self._current_variables:
+                raise ValueError(
+                    "The 'xarray' engine must record all state variables, "
+                    f'missing {self._current_variables}.'
+                )
+        elif self._track_dynamic_variables:
             self.temporal_variables = self.state_variables_names + \
                     self.updateable_static_variables + self.dynamic_variables_names
         else:
             self.temporal_variables = self.state_variables_names + \
                     self.updateable_static_variables
 
+        if max_memory is not None and engine != 'dask':
+            history_length, output_interval = self._fit_memory(
+                history_length,
+                output_interval,
+            )
+            self.history_length = history_length
+            self.output_interval = output_interval
+
+        # number of records held along time_dim
+        n_slots: int = (self.time_steps - 1) // output_interval + 1
+        tail: int = (self.time_steps - 1) % output_interval
+        if tail:
+            warnings.warn(
+                f'time_steps={self.time_steps - 1} is not a multiple of '
+                f'output_interval={output_interval}, the last {tail} timesteps '
+                '(and their aggregation window) will not be recorded.'
+            )
+        if history_length is not None:
+            n_slots = min(history_length, n_slots)
+            self.history_length = n_slots
+        if engine == 'dask':
+            # only the initial record is held, the engine records lazily
+            n_slots = 1
+
         if isinstance(self.initial_state_values, dict) and isinstance(self.static_variable_values, dict):
             print('Initializing from dicts...')
             self.dataset: xr.Dataset = self._init_dataset_from_dicts(
                 initial_state_values=self.initial_state_values,
                 static_variable_values=self.static_variable_values,
                 updateable_static_variables=self.updateable_static_variables,
-                time_steps=self.time_steps,
+                time_steps=n_slots,
             )
 
         elif isinstance(hotstart_dataset, xr.Dataset):
             print('Initializing from hotstart dataset...')
             self.dataset: xr.Dataset = self._init_from_dataset(
                 hotstart_dataset,
-                time_steps,
+                time_steps if history_length is None and output_interval == 1
+                and engine != 'dask' else n_slots,
             )
             self.hotstart_dataset = None
 
@@ -106,7 +415,25 @@ class Model(CanRegisterVariable):
                 'Must provide either initial state and static values, or a hotstart dataset.'
             )
 
+        if (output_interval != 1 or self._first_timestep) and history_length is None:
+            self.dataset = self._dataset.assign_coords(
+                {
+                    self.time_dim: self._first_timestep
+                    + np.arange(self._dataset.sizes[self.time_dim]) * output_interval
+                }
+            )
+        if self.output_aggregation:
+            self.dataset = self._init_aggregate_arrays(self._dataset)
+        for var_name in self._current_variables:
+            if self.time_dim in self._dataset[var_name].dims:
+                self._dataset[var_name] = self._dataset[var_name].isel(
+                    {self.time_dim: 0},
+                    drop=True,
+                ).copy()
+
         self._sorted_variables: list[Variable] = []
+        if self.frozen_variables or self.fold_constants:
+            self._specialize()
 
     def _init_dataset_from_dicts(
         self,
@@ -142,6 +469,11 @@ class Model(CanRegisterVariable):
             else:
                 initial_state_values[static] = static_variable_values.pop(static)
 
+        initial_state_values = self._broadcast_members(
+            initial_state_values,
+            static_variable_values,
+        )
+
         # initialize the main model dataset
         dataset: xr.Dataset = self._init_state_arrays(
             initial_state_values,
@@ -152,61 +484,160 @@ class Model(CanRegisterVariable):
             static_variable_values,
             time_steps,
         )
-        if self._track_dynamic_variables:
-            dataset: xr.Dataset = self._init_dynamic_arrays(
-                dataset,
-            )
+        dataset: xr.Dataset = self._init_dynamic_arrays(
+            dataset,
+        )
 
         print('Model initialized from input dicts successfully!.')
         return dataset
 
+    def _broadcast_members(
+        self,
+        initial_state_values: InitialVariablesDict,
+        static_variable_values: InitialVariablesDict,
+    ) -> InitialVariablesDict:
+        """Broadcast the initial state values across the ensemble members.
+
+        The members are given by the DataArray values (initial or static) with
+        Model.ensemble_dim, and the dimension is added first to the DataArray
+        initial states without it. If no initial state is a DataArray, each is
+        set on a single cell ('x' and 'y' of size 1) per member.
+
+        Returns:
+            A dict of initial state values, the input if there are no members.
+        """
+        members: Optional[xr.DataArray] = None
+        for value in list(initial_state_values.values()) + list(static_variable_values.values()):
+            if not isinstance(value, xr.DataArray) or self.ensemble_dim not in value.dims:
+                continue
+            if members is None:
+                members = value[self.ensemble_dim]
+            elif value.sizes[self.ensemble_dim] != members.size:
+                raise ValueError(
+                    f'All values with dimension {self.ensemble_dim} must have '
+                    f'the same size, got {value.sizes[self.ensemble_dim]} and {members.size}.'
+                )
+        if members is None:
+            return initial_state_values
+
+        any_arrays: bool = any(
+            isinstance(value, xr.DataArray) for value in initial_state_values.values()
+        )
+        broadcast: InitialVariablesDict = {}
+        for var_name, value in initial_state_values.items():
+            if isinstance(value, xr.DataArray):
+                if self.ensemble_dim not in value.dims:
+                    value = value.expand_dims({self.ensemble_dim: members.values})
+                value = value.transpose(self.ensemble_dim, ...)
+            elif not any_arrays:
+                value = xr.DataArray(
+                    np.full((members.size, 1, 1), value),
+                    dims=(self.ensemble_dim, 'x', 'y'),
+                    coords={self.ensemble_dim: members.values, 'x': [1.0], 'y': [1.0]},
+                )
+            broadcast[var_name] = value
+        return broadcast
+
     def _init_from_dataset(
         self,
         hotstart_dataset: xr.Dataset,
         time_steps: int
     ) -> xr.Dataset:
-        """Initialize the model from a hotstart dataset."""
+        """Initialize the model from a hotstart dataset.
+
+        Only the history of the temporal variables is allocated, its first
+        record is the last timestep of the hotstart dataset (NaN for dynamic
+        variables it doesn't hold). Static variables are not copied.
+        """
         if self.time_dim not in hotstart_dataset.dims:
             raise ValueError(
                 f'Hotstart dataset must have a {self.time_dim} dimension.'
             )
-        else:
-            coords = {
-                key: value if key != self.time_dim
-                else np.arange(time_steps)
-                for key, value in hotstart_dataset.coords.items()
-            }
-
-            new_hotstart_dataset = xr.Dataset(
-                data_vars={
-                    var_name: (
-                        hotstart_dataset[var_name].dims,
-                        np.full(
-                            tuple(
-                                hotstart_dataset[var_name].sizes[dim]
-                                for dim in hotstart_dataset[var_name].dims
-                            ),
-                            np.nan
-                        )
-                    )
-                    for var_name, _ in hotstart_dataset.data_vars.items()
-                },
-                coords={
-                    **coords
-                }
+        # dimension coordinates first, so the dataset keeps the dimension order
+        names: list = [dim for dim in hotstart_dataset.dims if dim in hotstart_dataset.coords]
+        names += [name for name in hotstart_dataset.coords if name not in names]
+        coords = {
+            key: hotstart_dataset.coords[key] if key != self.time_dim
+            else np.arange(time_steps)
+            for key in names
+        }
+        data_vars: dict[str, xr.Variable] = {}
+
+        # set temporal variables to the last timestep of the hotstart dataset
+        template: xr.DataArray = hotstart_dataset[self.state_variables_names[0]]
+        for var_name in self.temporal_variables:
+            value: xr.DataArray = hotstart_dataset[var_name] \
+                if var_name in hotstart_dataset.data_vars else template
+            history: np.ndarray = self._empty_history(
+                var_name,
+                tuple(
+                    time_steps if dim == self.time_dim else value.sizes[dim]
+                    for dim in value.dims
+                ),
             )
-
-            # set temporal variables to the last timestep of the hotstart dataset
-            new_hotstart_dataset[self.temporal_variables].loc[
-                {self.time_dim: 0}
-            ] = hotstart_dataset[self.temporal_variables].isel(
-                {self.time_dim: -1}
+            if var_name in hotstart_dataset.data_vars:
+                np.moveaxis(history, value.dims.index(self.time_dim), 0)[0] = \
+                    value.isel({self.time_dim: -1}).values
+            data_vars[var_name] = xr.Variable(
+                value.dims,
+                history,
+                attrs=hotstart_dataset[var_name].attrs
+                if var_name in hotstart_dataset.data_vars else {},
             )
 
-            new_hotstart_dataset[self._non_updateable_static_variables] = hotstart_dataset[self._non_updateable_static_variables]
-
+        for var_name in self._non_updateable_static_variables:
+            data_vars[var_name] = hotstart_dataset[var_name].variable
+
+        # state variables that are not recorded only hold their last value
+        for var_name in self._current_variables:
+            value: xr.DataArray = hotstart_dataset[var_name]
+            if self.time_dim in value.dims:
+                value = value.isel({self.time_dim: -1}, drop=True)
+            data_vars[var_name] = value.variable.copy()
+
+        # a single merge, rather than one per variable
+        new_hotstart_dataset = xr.Dataset(
+            data_vars,
+            coords=coords,
+            attrs=dict(hotstart_dataset.attrs),
+        )
         return new_hotstart_dataset
 
+    def _empty_history(self, var_name: str, shape: tuple[int, ...]) -> np.ndarray:
+        """Return a NaN filled history array, memory mapped with Model.history_dir."""
+        if self.history_dir is None:
+            return np.full(shape, np.nan, dtype=self._float_dtype)
+        history: np.memmap = np.lib.format.open_memmap(
+            self.history_dir / f'{var_name}.npy',
+            mode='w+',
+            dtype=self._float_dtype,
+            shape=shape,
+        )
+        history.fill(np.nan)
+        self._history_files[var_name] = history
+        return history
+
+    @property
+    def _float_dtype(self) -> np.dtype:
+        """Return the dtype of state, dynamic and history arrays."""
+        if self.dtype is None:
+            return np.dtype(np.float64)
+        return self.dtype
+
+    def _static_dtype(
+        self,
+        var_name: str,
+        value: float | int | bool,
+    ) -> type | np.dtype:
+        """Return the dtype used to store a static variable value."""
+        if self.dtype is None:
+            return type(value)
+        if isinstance(value, (bool, np.bool_)):
+            return np.bool_
+        if isinstance(value, (int, np.integer)) and var_name.endswith('_option'):
+            return np.int8
+        return self.dtype
+
     def _init_state_arrays(
         self,
         initial_state_values: InitialVariablesDict,
@@ -236,9 +667,9 @@ class Model(CanRegisterVariable):
                 data_vars={
                     k: (
                         (self.time_dim,) + data_arrays[k].dims,
-                        np.full(
+                        self._empty_history(
+                            k,
                             (time_steps,) + tuple(data_arrays[k].sizes[dim] for dim in data_arrays[k].dims),
-                            np.nan
                         )
                     )
                     for k in data_arrays.keys()
@@ -249,14 +680,8 @@ class Model(CanRegisterVariable):
                 }
             )
         else:
+            # the arrays of scalar states are added below
             ds = xr.Dataset(
-                data_vars={
-                    k: (
-                        (self.time_dim, 'x', 'y'),
-                        np.full((time_steps, 1, 1), np.nan)
-                    )
-                    for k in match_dims
-                },
                 coords={
                     self.time_dim: np.arange(time_steps),
                     'x': [1.0],
@@ -274,9 +699,9 @@ class Model(CanRegisterVariable):
 
             if var_name not in data_arrays.keys():
                 ds[var_name] = xr.DataArray(
-                    np.full(
+                    self._empty_history(
+                        var_name,
                         tuple(ds.sizes[dim] for dim in ds.dims),
-                        np.nan
                     ),
                     dims=ds.dims
                 )
@@ -300,10 +725,13 @@ class Model(CanRegisterVariable):
         static_variable_values: InitialVariablesDict,
         time_steps: int,
     ) -> xr.Dataset:
-        """Broadcasts static variables to an existing dataset.
+        """Adds static variables to an existing dataset.
+
+        Spatially uniform values are stored as 0-d variables, only spatially
+        varying DataArray values are broadcast to the model grid.
 
         Args:
-            dataset: The dataset to broadcast to.
+            dataset: The dataset to add to.
             static_variable_values: A dictionary of static variable names and
                 values (either float/bool/int or a xarray.DataArray).
 
@@ -326,13 +754,22 @@ class Model(CanRegisterVariable):
                 'units': var.units,
                 'description': var.description,
             }
-            dataset[var.name] = xr.full_like(
-                dataset[
+            value = static_variable_values[var.name]
+            if isinstance(value, xr.DataArray) and value.ndim > 0:
+                # spatially varying values are broadcast to the model grid
+                template: xr.DataArray = dataset[
                     list(dataset.data_vars)[0]
-                ].isel({self.time_dim: 0}),
-                static_variable_values[var.name],
-                dtype=type(static_variable_values[var.name]),
-            )
+                ].isel({self.time_dim: 0}, drop=True)
+                dataset[var.name] = value.broadcast_like(template).transpose(
+                    *template.dims
+                ).astype(self._static_dtype(var.name, value.values.flat[0]))
+            else:
+                # uniform values are stored as 0-d, and broadcast by the processes
+                if isinstance(value, xr.DataArray):
+                    value = value.item()
+                dataset[var.name] = xr.DataArray(
+                    np.asarray(value, dtype=self._static_dtype(var.name, value)),
+                )
             dataset[var.name].attrs = attrs
         return dataset
 
@@ -340,17 +777,20 @@ class Model(CanRegisterVariable):
             self,
             dataset: xr.Dataset,
     ) -> xr.Dataset:
-        """Initialize dynamic variables."""
+        """Initialize the recorded dynamic variables."""
         k = self.state_variables_names[0]
+        dims = (self.time_dim,) + tuple(
+            dim for dim in dataset[k].dims if dim != self.time_dim
+        )
         for dynamic_variable in self.dynamic_variables_names:
+            if dynamic_variable not in self.temporal_variables:
+                continue
             dataset[dynamic_variable] = xr.DataArray(
-                np.full(
-                        tuple(
-                            dataset[k].sizes[dim]
-                            for dim in dataset[k].dims),
-                        np.nan
-                    ),
-                dims=dataset[k].dims
+                self._empty_history(
+                    dynamic_variable,
+                    tuple(dataset.sizes[dim] for dim in dims),
+                ),
+                dims=dims
             )
 
         for var in self.dynamic_variables:
@@ -363,9 +803,408 @@ class Model(CanRegisterVariable):
 
         return dataset
 
+    def _init_aggregate_arrays(
+            self,
+            dataset: xr.Dataset,
+    ) -> xr.Dataset:
+        """Initialize the aggregated temporal variables missing from a dataset.
+
+        The first record of each holds the initial value of its variable.
+        """
+        for var_name in self.temporal_variables:
+            for stat in self.output_aggregation:
+                name: str = f'{var_name}_{stat}'
+                if name in dataset.data_vars.keys():
+                    continue
+                dataset[name] = xr.DataArray(
+                    self._empty_history(name, dataset[var_name].shape),
+                    dims=dataset[var_name].dims,
+                )
+                dataset[name].loc[{self.time_dim: dataset[self.time_dim][0]}] = (
+                    dataset[var_name].isel({self.time_dim: 0})
+                )
+                dataset[name].attrs = {
+                    **dataset[var_name].attrs,
+                    'cell_methods': f'{self.time_dim}: {stat}',
+                }
+        return dataset
+
+    @property
+    def dataset(self) -> xr.Dataset:
+        """The model dataset.
+
+        NOTE: with the 'numpy' engine the dataset wraps the same arrays the engine
+        writes to, so it is always up to date without being rebuilt.
+
+        With history_length, this is a copy of the ring buffer in chronological
+        order, with Model.time_dim labelled by timestep. It is rebuilt at most
+        once per record, and writing to it does not change the model.
+
+        With the 'dask' engine, this is a lazy dataset of dask arrays, rebuilt
+        at most once per timestep. Nothing is computed until it is (i.e. with
+        Model.dataset.compute(), or Dataset.to_zarr()).
+        """
+        if self.engine == 'dask':
+            return self._chunked_dataset()
+        if self.history_length is None:
+            return self._dataset
+        last_record: int = self._elapsed_timesteps // self.output_interval
+        if self._window is None or self._window[0] != last_record:
+            records: np.ndarray = np.arange(
+                max(0, last_record - self.history_length + 1),
+                last_record + 1,
+            )
+            self._window = (
+                last_record,
+                self._dataset.isel(
+                    {self.time_dim: records % self.history_length}
+                ).assign_coords(
+                    {self.time_dim: self._first_timestep + records * self.output_interval}
+                ),
+            )
+        return self._window[1]
+
+    @dataset.setter
+    def dataset(self, value: xr.Dataset) -> None:
+        self._dataset = value
+        self._window = None
+        # any bound engine buffers now point at stale arrays
+        self._buffers = None
+        self._history = None
+        self._fused_step = None
+        self._hoisted = None
+        self._chunked = None
+        self._records = None
+        self._compact_statics = None
+
+    @property
+    def _elapsed_timesteps(self) -> int:
+        """Return the timesteps run since the initial record."""
+        return self.timestep - self._first_timestep
+
+    def _record_slot(self, record: int) -> int:
+        """Return the index along Model.time_dim holding a record.
+
+        Records are counted from the initial record, record i holds timestep
+        Model.timestep (at construction) + i * output_interval.
+        """
+        if self.history_length is None:
+            return record
+        return record % self.history_length
+
+    def _slot(self, timestep: int) -> int:
+        """Return the index along Model.time_dim holding a recorded timestep."""
+        return self._record_slot((timestep - self._first_timestep) // self.output_interval)
+
+    def _sink_history(self, last_record: int) -> None:
+        """Pass records not yet sunk up to last_record to Model.history_sink.
+
+        Records are sunk at least every time the ring buffer wraps, so the
+        pending records are always held in contiguous slots.
+        """
+        first_record: int = self._sunk_record + 1
+        if self.history_sink is None or first_record > last_record:
+            return
+        block: xr.Dataset = self._dataset.isel(
+            {
+                self.time_dim: slice(
+                    self._record_slot(first_record),
+                    self._record_slot(last_record) + 1,
+                )
+            }
+        ).assign_coords(
+            {
+                self.time_dim: self._first_timestep
+                + np.arange(first_record, last_record + 1) * self.output_interval
+            }
+        )
+        self.history_sink(block)
+        self._sunk_record = last_record
+
+    def flush_history(self) -> None:
+        """Pass all records not yet sunk to Model.history_sink.
+
+        Call this at the end of a run, so the last (partial) ring buffer of
+        records reaches the sink.
+        """
+        self._sink_history(self._elapsed_timesteps // self.output_interval)
+
+    def _grid_sizes(self) -> dict[str, int]:
+        """Return the sizes of the grid (and member) dimensions of the inputs.
+
+        Used to project the memory footprint before Model.dataset is allocated.
+        """
+        values: list[xr.DataArray] = []
+        if isinstance(self.initial_state_values, dict):
+            values = [
+                value for value in self.initial_state_values.values()
+                if isinstance(value, xr.DataArray)
+            ]
+            if isinstance(self.static_variable_values, dict):
+                values += [
+                    value for value in self.static_variable_values.values()
+                    if isinstance(value, xr.DataArray) and self.ensemble_dim in value.dims
+                ]
+        elif isinstance(self.hotstart_dataset, xr.Dataset):
+            values = [
+                self.hotstart_dataset[var_name] for var_name in self.state_variables_names
+                if var_name in self.hotstart_dataset.data_vars
+            ]
+        sizes: dict[str, int] = {}
+        for value in values:
+            sizes.update(
+                {dim: size for dim, size in value.sizes.items() if dim != self.time_dim}
+            )
+        return sizes
+
+    def _projected_memory(self, n_records: int) -> dict[str, int]:
+        """Return the projected in-memory bytes of each Model.memory_report() category.
+
+        Args:
+            n_records: The number of records held along Model.time_dim.
+        """
+        record: int = math.prod(self._grid_sizes().values()) * self._float_dtype.itemsize
+        history: int = 0
+        if self.history_dir is None:
+            history = n_records * record * (1 + len(self.output_aggregation))
+        n_states: int = len([
+            var_name for var_name in self.temporal_variables
+            if var_name not in self.dynamic_variables_names
+        ])
+        statics: int = 0
+        if isinstance(self.static_variable_values, dict):
+            # uniform values are stored as 0-d
+            statics = record * len([
+                value for value in self.static_variable_values.values()
+                if isinstance(value, xr.DataArray) and value.ndim > 0
+            ])
+        elif isinstance(self.hotstart_dataset, xr.Dataset):
+            statics = sum(
+                value.nbytes for value in self.hotstart_dataset.data_vars.values()
+                if self.time_dim not in value.dims
+            )
+        return {
+            'state_history': history * n_states + record * len(self._current_variables),
+            'dynamic_history': history * (len(self.temporal_variables) - n_states),
+            'statics': statics,
+            # a buffer per computed variable, and copies of the updateable statics
+            'scratch': record * (
+                len(self.computation_order) + len(self.updateable_static_variables)
+            ),
+        }
+
+    def _fit_memory(
+        self,
+        history_length: Optional[int],
+        output_interval: int,
+    ) -> tuple[Optional[int], int]:
+        """Apply Model.memory_fallback if the projected footprint exceeds Model.max_memory.
+
+        Returns:
+            The history_length and output_interval to initialize the model with.
+        """
+        n_records: int = (self.time_steps - 1) // output_interval + 1
+        if history_length is not None:
+            n_records = min(history_length, n_records)
+        projected: dict[str, int] = self._projected_memory(n_records)
+        total: int = sum(projected.values())
+        if total <= self.max_memory:
+            return history_length, output_interval
+
+        fixed: int = sum(self._projected_memory(0).values())
+        per_record: int = sum(self._projected_memory(1).values()) - fixed
+        fits: int = (self.max_memory - fixed) // per_record if per_record else 0
+        message: str = (
+            f'The projected memory footprint of {total:,} bytes '
+            f'({", ".join(f"{category}: {size:,}" for category, size in projected.items())}) '
+            f'exceeds max_memory={self.max_memory:,} bytes'
+        )
+        if self.memory_fallback == 'raise':
+            raise MemoryError(f'{message}.')
+        if fits < 1:
+            raise MemoryError(f'{message}, and not a single record fits.')
+        if self.memory_fallback == 'stream':
+            warnings.warn(
+                f'{message}, only the last {fits} records are kept (history_length={fits}).'
+            )
+            return fits, output_interval
+
+        # the smallest interval recording at most fits records, rounded up to
+        # a divisor of the timesteps so the last one is recorded (if fits > 1)
+        steps: int = self.time_steps - 1
+        interval: int = max(output_interval, steps // fits + 1)
+        interval = next(
+            (divisor for divisor in range(interval, steps + 1) if steps % divisor == 0),
+            interval,
+        )
+        warnings.warn(
+            f'{message}, recording every {interval} timesteps (output_interval={interval}).'
+        )
+        return history_length, interval
+
+    def memory_report(self) -> pd.DataFrame:
+        """Return the bytes held by the model, by category and variable.
+
+        Categories are:
+            state_history: State and updateable static records (and their
+                aggregates), or their last value if they aren't recorded.
+            dynamic_history: Recorded dynamic variables (and their aggregates).
+            statics: Non-updateable static variables and coordinates.
+            scratch: Engine buffers of the current timestep (states, process
+                results and running aggregates). Until the 'numpy'/'numba'
+                engine is bound (on the first timestep), and with the other
+                engines, they are projected as a grid array per computed
+                variable.
+
+        Returns:
+            A DataFrame indexed by (category, variable), with the bytes of each
+            array, whether they are in memory (history memory mapped with
+            Model.history_dir isn't), and whether they are projected. Sum
+            report['bytes'] by category for the totals.
+        """
+        aggregates: dict[str, str] = {
+            f'{var_name}_{stat}': var_name
+            for var_name in self.temporal_variables for stat in self.output_aggregation
+        }
+        rows: list[tuple[str, str, int, bool, bool]] = []
+        arrays: list[np.ndarray] = []
+        for name, variable in self._dataset.variables.items():
+            var_name: str = aggregates.get(name, name)
+            if var_name in self.dynamic_variables_names:
+                category: str = 'dynamic_history'
+            elif var_name in self.state_variables_names + self.updateable_static_variables:
+                category = 'state_history'
+            else:
+                category = 'statics'
+            rows.append((category, name, variable.nbytes, name not in self._history_files, False))
+            if isinstance(variable.data, np.ndarray):
+                arrays.append(variable.data)
+
+        if self._buffers is not None:
+            scratch: dict[str, np.ndarray] = dict(self._buffers)
+            for var_name, stats in self._aggregates.items():
+                for stat, value in stats.items():
+                    scratch[f'{var_name}_{stat}'] = value
+            for name, value in scratch.items():
+                value = np.asarray(value)
+                # i.e. static values, and states held without Model.time_dim
+                if any(np.may_share_memory(value, array) for array in arrays):
+                    continue
+                rows.append(('scratch', name, value.nbytes, True, False))
+        else:
+            dims: tuple[str, ...] = self._timestep_dims(self.state_variables_names[0])
+            record: int = math.prod(
+                self._dataset.sizes[dim] for dim in dims
+            ) * self._float_dtype.itemsize
+            for var_name in [var.name for var in self.computation_order] + \
+                    self.updateable_static_variables:
+                rows.append(('scratch', var_name, record, True, True))
+
+        rows.sort(key=lambda row: MEMORY_CATEGORIES.index(row[0]))
+        return pd.DataFrame(
+            rows,
+            columns=['category', 'variable', 'bytes', 'in_memory', 'projected'],
+        ).set_index(['category', 'variable'])
+
+    def _state_values(self) -> dict[str, xr.DataArray]:
+        """Return the state and updateable static values at the current timestep."""
+        values: dict[str, xr.DataArray] = {}
+        for var_name in self.state_variables_names + self.updateable_static_variables:
+            dims: tuple[str, ...] = self._timestep_dims(var_name)
+            if self._chunked is not None:
+                value: np.ndarray = np.asarray(self._chunked[var_name])
+            elif self._buffers is not None:
+                value = self._buffers[var_name]
+            elif self.time_dim not in self._dataset[var_name].dims:
+                value = self._dataset[var_name].values
+            else:
+                value = self._dataset[var_name].isel(
+                    {self.time_dim: self._slot(self.timestep)}
+                ).values
+            values[var_name] = xr.DataArray(value, dims=dims)
+        return values
+
+    def checkpoint(self, path: str | Path) -> Path:
+        """Write the current model state to a checkpoint directory.
+
+        Only the current timestep and the static values are written (see
+        checkpoint.py), so the cost doesn't depend on the history length.
+
+        Args:
+            path: The checkpoint directory, created if it doesn't exist.
+
+        Returns:
+            The checkpoint directory path.
+        """
+        return checkpoint.write_checkpoint(self, path)
+
+    @classmethod
+    def restore(
+        cls,
+        path: str | Path,
+        time_steps: int,
+        **kwargs,
+    ) -> 'Model':
+        """Restore a model from a checkpoint directory, see Model.checkpoint().
+
+        The model is hotstarted from the memory mapped checkpoint arrays, and
+        continues from the checkpointed timestep: Model.timestep and the
+        Model.time_dim labels carry on from it. Its first record holds the
+        checkpointed timestep. Aggregations are not checkpointed, with
+        output_aggregation a new window starts at the checkpointed timestep.
+
+        Args:
+            path: A directory written by Model.checkpoint().
+            time_steps: The number of timesteps, as for a hotstart dataset.
+            **kwargs: Other arguments of the model __init__ (i.e. engine).
+
+        Returns:
+            The restored model. Called on Model, an instance of the class
+            the checkpoint was written from.
+
+        Raises:
+            ValueError: If the checkpoint was written by a model class with
+                different registered variables.
+        """
+        manifest: dict[str, Any] = checkpoint.read_manifest(path)
+        model_class: type[Model] = cls
+        if cls is Model:
+            model_class = execution.import_process(manifest['model'])
+        if checkpoint.schema_hash(model_class) != manifest['schema_hash']:
+            raise ValueError(
+                f'Checkpoint {path} was written by {manifest["model"]}, with '
+                f'different variables than {checkpoint.model_path(model_class)}.'
+            )
+        kwargs.setdefault('time_dim', manifest['time_dim'])
+        kwargs.setdefault('timestep', manifest['timestep'])
+        kwargs.setdefault(
+            'updateable_static_variables',
+            manifest['updateable_static_variables'],
+        )
+        return model_class(
+            time_steps=time_steps,
+            hotstart_dataset=checkpoint.read_checkpoint(path, manifest),
+            **kwargs,
+        )
+
+    @classmethod
+    def _load_variables(cls) -> None:
+        """Import the modules of Model._variable_modules, once per class.
+
+        Registering the variables is deferred to the first use of the variable
+        catalogue (i.e. the first model constructed), rather than on import.
+        """
+        if cls.__dict__.get('_variables_loaded', False):
+            return
+        for module_name in cls._variable_modules:
+            importlib.import_module(module_name)
+        # only once every module is imported, so a failed import is retried
+        cls._variables_loaded = True
+
     @classmethod
     def get_variable_names(cls) -> list[str]:
         """Return a list of default variable names."""
+        cls._load_variables()
         return [var.name for var in cls._variables]
 
     @classmethod
@@ -374,28 +1213,61 @@ class Model(CanRegisterVariable):
         This can be used to inform the 'initial_state_values' argument
         pre-initialization.
         """
+        cls._load_variables()
         return [var for var in cls._variables if var.use == 'state']
 
     @classmethod
     def register_variable(cls, variable: Variable) -> None:
         """Register a variable with the model."""
-        if variable.name not in cls.get_variable_names():
+        # doesn't load Model._variable_modules, they call this while imported
+        if variable.name not in [var.name for var in cls._variables]:
+            cached: Optional[tuple] = cls.__dict__.get('_dependency_graph')
             cls._variables.append(variable)
+            # an existing graph is updated, otherwise it is built on first use
+            if cached is not None and cached[0] is cls._variables \
+                    and cached[1] == len(cls._variables) - 1:
+                cached[2].add_variable(variable)
+                cls._dependency_graph = (cls._variables, len(cls._variables), cached[2])
             cls._sorted_variables = []
+            cls._variables_version += 1
 
     @classmethod
     def unregister_variables(cls, variables: str | list[str]) -> None:
         """Unregister a variable with the model."""
         if isinstance(variables, str):
             variables = [variables]
+        graph: sorter.DependencyGraph = cls.dependency_graph()
+        for var in cls._variables:
+            if var.name in variables:
+                graph.remove_variable(var.name)
         cls._variables = [
             var for var in cls._variables if var.name not in variables
         ]
+        cls._dependency_graph = (cls._variables, len(cls._variables), graph)
         cls._sorted_variables = []
+        cls._variables_version += 1
+
+    @classmethod
+    def dependency_graph(cls) -> sorter.DependencyGraph:
+        """Return the dependency graph of the registered variables.
+
+        The graph is kept up to date by register_variable() and
+        unregister_variables(), instead of being rebuilt for every sort.
+        """
+        cls._load_variables()
+        cached: Optional[tuple] = cls.__dict__.get('_dependency_graph')
+        if cached is None or cached[0] is not cls._variables or cached[1] != len(cls._variables):
+            cls._dependency_graph = (
+                cls._variables,
+                len(cls._variables),
+                sorter.DependencyGraph(cls._variables),
+            )
+        return cls._dependency_graph[2]
 
     @classmethod
     def get_variable(cls, name: str) -> Variable:
         """Returns a variable dataclass by name"""
+        cls._load_variables()
         for var in cls._variables:
             if var.name == name:
                 return var
@@ -404,6 +1276,7 @@ class Model(CanRegisterVariable):
     @property
     def all_variables(self) -> list[Variable]:
         """Return a list of variables."""
+        self._load_variables()
         return self._variables
 
     @property
@@ -439,12 +1312,39 @@ class Model(CanRegisterVariable):
     @property
     def computation_order(self) -> list[Variable]:
         """Return a list of variables to compute in order (dynamic + state)."""
+        if self.__variables_version != self._variables_version:
+            self._sorted_variables = []
+            if self.frozen_variables or self.fold_constants:
+                self._specialize()
         if len(self._sorted_variables) == 0:
-            self._sorted_variables = sorter.sort_variables_for_computation(
-                sorter.split_variables(self.all_variables),
-            )
+            self._sorted_variables = self.dependency_graph().order()
+            self.__variables_version = self._variables_version
         return self._sorted_variables
 
+    def _specialize(self) -> None:
+        """Specialize the computation order for frozen variables and constants."""
+        constants: dict[str, bool] = {}
+        if self.fold_constants:
+            for var_name in self._non_updateable_static_variables:
+                values: np.ndarray = self._dataset[var_name].values
+                if values.dtype == np.bool_ and values.size > 0 and (
+                    values.all() or not values.any()
+                ):
+                    constants[var_name] = bool(values.flat[0])
+        specialized: specialize.SpecializedOrder = specialize.specialize_computation_order(
+            self.dependency_graph().order(),
+            constants=constants,
+            frozen=self.frozen_variables,
+            required=[
+                var_name for var_name in self.dynamic_variables_names
+                if var_name in self.temporal_variables
+            ],
+        )
+        self._sorted_variables = specialized.computation_order
+        self.folded_constants = specialized.constants
+        self.__variables_version = self._variables_version
+        self._hoisted = None
+
     @property
     def _update_vars(self) -> list[str]:
         """Return a list of variables to update."""
@@ -462,6 +1362,15 @@ class Model(CanRegisterVariable):
             ]
         return self.__non_updateable_static_variables
 
+    @property
+    def _current_variables(self) -> list[str]:
+        """Return state/updateable static variable names that are not recorded."""
+        return [
+            var_name
+            for var_name in self.state_variables_names + self.updateable_static_variables
+            if var_name not in self.temporal_variables
+        ]
+
     @property
     def track_dynamic_variables(self) -> bool:
         """Track dynamic variables property."""
@@ -473,38 +1382,855 @@ class Model(CanRegisterVariable):
             pass
         elif value:
             self._track_dynamic_variables = value
+            self.temporal_variables = self.temporal_variables + [
+                var_name for var_name in self.dynamic_variables_names
+                if var_name not in self.temporal_variables
+            ]
             self.dataset = self._init_dynamic_arrays(
-                self.dataset,
+                self._dataset,
+            )
+            if self.output_aggregation:
+                self.dataset = self._init_aggregate_arrays(self._dataset)
+            if self.frozen_variables or self.fold_constants:
+                self._specialize()
+
+    def _iter_hoisted_computations(self) -> None:
+        """Set the hoisted variables in Model.timestep_ds, computing them once."""
+        dims = self.timestep_ds.dims
+        compute: bool = self._hoisted is None
+        if compute:
+            self._hoisted = {}
+
+        for name, func, args in self._hoisted_args:
+            if compute:
+                self._hoisted[name] = self._cast_result(
+                    func(*[self.timestep_ds[arg].values for arg in args])
+                )
+            self.timestep_ds[name] = (
+                dims if np.ndim(self._hoisted[name]) else (),
+                self._hoisted[name],
             )
-            self.temporal_variables = self.temporal_variables + self.dynamic_variables_names
 
     def _iter_computations(self):
-        """Iterate over the computation order."""
-        inputs = map(
-            lambda x: utils._prep_inputs(
-                self.timestep_ds,
-                x),
-            self.computation_order
+        """Iterate over the computation order using the execution plan."""
+        plan: execution.ExecutionPlan = self.execution_plan
+        values: list = [None] * len(plan.slots)
+        for i in plan.loaded:
+            values[i] = self.timestep_ds[plan.slots[i]].values
+        plan.run(
+            values,
+            cast=lambda value: self._cast_result(utils.as_array(value)),
+            processes=[func for _, func, _ in self._process_args],
+            executor=self._executor,
         )
+
         dims = self.timestep_ds.dims
+        for step in plan.loop_steps:
+            self.timestep_ds[step.name] = (dims, values[step.output])
+
+    def _cast_result(self, value: np.ndarray) -> np.ndarray:
+        """Cast a floating point process result to Model.dtype.
+
+        Processes compiled with numba promote float32 arrays to float64 when
+        combined with Python floats, so results are cast back to keep later
+        processes in Model.dtype.
+        """
+        if self.dtype is None:
+            return value
+        value = np.asarray(value)
+        if value.dtype.kind == 'f' and value.dtype != self.dtype:
+            return value.astype(self.dtype)
+        return value
+
+    def _bind_buffers(self) -> None:
+        """Bind the NumPy arrays used by the 'numpy' engine.
+
+        History arrays are views of Model.dataset with the time axis first, the
+        current timestep values are held in a dict of arrays keyed by variable name.
+        """
+        self._history = {}
+        for var_name in self.temporal_variables:
+            data_array: xr.DataArray = self._dataset[var_name]
+            self._history[var_name] = np.moveaxis(
+                data_array.values,
+                data_array.dims.index(self.time_dim),
+                0,
+            )
+
+        self._buffers = {}
+        for var_name in self._non_updateable_static_variables:
+            self._buffers[var_name] = self._dataset[var_name].values
+        for var_name in self.state_variables_names + self.updateable_static_variables:
+            if var_name in self._history:
+                self._buffers[var_name] = self._history[var_name][
+                    self._slot(self.timestep)
+                ].copy()
+            else:
+                self._buffers[var_name] = self._dataset[var_name].values.copy()
+        self._current = {
+            var_name: self._dataset[var_name].values
+            for var_name in self._current_variables
+        }
+        self._compute_hoisted()
+
+        self._aggregate_history = {}
+        self._aggregates = {}
+        self._window_steps = 0
+        for var_name in self.temporal_variables:
+            self._aggregates[var_name] = {}
+            for stat in self.output_aggregation:
+                self._aggregate_history[(var_name, stat)] = np.moveaxis(
+                    self._dataset[f'{var_name}_{stat}'].values,
+                    self._dataset[var_name].dims.index(self.time_dim),
+                    0,
+                )
+                self._aggregates[var_name][stat] = np.empty(
+                    self._history[var_name].shape[1:],
+                    dtype=self.dtype,
+                )
+
+        if self.engine == 'numba' and self.profiler is None:
+            self._fused_step = self._build_fused_step()
+        self._start_executor()
+
+    def _start_executor(self) -> None:
+        """Start the thread pool used with Model.threads, if not running."""
+        if self.threads is not None and self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.threads,
+                thread_name_prefix='clearwater',
+            )
+
+    def _build_fused_step(self) -> kernels.FusedStep:
+        """Compile the computation order into fused numba kernels.
+
+        A timestep is computed on a copy of the buffers to get example values
+        (dtypes/shapes) for every variable, the results are discarded.
+        """
+        values: dict[str, np.ndarray] = dict(self._buffers)
+        for name, func, args in self._process_args:
+            values[name] = self._cast_result(func(*[values[arg] for arg in args]))
+        cache_key: str = ''
+        if self.kernel_cache is not None:
+            cache_key = json.dumps(
+                [
+                    checkpoint.model_path(type(self)),
+                    checkpoint.schema_hash(type(self)),
+                    {
+                        name: bool(value) for name, value in self._buffers.items()
+                        if name.startswith('use_') and np.ndim(value) == 0
+                    },
+                    sorted(self.folded_constants.items()),
+                    str(self._float_dtype),
+                    self.engine,
+                ],
+                default=str,
+            )
+        return kernels.FusedStep(
+            self._step_order,
+            values,
+            keep=self.state_variables_names + list(self._history.keys()),
+            cache=self.kernel_cache,
+            cache_key=cache_key,
+            dtype=self.dtype,
+        )
+
+    def _iter_array_computations(self) -> None:
+        """Iterate over the computation order using the bound NumPy buffers."""
+        buffers: dict[str, np.ndarray] = self._buffers
+        if self._active_index is not None:
+            self._iter_masked_computations()
+            return
+        if self._fused_step is not None:
+            self._fused_step(buffers)
+            return
+        if self._executor is not None:
+            self._iter_parallel_computations()
+            return
+        if self.dtype is None:
+            for name, func, args in self._process_args:
+                buffers[name] = func(*[buffers[arg] for arg in args])
+            return
+        for name, func, args in self._process_args:
+            buffers[name] = self._cast_result(func(*[buffers[arg] for arg in args]))
+
+    def _iter_parallel_computations(self) -> None:
+        """Compute each level of independent processes concurrently."""
+        buffers: dict[str, np.ndarray] = self._buffers
+        for level in self._process_levels:
+            if len(level) == 1:
+                name, func, args = level[0]
+                buffers[name] = self._cast_result(func(*[buffers[arg] for arg in args]))
+                continue
+            futures: list[tuple[str, concurrent.futures.Future]] = [
+                (name, self._executor.submit(func, *[buffers[arg] for arg in args]))
+                for name, func, args in level
+            ]
+            for name, future in futures:
+                buffers[name] = self._cast_result(future.result())
+
+    @property
+    def active_mask(self) -> Optional[xr.DataArray]:
+        """The cells computed every timestep, None if all cells are active.
+
+        Set it to a bool DataArray with the dimensions of the state variables
+        (i.e. wet cells), or None to compute all cells again. Processes are
+        then only computed on the active cells, gathered into dense arrays,
+        and the results are scattered back: inactive cells hold their state,
+        and their dynamic variables are NaN. Requires the 'numpy' or 'numba'
+        engine ('numba' computes masked timesteps without fused kernels).
+        """
+        return self._active_mask
+
+    @active_mask.setter
+    def active_mask(self, value: Optional[xr.DataArray]) -> None:
+        if value is None:
+            self._active_mask = None
+            self._active_index = None
+            self._compact_statics = None
+            return
+        if self.engine not in ['numpy', 'numba']:
+            raise ValueError(
+                "active_mask requires the 'numpy' or 'numba' engine."
+            )
+        dims: tuple[str, ...] = self._timestep_dims(self.state_variables_names[0])
+        utils.validate_dims(value, dims)
+        shape: tuple[int, ...] = tuple(self._dataset.sizes[dim] for dim in dims)
+        if value.shape != shape:
+            raise ValueError(
+                f'active_mask must have shape {shape}, got {value.shape}.'
+            )
+        mask: np.ndarray = np.asarray(value.values, dtype=bool)
+        index: Optional[np.ndarray] = None if mask.all() else np.flatnonzero(mask)
+        if index is None or self._active_index is None or \
+                not np.array_equal(index, self._active_index):
+            self._compact_statics = None
+        self._active_mask = value
+        self._active_index = index
+
+    def _gather(self, value: np.ndarray) -> np.ndarray:
+        """Return the values of the active cells, 0-d values are returned as is."""
+        if np.ndim(value) == 0:
+            return value
+        return np.reshape(value, -1)[self._active_index]
+
+    def _iter_masked_computations(self) -> None:
+        """Compute the processes on the active cells only, see Model.active_mask."""
+        buffers: dict[str, np.ndarray] = self._buffers
+        if self._compact_statics is None:
+            self._compact_statics = {
+                name: self._gather(buffers[name])
+                for name in self._non_updateable_static_variables + [
+                    name for name, _, _ in self._hoisted_args
+                ]
+            }
+        compact: dict[str, np.ndarray] = dict(self._compact_statics)
+        for var_name in self.state_variables_names + self.updateable_static_variables:
+            compact[var_name] = self._gather(buffers[var_name])
+        for name, func, args in self._process_args:
+            compact[name] = self._cast_result(func(*[compact[arg] for arg in args]))
+
+        # scatter the states and recorded dynamic variables back to the grid
+        for name, _, _ in self._process_args:
+            if name in self.state_variables_names:
+                value: np.ndarray = buffers[name].copy()
+            elif name in self._history:
+                value: np.ndarray = np.full(
+                    buffers[self.state_variables_names[0]].shape,
+                    np.nan,
+                    dtype=self._float_dtype,
+                )
+            else:
+                continue
+            value.reshape(-1)[self._active_index] = compact[name]
+            buffers[name] = value
+
+    def close(self) -> None:
+        """Shut down the thread pool used with Model.threads, if any.
+
+        With Model.history_dir, also flushes the memory mapped history to disk.
+        With Model.profiler, stops tracemalloc if the profiler started it.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for history in self._history_files.values():
+            history.flush()
+        if self.profiler is not None:
+            self.profiler.stop()
+
+    def __getstate__(self) -> dict:
+        """Return the model state to pickle (i.e. to send it to another process).
+
+        Engine buffers and compiled plans are dropped, they are rebuilt on
+        first use. The computation order is re-specialized on
+        unpickling, as specialized processes can't be pickled.
+        """
+        state: dict = self.__dict__.copy()
+        state.update(
+            _executor=None,
+            _fused_step=None,
+            _buffers=None,
+            _history=None,
+            _current=None,
+            _aggregate_history=None,
+            _aggregates=None,
+            _window=None,
+            _hoisted=None,
+            _history_files={},
+            _sorted_variables=[],
+            _Model__plan_order=None,
+            _Model__execution_plan=None,
+            _Model__step_order=[],
+            _Model__process_args=[],
+            _Model__hoisted_args=[],
+            _Model__process_levels=[],
+        )
+        state.pop('timestep_ds', None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if self.frozen_variables or self.fold_constants:
+            self._specialize()
+
+    @property
+    def _forcing_variables(self) -> list[str]:
+        """Return the inputs that only change when updated between timesteps."""
+        return self.updateable_static_variables + self.frozen_variables
+
+    @property
+    def execution_plan(self) -> execution.ExecutionPlan:
+        """Return the computation order compiled to integer slots.
+
+        The plan is built once per model, and rebuilt if the computation order
+        changes (i.e. variables are registered or unregistered).
+
+        Static-only variables (see sorter.classify_variables()) are hoisted out
+        of the timestep loop, they are computed once when the engine is bound
+        (again if Model.dataset is replaced). Forcing-dependent variables stay
+        in the loop, as forcing is usually updated every timestep.
+        """
+        self._compile_plan()
+        return self.__execution_plan
+
+    def _compile_plan(self) -> None:
+        """Build the execution plan if the computation order changed."""
+        if self.__plan_order is not self.computation_order:
+            self.__plan_order = self.computation_order
+            classes: dict[str, DependencyTypes] = sorter.classify_variables(
+                self.__plan_order,
+                self._forcing_variables,
+            )
+            plan = execution.ExecutionPlan.build(
+                self.__plan_order,
+                hoisted=[name for name, kind in classes.items() if kind == 'static'],
+            )
+            variables: dict[str, Variable] = {
+                var.name: var for var in self.__plan_order
+            }
+            self.__step_order = [variables[step.name] for step in plan.loop_steps]
+            processes: dict[str, Process] = {
+                step.name: step.process for step in plan.steps
+            }
+            if self.profiler is not None:
+                processes = {
+                    name: self.profiler.wrap(name, process)
+                    for name, process in processes.items()
+                }
+            self.__process_args = [
+                (step.name, processes[step.name], plan.args(step))
+                for step in plan.loop_steps
+            ]
+            self.__hoisted_args = [
+                (step.name, processes[step.name], plan.args(step))
+                for step in plan.hoisted_steps
+            ]
+            self.__process_levels = [
+                [(step.name, processes[step.name], plan.args(step)) for step in level]
+                for level in plan.loop_levels
+            ]
+            self.__execution_plan = plan
+
+    @property
+    def _step_order(self) -> list[Variable]:
+        """Return the variables computed every timestep."""
+        self._compile_plan()
+        return self.__step_order
+
+    @property
+    def _process_args(self) -> list[tuple[str, Process, list[str]]]:
+        """Return (name, process, argument names) for the per-timestep order."""
+        self._compile_plan()
+        return self.__process_args
+
+    @property
+    def _process_levels(self) -> list[list[tuple[str, Process, list[str]]]]:
+        """Return the per-timestep (name, process, argument names) by level."""
+        self._compile_plan()
+        return self.__process_levels
+
+    @property
+    def _hoisted_args(self) -> list[tuple[str, Process, list[str]]]:
+        """Return (name, process, argument names) for the hoisted variables."""
+        self._compile_plan()
+        return self.__hoisted_args
+
+    def _compute_hoisted(self) -> None:
+        """Compute the hoisted variables into the buffers."""
+        buffers: dict[str, np.ndarray] = self._buffers
+        for name, func, args in self._hoisted_args:
+            buffers[name] = self._cast_result(func(*[buffers[arg] for arg in args]))
+
+    def _timestep_dims(self, var_name: str) -> tuple[str, ...]:
+        """Return the dimensions of a variable within a single timestep."""
+        return tuple(
+            dim for dim in self._dataset[var_name].dims if dim != self.time_dim
+        )
+
+    def _advance_arrays(self, update_arrays: dict[str, np.ndarray]) -> None:
+        """Advance the array engine one timestep with already validated updates."""
+        self.timestep += 1
+        self._buffers.update(update_arrays)
+
+        self._iter_array_computations()
+        if self.output_aggregation:
+            self._accumulate()
+
+        if self._elapsed_timesteps % self.output_interval == 0:
+            self._record()
+
+    def _accumulate(self) -> None:
+        """Accumulate the output aggregations with the current timestep."""
+        first: bool = self._window_steps == 0
+        self._window_steps += 1
+        for var_name, stats in self._aggregates.items():
+            value: np.ndarray = self._buffers[var_name]
+            for stat, accumulator in stats.items():
+                if first:
+                    accumulator[...] = value
+                elif stat in ['mean', 'sum']:
+                    accumulator += value
+                elif stat == 'min':
+                    np.minimum(accumulator, value, out=accumulator)
+                else:
+                    np.maximum(accumulator, value, out=accumulator)
+
+    def _record(self) -> None:
+        """Write the current timestep (and aggregations) to the history arrays."""
+        record: int = self._elapsed_timesteps // self.output_interval
+        slot: int = self._record_slot(record)
+        if slot == 0:
+            self._sink_history(record - 1)
+        for var_name, history in self._history.items():
+            history[slot] = self._buffers[var_name]
+        for var_name, current in self._current.items():
+            current[...] = self._buffers[var_name]
+
+        for (var_name, stat), history in self._aggregate_history.items():
+            accumulator: np.ndarray = self._aggregates[var_name][stat]
+            if stat == 'mean':
+                history[slot] = accumulator / self._window_steps
+            else:
+                history[slot] = accumulator
+        self._window_steps = 0
+
+    def _increment_array_timestep(
+        self,
+        update_state_values: dict[str, xr.DataArray],
+    ) -> xr.Dataset:
+        """Run the process with the 'numpy' engine."""
+        if self._buffers is None:
+            self._bind_buffers()
+
+        update_arrays: dict[str, np.ndarray] = {}
+        for var_name, value in update_state_values.items():
+            if var_name not in (self.state_variables_names + self.updateable_static_variables):
+                raise ValueError(
+                    f'Variable {var_name} cannot be updated between timesteps, skipping.',
+                )
+            utils.validate_dims(value, self._timestep_dims(var_name))
+            update_arrays[var_name] = np.asarray(value.values)
+
+        self._advance_arrays(update_arrays)
+        return self.dataset
+
+    def _chunk_sizes(self, dims: tuple[str, ...]) -> tuple[tuple[int, ...], ...]:
+        """Return the dask chunks of an array with spatial dimensions dims."""
+        import dask.array as da
+        shape: tuple[int, ...] = tuple(self._dataset.sizes[dim] for dim in dims)
+        chunks = 'auto'
+        if self.chunks is not None:
+            chunks = tuple(self.chunks.get(dim, -1) for dim in dims)
+        return da.core.normalize_chunks(chunks, shape, dtype=self._float_dtype)
+
+    def _bind_chunks(self) -> None:
+        """Bind the dask arrays used by the 'dask' engine.
+
+        Current values are held in a dict of dask arrays (0-d statics stay
+        NumPy values) keyed by variable name, and the records of the temporal
+        variables in a dict keyed by timestep. Model.dataset is either the
+        initial record, or a full (i.e. previously returned) dataset.
+        """
+        import clearwater_modules.chunked as chunked
+
+        def to_chunks(value: xr.DataArray, dims: tuple[str, ...]) -> Any:
+            if value.ndim == 0:
+                return value.values
+            return chunked.as_chunked(
+                value.transpose(*dims).data,
+                self._chunk_sizes(dims),
+            )
+
+        full: bool = self._dataset.sizes[self.time_dim] > 1
+        self._chunked = {}
+        self._records = {}
+        for var_name in self._non_updateable_static_variables:
+            value: xr.DataArray = self._dataset[var_name]
+            self._chunked[var_name] = to_chunks(value, value.dims)
+        for var_name in self.temporal_variables:
+            value: xr.DataArray = self._dataset[var_name]
+            dims: tuple[str, ...] = self._timestep_dims(var_name)
+            self._records[var_name] = {
+                self._first_timestep + record: to_chunks(
+                    value.isel({self.time_dim: record if full else 0}),
+                    dims,
+                )
+                for record in range(self._elapsed_timesteps + 1 if full else 1)
+            }
+            if not full:
+                self._records[var_name] = {
+                    self.timestep: self._records[var_name][self._first_timestep]
+                }
+        for var_name in self.state_variables_names + self.updateable_static_variables:
+            if var_name in self._records:
+                self._chunked[var_name] = self._records[var_name][self.timestep]
+            else:
+                self._chunked[var_name] = to_chunks(
+                    self._dataset[var_name],
+                    self._timestep_dims(var_name),
+                )
+
+        plan: execution.ExecutionPlan = self.execution_plan
+        results: list[Any] = chunked.compute_steps(
+            plan.hoisted_steps,
+            [self._chunked.get(name) for name in plan.slots],
+            outputs=[step.output for step in plan.hoisted_steps],
+            dtype=self._float_dtype,
+            cast=self.dtype,
+        )
+        for step, result in zip(plan.hoisted_steps, results):
+            self._chunked[step.name] = result
+
+    def _increment_chunked_timestep(
+        self,
+        update_state_values: dict[str, xr.DataArray],
+    ) -> xr.Dataset:
+        """Run the process with the 'dask' engine, adding a timestep to the graph."""
+        import clearwater_modules.chunked as chunked
+        if self._chunked is None:
+            self._bind_chunks()
+
+        for var_name, value in update_state_values.items():
+            if var_name not in (self.state_variables_names + self.updateable_static_variables):
+                raise ValueError(
+                    f'Variable {var_name} cannot be updated between timesteps, skipping.',
+                )
+            utils.validate_dims(value, self._timestep_dims(var_name))
+
+        self._advance_chunks(
+            {var_name: value.data for var_name, value in update_state_values.items()}
+        )
+        return self.dataset
+
+    def _advance_chunks(self, update_arrays: dict[str, Any]) -> None:
+        """Advance the 'dask' engine one timestep with already validated updates."""
+        import clearwater_modules.chunked as chunked
+        for var_name, value in update_arrays.items():
+            self._chunked[var_name] = chunked.as_chunked(
+                value,
+                self._chunk_sizes(self._timestep_dims(var_name)),
+            )
+
+        self.timestep += 1
+        plan: execution.ExecutionPlan = self.execution_plan
+        keep: list[execution.PlanStep] = [
+            step for step in plan.loop_steps
+            if step.name in self.temporal_variables or step.name in self.state_variables_names
+        ]
+        results: list[Any] = chunked.compute_steps(
+            plan.loop_steps,
+            [self._chunked.get(name) if i in plan.loaded else None
+             for i, name in enumerate(plan.slots)],
+            outputs=[step.output for step in keep],
+            dtype=self._float_dtype,
+            cast=self.dtype,
+        )
+        current: dict[str, Any] = {
+            step.name: result for step, result in zip(keep, results)
+        }
+        for var_name in self.state_variables_names:
+            if var_name in current:
+                self._chunked[var_name] = current[var_name]
+        for var_name, records in self._records.items():
+            records[self.timestep] = current.get(var_name, self._chunked.get(var_name))
+
+    def _chunked_dataset(self) -> xr.Dataset:
+        """Return the lazy dataset of the 'dask' engine, see Model.dataset."""
+        import dask.array as da
+        if self._chunked is None:
+            self._bind_chunks()
+        if self._window is not None and self._window[0] == self.timestep:
+            return self._window[1]
+
+        def spatial(value: Any, dims: tuple[str, ...]) -> da.Array:
+            chunks: tuple[tuple[int, ...], ...] = self._chunk_sizes(dims)
+            if isinstance(value, da.Array):
+                return value
+            return da.broadcast_to(
+                np.asarray(value, dtype=self._float_dtype),
+                tuple(sum(c) for c in chunks),
+                chunks=chunks,
+            )
 
-        for name, func, arrays in inputs:
-            array: np.ndarray = func(*arrays)
-            self.timestep_ds[name] = (dims, array)
+        data_vars: dict[str, xr.DataArray] = {}
+        for var_name in self._non_updateable_static_variables:
+            if isinstance(self._chunked[var_name], da.Array):
+                data_vars[var_name] = self._dataset[var_name].copy(
+                    data=self._chunked[var_name],
+                )
+        for var_name in self.temporal_variables:
+            dims: tuple[str, ...] = self._timestep_dims(var_name)
+            missing: da.Array = spatial(np.nan, dims)
+            records: dict[int, Any] = self._records[var_name]
+            data_vars[var_name] = xr.DataArray(
+                da.stack([
+                    spatial(records[timestep], dims) if timestep in records else missing
+                    for timestep in range(
+                        self._first_timestep,
+                        self._first_timestep + self.time_steps,
+                    )
+                ]),
+                dims=(self.time_dim,) + dims,
+                attrs=self._dataset[var_name].attrs,
+            ).transpose(*self._dataset[var_name].dims)
+        for var_name in self._current_variables:
+            dims: tuple[str, ...] = self._timestep_dims(var_name)
+            data_vars[var_name] = xr.DataArray(
+                spatial(self._chunked[var_name], dims),
+                dims=dims,
+                attrs=self._dataset[var_name].attrs,
+            )
+        dataset: xr.Dataset = self._dataset.drop_vars(
+            list(data_vars) + [self.time_dim],
+        ).assign_coords(
+            {self.time_dim: self._first_timestep + np.arange(self.time_steps)}
+        ).assign(data_vars)
+        self._window = (self.timestep, dataset)
+        return dataset
+
+    def _prep_forcing(
+        self,
+        n_steps: int,
+        forcing: dict[str, xr.DataArray | np.ndarray],
+    ) -> dict[str, np.ndarray]:
+        """Validate time-indexed forcing and return arrays with time as the first axis."""
+        forcing_arrays: dict[str, np.ndarray] = {}
+        for var_name, values in forcing.items():
+            if var_name not in (self.state_variables_names + self.updateable_static_variables):
+                raise ValueError(
+                    f'Variable {var_name} cannot be updated between timesteps.',
+                )
+            dims: tuple[str, ...] = (self.time_dim,) + self._timestep_dims(var_name)
+            if isinstance(values, xr.DataArray):
+                if set(values.dims) != set(dims):
+                    raise ValueError(
+                        f'Forcing for {var_name} must have dimensions {dims}, got {values.dims}.'
+                    )
+                values = values.transpose(*dims).values
+            values = np.asarray(values)
+            shape: tuple[int, ...] = (n_steps,) + tuple(
+                self._dataset.sizes[dim] for dim in dims[1:]
+            )
+            if values.shape != shape:
+                raise ValueError(
+                    f'Forcing for {var_name} must have shape {shape}, got {values.shape}.'
+                )
+            forcing_arrays[var_name] = values
+        return forcing_arrays
+
+    def _remaining_timesteps(self) -> int:
+        """Return the number of timesteps left to run."""
+        if self.history_length is None and self.output_interval == 1 \
+                and self.engine != 'dask':
+            return self._dataset.sizes[self.time_dim] - 1 - self._elapsed_timesteps
+        return self.time_steps - 1 - self._elapsed_timesteps
+
+    def run(
+        self,
+        n_steps: Optional[int] = None,
+        forcing: Optional[dict[str, xr.DataArray | np.ndarray]] = None,
+        active_mask: Optional[xr.DataArray] = None,
+    ) -> xr.Dataset:
+        """Run the model for multiple timesteps.
+
+        Forcing is validated once up front, so with the 'numpy'/'numba' engines
+        the loop only computes the processes and writes history. With the
+        'numba' engine, if the whole computation order fused into one kernel,
+        all timesteps are computed in a single compiled call.
+
+        Args:
+            n_steps: The number of timesteps to run. Defaults to all remaining
+                timesteps.
+            forcing: A dict with state/updateable static variable names as keys,
+                and time-indexed values (a DataArray with Model.time_dim, or an
+                array with time as the first axis) of length n_steps. Values at
+                index i are applied before computing the i-th timestep, like
+                increment_timestep(update_state_values=...).
+            active_mask: An optional Model.active_mask, set for the run. If it
+                has Model.time_dim (of length n_steps), the mask at index i is
+                set before computing the i-th timestep.
+
+        Returns:
+            The model dataset.
+        """
+        remaining: int = self._remaining_timesteps()
+        if n_steps is None:
+            n_steps = remaining
+        if n_steps > remaining:
+            raise ValueError(
+                f'Cannot run {n_steps} timesteps, only {remaining} remaining.'
+            )
+        if forcing is None:
+            forcing = {}
+        forcing_arrays: dict[str, np.ndarray] = self._prep_forcing(
+            n_steps,
+            forcing,
+        )
+        masks: Optional[xr.DataArray] = None
+        if active_mask is not None and self.time_dim in active_mask.dims:
+            if self.engine not in ['numpy', 'numba']:
+                raise ValueError(
+                    "active_mask requires the 'numpy' or 'numba' engine."
+                )
+            if active_mask.sizes[self.time_dim] != n_steps:
+                raise ValueError(
+                    f'active_mask must have {n_steps} timesteps, '
+                    f'got {active_mask.sizes[self.time_dim]}.'
+                )
+            masks = active_mask
+        elif active_mask is not None:
+            self.active_mask = active_mask
+
+        if self.engine == 'dask':
+            if self._chunked is None:
+                self._bind_chunks()
+            for i in range(n_steps):
+                self._advance_chunks(
+                    {var_name: values[i] for var_name, values in forcing_arrays.items()}
+                )
+            return self.dataset
+
+        if self.engine == 'xarray':
+            for i in range(n_steps):
+                self.increment_timestep(
+                    update_state_values={
+                        var_name: xr.DataArray(
+                            values[i],
+                            dims=self._timestep_dims(var_name),
+                        )
+                        for var_name, values in forcing_arrays.items()
+                    }
+                )
+            return self.dataset
+
+        if self._buffers is None:
+            self._bind_buffers()
+
+        if self.output_interval != 1 or self.output_aggregation or masks is not None:
+            for i in range(n_steps):
+                if masks is not None:
+                    self.active_mask = masks.isel({self.time_dim: i}, drop=True)
+                self._advance_arrays(
+                    {var_name: values[i] for var_name, values in forcing_arrays.items()}
+                )
+            return self.dataset
+
+        # split the run where the ring buffer wraps (a single chunk otherwise)
+        done: int = 0
+        while done < n_steps:
+            slot: int = self._slot(self.timestep + 1)
+            chunk: int = n_steps - done
+            if self.history_length is not None:
+                chunk = min(chunk, self.history_length - slot)
+            if slot == 0:
+                self._sink_history(self._elapsed_timesteps // self.output_interval)
+            self._run_arrays(
+                chunk,
+                slot,
+                {
+                    var_name: values[done:done + chunk]
+                    for var_name, values in forcing_arrays.items()
+                },
+            )
+            done += chunk
+        return self.dataset
+
+    def _run_arrays(
+        self,
+        n_steps: int,
+        slot: int,
+        forcing_arrays: dict[str, np.ndarray],
+    ) -> None:
+        """Run the array engine for n_steps written to consecutive slots."""
+        if self._fused_step is not None and self._active_index is None and self._fused_step.run(
+            n_steps,
+            self._buffers,
+            forcing_arrays,
+            history={
+                var_name: history[slot:slot + n_steps]
+                for var_name, history in self._history.items()
+            },
+            carry=self.state_variables_names + self.updateable_static_variables,
+        ):
+            self.timestep += n_steps
+            for var_name, current in self._current.items():
+                current[...] = self._buffers[var_name]
+            return
+
+        for i in range(n_steps):
+            self._advance_arrays(
+                {var_name: values[i] for var_name, values in forcing_arrays.items()}
+            )
 
     def increment_timestep(
         self,
         update_state_values: Optional[dict[str, xr.DataArray]] = None,
+        active_mask: Optional[xr.DataArray] = None,
     ) -> xr.Dataset:
-        """Run the process."""
-        self.timestep += 1
+        """Run the process.
 
+        Args:
+            update_state_values: An optional dict with state/updateable static
+                variable names as keys, and values to set before computing.
+            active_mask: If provided, sets Model.active_mask before computing
+                (it applies to later timesteps too, until it is set again).
+        """
         if update_state_values is None:
             update_state_values = {}
+        if active_mask is not None:
+            self.active_mask = active_mask
+
+        if self.engine in ['numpy', 'numba']:
+            return self._increment_array_timestep(update_state_values)
+        if self.engine == 'dask':
+            return self._increment_chunked_timestep(update_state_values)
+
+        self.timestep += 1
 
         # by default, set current timestep equal to last timestep
         self.timestep_ds: xr.Dataset = self.dataset.isel(
-            {self.time_dim: self.timestep - 1}
+            {self.time_dim: self._elapsed_timesteps - 1}
         )
 
         # update the state variables as necessary (i.e. interacting w/ other models)
@@ -517,12 +2243,17 @@ class Model(CanRegisterVariable):
             self.timestep_ds[var_name] = value
 
         # compute the dynamic variables in order
+        self._iter_hoisted_computations()
+        self._start_executor()
         self._iter_computations()
 
-        if not self._track_dynamic_variables:
-            self.timestep_ds = self.timestep_ds.drop_vars(
-                self.dynamic_variables_names
-            )
+        self.timestep_ds = self.timestep_ds.drop_vars(
+            [
+                var_name for var_name in self.dynamic_variables_names
+                if var_name not in self.temporal_variables
+            ],
+            errors='ignore',
+        )
         self.timestep_ds = self.timestep_ds.drop_vars(
             self._non_updateable_static_variables
         )
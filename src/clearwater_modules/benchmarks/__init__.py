@@ -0,0 +1,23 @@
+"""Benchmarks of the TSM and NSM1 models across grid sizes, steps and engines.
+
+Run the suite from the command line (see cli.py for the options):
+
+    clearwater-benchmarks --output results.json
+    clearwater-benchmarks --baseline results.json
+
+or equivalently with python -m clearwater_modules.benchmarks. Results report
+steps/sec, cells*steps/sec and peak RSS per case, and are written to a JSON
+file that later runs can compare against: the command exits with status 1
+if a case got slower than the baseline by more than the tolerance.
+"""
+from clearwater_modules.benchmarks.suite import (
+    BenchmarkCase,
+    BenchmarkResult,
+    compare,
+    make_cases,
+    read_results,
+    results_table,
+    run_case,
+    run_suite,
+    write_results,
+)
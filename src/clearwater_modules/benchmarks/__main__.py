@@ -0,0 +1,4 @@
+import sys
+from clearwater_modules.benchmarks.cli import main
+
+sys.exit(main())
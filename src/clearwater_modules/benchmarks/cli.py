@@ -0,0 +1,124 @@
+"""The clearwater-benchmarks command, see the package docstring."""
+import argparse
+import pandas as pd
+from clearwater_modules.benchmarks import suite
+from typing import Optional
+
+ENGINES: tuple[str, ...] = ('xarray', 'numpy', 'numba', 'dask')
+
+
+def parse_bool(value: str) -> bool:
+    if value.lower() in ['true', 'on', '1']:
+        return True
+    if value.lower() in ['false', 'off', '0']:
+        return False
+    raise argparse.ArgumentTypeError(f'Invalid bool: {value}.')
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='clearwater-benchmarks',
+        description=(
+            'Time the TSM and NSM1 models over every combination of models, '
+            'grid sizes, steps, engines and track_dynamic_variables.'
+        ),
+    )
+    parser.add_argument(
+        '--models', nargs='+', choices=suite.MODELS, default=list(suite.MODELS),
+    )
+    parser.add_argument(
+        '--gridsizes', nargs='+', type=int, default=list(suite.DEFAULT_GRIDSIZES),
+        help='Cells along each side of the square grid.',
+    )
+    parser.add_argument(
+        '--steps', nargs='+', type=int, default=list(suite.DEFAULT_STEPS),
+        help='Timed timesteps, after one warm-up timestep.',
+    )
+    parser.add_argument(
+        '--engines', nargs='+', choices=ENGINES, default=list(suite.DEFAULT_ENGINES),
+    )
+    parser.add_argument(
+        '--track-dynamic-variables', nargs='+', type=parse_bool,
+        default=[False, True], metavar='BOOL',
+    )
+    parser.add_argument(
+        '--threads', nargs='+', type=int, default=[None],
+        help=(
+            'Model.threads of the numpy and xarray engines, i.e. --threads 1 4 '
+            'to compare one and four threads on a multicore machine.'
+        ),
+    )
+    parser.add_argument(
+        '--repeats', type=int, default=1,
+        help='Runs of each case, the best is kept.',
+    )
+    parser.add_argument(
+        '--output', default='benchmark_results.json',
+        help='The JSON file results are written to.',
+    )
+    parser.add_argument(
+        '--baseline',
+        help='A results file to compare against, i.e. the --output of an earlier run.',
+    )
+    parser.add_argument(
+        '--tolerance', type=float, default=suite.DEFAULT_TOLERANCE,
+        help='The fraction of baseline steps/sec a case may lose (default %(default)s).',
+    )
+    parser.add_argument(
+        '--no-isolate', dest='isolate', action='store_false',
+        help='Run all cases in this process, rather than a fresh process each.',
+    )
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the benchmarks, and return 1 if a case regressed from the baseline."""
+    args: argparse.Namespace = make_parser().parse_args(argv)
+    # read the baseline first, so a bad path fails before the suite runs
+    baseline: Optional[list[suite.BenchmarkResult]] = None
+    if args.baseline is not None:
+        baseline = suite.read_results(args.baseline)
+
+    cases: list[suite.BenchmarkCase] = suite.make_cases(
+        args.models,
+        args.gridsizes,
+        args.steps,
+        args.engines,
+        args.track_dynamic_variables,
+        args.threads,
+    )
+
+    def report(result: suite.BenchmarkResult) -> None:
+        print(
+            f'{result.case.key}: {result.steps_per_second:.1f} steps/s, '
+            f'{result.cell_steps_per_second:.3g} cell-steps/s',
+            flush=True,
+        )
+
+    results: list[suite.BenchmarkResult] = suite.run_suite(
+        cases,
+        repeats=args.repeats,
+        isolate=args.isolate,
+        callback=report,
+    )
+    path = suite.write_results(results, args.output)
+    with pd.option_context('display.width', 160, 'display.max_columns', None):
+        print(
+            suite.results_table(results)[
+                ['steps_per_second', 'cell_steps_per_second', 'warmup_seconds', 'peak_rss_bytes']
+            ]
+        )
+        print(f'Results written to {path}')
+        if baseline is None:
+            return 0
+
+        comparison = suite.compare(results, baseline, args.tolerance)
+        print(comparison)
+        regressed = comparison[comparison['regressed']]
+        if len(regressed):
+            print(
+                f'{len(regressed)} case(s) regressed by more than '
+                f'{args.tolerance:.0%} from {args.baseline}: {", ".join(regressed.index)}'
+            )
+            return 1
+    return 0
@@ -0,0 +1,372 @@
+"""Benchmark cases of the models, and their results.
+
+A BenchmarkCase is a model run on a gridsize x gridsize grid. Each case runs
+one warm-up timestep (binding the engine buffers, and compiling with the
+'numba' engine), then times Case.steps timesteps with Model.run(). Runs are
+repeated on fresh models, and the best time is kept.
+
+The model inputs are random, and NSM1 runs with its default parameters
+(which diverge after a few timesteps), the suite measures the cost of the
+computation, not its results. Floating point warnings are ignored.
+
+Peak RSS is the peak resident memory of the process running the case. Cases
+run in a fresh process each by default (see run_suite()), so it includes
+the interpreter and imports, but no other case.
+"""
+import concurrent.futures
+import contextlib
+import dataclasses
+import datetime
+import io
+import itertools
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from pathlib import Path
+import numba
+import numpy as np
+import pandas as pd
+import xarray as xr
+import clearwater_modules
+from clearwater_modules.base import Model
+from clearwater_modules.nsm1 import constants as nsm1_constants
+from clearwater_modules.nsm1.model import NutrientBudget
+from clearwater_modules.tsm.model import EnergyBudget
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Optional,
+)
+
+try:
+    import resource
+except ImportError:
+    # i.e. on Windows
+    resource = None
+
+RESULTS_FORMAT_VERSION: int = 1
+MODELS: tuple[str, ...] = ('tsm', 'nsm1')
+DEFAULT_GRIDSIZES: tuple[int, ...] = (10, 100)
+DEFAULT_STEPS: tuple[int, ...] = (10, 100)
+DEFAULT_ENGINES: tuple[str, ...] = ('numpy', 'numba')
+THREADED_ENGINES: tuple[str, ...] = ('numpy', 'xarray')
+DEFAULT_TOLERANCE: float = 0.25
+NSM1_STATE_VARIABLES: tuple[str, ...] = (
+    'Ap', 'Ab', 'NH4', 'NO3', 'OrgN', 'N2', 'TIP', 'OrgP',
+    'POC', 'DOC', 'DIC', 'POM', 'CBOD', 'DOX', 'PX', 'Alk',
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class BenchmarkCase:
+    """A model configuration to time.
+
+    Attributes:
+        model: One of MODELS.
+        gridsize: The number of cells along each of the two grid dimensions.
+        steps: The number of timesteps timed.
+        engine: The Model engine.
+        track_dynamic_variables: Passed to the model.
+        threads: Passed to the model (the 'numpy' and 'xarray' engines).
+    """
+    model: str
+    gridsize: int
+    steps: int
+    engine: str
+    track_dynamic_variables: bool
+    threads: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        """A name identifying the case, i.e. in baselines."""
+        tracked: str = 'tracked' if self.track_dynamic_variables else 'untracked'
+        threads: str = '' if self.threads is None else f'-{self.threads}threads'
+        return (
+            f'{self.model}-{self.gridsize}x{self.gridsize}-{self.steps}-'
+            f'{self.engine}-{tracked}{threads}'
+        )
+
+    @property
+    def cells(self) -> int:
+        return self.gridsize ** 2
+
+
+@dataclasses.dataclass(frozen=True)
+class BenchmarkResult:
+    """The timings of a BenchmarkCase.
+
+    Attributes:
+        case: The case timed.
+        init_seconds: The time to construct the model.
+        warmup_seconds: The time of the first timestep (binding, compiling).
+        seconds: The time of BenchmarkCase.steps timesteps.
+        peak_rss_bytes: The peak resident memory of the process, None if it
+            can't be measured on this platform.
+    """
+    case: BenchmarkCase
+    init_seconds: float
+    warmup_seconds: float
+    seconds: float
+    peak_rss_bytes: Optional[int]
+
+    @property
+    def steps_per_second(self) -> float:
+        return self.case.steps / self.seconds
+
+    @property
+    def cell_steps_per_second(self) -> float:
+        return self.case.cells * self.case.steps / self.seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the result as a flat JSON serializable dict."""
+        return {
+            'key': self.case.key,
+            **dataclasses.asdict(self.case),
+            'init_seconds': self.init_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'seconds': self.seconds,
+            'steps_per_second': self.steps_per_second,
+            'cell_steps_per_second': self.cell_steps_per_second,
+            'peak_rss_bytes': self.peak_rss_bytes,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> 'BenchmarkResult':
+        """Rebuild a result from BenchmarkResult.to_dict()."""
+        case = BenchmarkCase(
+            **{
+                # results written before a field was added use its default
+                field.name: data.get(field.name, field.default)
+                for field in dataclasses.fields(BenchmarkCase)
+            }
+        )
+        return cls(
+            case=case,
+            init_seconds=data['init_seconds'],
+            warmup_seconds=data['warmup_seconds'],
+            seconds=data['seconds'],
+            peak_rss_bytes=data['peak_rss_bytes'],
+        )
+
+
+def make_cases(
+    models: Iterable[str] = MODELS,
+    gridsizes: Iterable[int] = DEFAULT_GRIDSIZES,
+    steps: Iterable[int] = DEFAULT_STEPS,
+    engines: Iterable[str] = DEFAULT_ENGINES,
+    track_dynamic_variables: Iterable[bool] = (False, True),
+    threads: Iterable[Optional[int]] = (None,),
+) -> list[BenchmarkCase]:
+    """Return the cases of every combination of the arguments.
+
+    Threads only apply to THREADED_ENGINES, the other engines get a single
+    case without threads.
+    """
+    cases: list[BenchmarkCase] = []
+    for model, gridsize, n_steps, engine, track, n_threads in itertools.product(
+        models, gridsizes, steps, engines, track_dynamic_variables, threads,
+    ):
+        if model not in MODELS:
+            raise ValueError(f'Invalid model: {model}. Must be one of {MODELS}.')
+        if engine not in THREADED_ENGINES:
+            n_threads = None
+        case = BenchmarkCase(model, gridsize, n_steps, engine, track, n_threads)
+        if case not in cases:
+            cases.append(case)
+    return cases
+
+
+def make_model(case: BenchmarkCase) -> Model:
+    """Return the model of a case, with time for a warm-up step and the timed steps."""
+    rng = np.random.default_rng(seed=42)
+    grid = xr.DataArray(
+        rng.random((case.gridsize, case.gridsize)) + 1.0,
+        dims=['y', 'x'],
+    )
+    if case.model == 'tsm':
+        return EnergyBudget(
+            time_steps=case.steps + 1,
+            initial_state_values={
+                'water_temp_c': grid * 20.0,
+                'surface_area': grid,
+                'volume': grid * 100.0,
+            },
+            track_dynamic_variables=case.track_dynamic_variables,
+            engine=case.engine,
+            threads=case.threads,
+        )
+    return NutrientBudget(
+        time_steps=case.steps + 1,
+        initial_state_values={name: grid for name in NSM1_STATE_VARIABLES},
+        global_parameters=dict(nsm1_constants.DEFAULT_GLOBALPARAMETERS),
+        track_dynamic_variables=case.track_dynamic_variables,
+        engine=case.engine,
+        threads=case.threads,
+    )
+
+
+def peak_rss() -> Optional[int]:
+    """Return the peak resident memory of this process in bytes, if available."""
+    if resource is None:
+        return None
+    rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def compute(model: Model) -> None:
+    """Compute the results of a model, as the 'dask' engine only builds a graph."""
+    if model.engine == 'dask':
+        model.dataset.compute()
+
+
+def run_case(case: BenchmarkCase, repeats: int = 1) -> BenchmarkResult:
+    """Time a case in this process, keeping the best of repeats."""
+    timings: list[tuple[float, float, float]] = []
+    with np.errstate(all='ignore'):
+        for _ in range(repeats):
+            start: float = time.perf_counter()
+            # the models print their initialization progress
+            with contextlib.redirect_stdout(io.StringIO()):
+                model: Model = make_model(case)
+            built: float = time.perf_counter()
+            model.run(1)
+            compute(model)
+            warm: float = time.perf_counter()
+            model.run(case.steps)
+            compute(model)
+            timings.append((built - start, warm - built, time.perf_counter() - warm))
+            model.close()
+    init_seconds, warmup_seconds, seconds = (min(values) for values in zip(*timings))
+    return BenchmarkResult(case, init_seconds, warmup_seconds, seconds, peak_rss())
+
+
+def run_suite(
+    cases: Iterable[BenchmarkCase],
+    repeats: int = 1,
+    isolate: bool = True,
+    callback: Optional[Callable[[BenchmarkResult], None]] = None,
+) -> list[BenchmarkResult]:
+    """Time cases one after the other.
+
+    Args:
+        cases: The cases to time.
+        repeats: The number of runs of each case, the best is kept.
+        isolate: If True, each case runs in a fresh (spawned) process, so
+            caches, compiled functions and memory don't carry over between
+            cases. Otherwise they all run in this process.
+        callback: An optional function called with each result.
+    """
+    results: list[BenchmarkResult] = []
+    executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+    if isolate:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn'),
+            max_tasks_per_child=1,
+        )
+    try:
+        for case in cases:
+            if executor is None:
+                result: BenchmarkResult = run_case(case, repeats)
+            else:
+                result = executor.submit(run_case, case, repeats).result()
+            results.append(result)
+            if callback is not None:
+                callback(result)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return results
+
+
+def machine_info() -> dict[str, Any]:
+    """Return where and when the results were measured."""
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'python': platform.python_version(),
+        'clearwater_modules': clearwater_modules.__version__,
+        'numpy': np.__version__,
+        'numba': numba.__version__,
+        'xarray': xr.__version__,
+    }
+
+
+def write_results(results: list[BenchmarkResult], path: str | Path) -> Path:
+    """Write results (with machine_info()) to a JSON file, usable as a baseline."""
+    path = Path(path)
+    with open(path, 'w') as file:
+        json.dump(
+            {
+                'format_version': RESULTS_FORMAT_VERSION,
+                'machine': machine_info(),
+                'results': [result.to_dict() for result in results],
+            },
+            file,
+            indent=1,
+        )
+    return path
+
+
+def read_results(path: str | Path) -> list[BenchmarkResult]:
+    """Read results written by write_results()."""
+    with open(path) as file:
+        data: dict[str, Any] = json.load(file)
+    if data.get('format_version') != RESULTS_FORMAT_VERSION:
+        raise ValueError(
+            f'Unsupported results format version: {data.get("format_version")}, '
+            f'expected {RESULTS_FORMAT_VERSION}.'
+        )
+    return [BenchmarkResult.from_dict(result) for result in data['results']]
+
+
+def results_table(results: list[BenchmarkResult]) -> pd.DataFrame:
+    """Return the results as a DataFrame indexed by case key."""
+    return pd.DataFrame([result.to_dict() for result in results]).set_index('key')
+
+
+def compare(
+    results: list[BenchmarkResult],
+    baseline: list[BenchmarkResult],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> pd.DataFrame:
+    """Compare the throughput of results with a baseline.
+
+    Only cases in both are compared. Baselines should come from the same
+    machine, timings of different machines aren't comparable.
+
+    Args:
+        results: The current results.
+        baseline: The results to compare against (i.e. read_results()).
+        tolerance: The fraction of the baseline steps per second a case may
+            lose before it counts as a regression.
+
+    Returns:
+        A DataFrame indexed by case key, with baseline and current steps per
+        second, their relative change, and whether the case regressed.
+    """
+    baseline_speeds: dict[str, float] = {
+        result.case.key: result.steps_per_second for result in baseline
+    }
+    rows: list[dict[str, Any]] = []
+    for result in results:
+        if result.case.key not in baseline_speeds:
+            continue
+        before: float = baseline_speeds[result.case.key]
+        rows.append({
+            'key': result.case.key,
+            'baseline_steps_per_second': before,
+            'steps_per_second': result.steps_per_second,
+            'change': result.steps_per_second / before - 1.0,
+            'regressed': result.steps_per_second < before * (1.0 - tolerance),
+        })
+    return pd.DataFrame(
+        rows,
+        columns=['key', 'baseline_steps_per_second', 'steps_per_second', 'change', 'regressed'],
+    ).set_index('key')
@@ -0,0 +1,180 @@
+"""Binary checkpoints of the current model state, for fast restarts.
+
+A checkpoint is a directory holding two files:
+
+    manifest.json: The layout of the arrays, the settings needed to rebuild
+        the model dataset, and a hash of the model variable schema.
+    arrays.bin: The raw arrays, each aligned to ALIGNMENT bytes.
+
+Only the current timestep is written (state and updateable static values,
+static values and coordinates), so the cost of a checkpoint doesn't depend on
+how much history the model holds:
+
+    model.checkpoint('tsm_checkpoint')
+    ...
+    model = EnergyBudget.restore('tsm_checkpoint', time_steps=24)
+
+Restoring maps arrays.bin with np.memmap (copy-on-write, the file is never
+modified), and hotstarts a model from a dataset wrapping the mapped arrays,
+so static values are not read until they are used.
+"""
+import hashlib
+import json
+from pathlib import Path
+import numpy as np
+import xarray as xr
+from clearwater_modules.shared.types import Variable
+from typing import (
+    Any,
+    TYPE_CHECKING,
+)
+
+if TYPE_CHECKING:
+    from clearwater_modules.base import Model
+
+FORMAT_VERSION: int = 1
+ALIGNMENT: int = 64
+MANIFEST_FILE: str = 'manifest.json'
+ARRAYS_FILE: str = 'arrays.bin'
+
+
+def model_path(model_class: type) -> str:
+    """Return the 'module:qualname' path of a model class."""
+    return f'{model_class.__module__}:{model_class.__qualname__}'
+
+
+def schema_hash(model_class: type) -> str:
+    """Return a hash of the variables (name and use) registered with a model class."""
+    model_class._load_variables()
+    variables: list[Variable] = sorted(
+        model_class._variables,
+        key=lambda variable: variable.name,
+    )
+    schema: str = json.dumps(
+        {
+            'model': model_path(model_class),
+            'variables': [[variable.name, variable.use] for variable in variables],
+        }
+    )
+    return hashlib.sha256(schema.encode()).hexdigest()
+
+
+def _as_storable(value: Any) -> np.ndarray:
+    """Return a value as a contiguous array with a fixed size dtype."""
+    array: np.ndarray = np.asarray(value)
+    if array.dtype.kind == 'O':
+        array = array.astype(str)
+    # unlike np.ascontiguousarray(), keeps 0-d arrays 0-d
+    return np.require(array, requirements='C')
+
+
+def write_checkpoint(model: 'Model', path: str | Path) -> Path:
+    """Write the current state of a model to a checkpoint directory.
+
+    Args:
+        model: The model to checkpoint.
+        path: The checkpoint directory, created if it doesn't exist. Files of
+            a previous checkpoint in it are overwritten.
+
+    Returns:
+        The checkpoint directory path.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    arrays: dict[str, tuple[str, tuple[str, ...], np.ndarray, dict]] = {}
+    for var_name, value in model._state_values().items():
+        attrs: dict = dict(model._dataset[var_name].attrs)
+        arrays[var_name] = ('state', value.dims, value.values, attrs)
+    for var_name in model._non_updateable_static_variables:
+        value: xr.DataArray = model._dataset[var_name]
+        arrays[var_name] = ('static', value.dims, value.values, dict(value.attrs))
+    for name, coord in model._dataset.coords.items():
+        if name == model.time_dim or model.time_dim in coord.dims:
+            continue
+        arrays[name] = ('coord', coord.dims, coord.values, dict(coord.attrs))
+
+    variables: dict[str, dict[str, Any]] = {}
+    offset: int = 0
+    with open(path / ARRAYS_FILE, 'wb') as file:
+        for name, (kind, dims, value, attrs) in arrays.items():
+            array: np.ndarray = _as_storable(value)
+            offset += -offset % ALIGNMENT
+            file.seek(offset)
+            file.write(array.tobytes())
+            variables[name] = {
+                'kind': kind,
+                'dims': list(dims),
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'offset': offset,
+                'attrs': attrs,
+            }
+            offset += array.nbytes
+        file.truncate(offset)
+
+    manifest: dict[str, Any] = {
+        'format_version': FORMAT_VERSION,
+        'model': model_path(type(model)),
+        'schema_hash': schema_hash(type(model)),
+        'timestep': model.timestep,
+        'time_dim': model.time_dim,
+        'updateable_static_variables': list(model.updateable_static_variables),
+        'attrs': dict(model._dataset.attrs),
+        'variables': variables,
+    }
+    with open(path / MANIFEST_FILE, 'w') as file:
+        json.dump(manifest, file, indent=1, default=str)
+    return path
+
+
+def read_manifest(path: str | Path) -> dict[str, Any]:
+    """Read the manifest of a checkpoint directory."""
+    with open(Path(path) / MANIFEST_FILE) as file:
+        manifest: dict[str, Any] = json.load(file)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(
+            f'Unsupported checkpoint format version: {manifest.get("format_version")}, '
+            f'expected {FORMAT_VERSION}.'
+        )
+    return manifest
+
+
+def read_checkpoint(
+    path: str | Path,
+    manifest: dict[str, Any],
+) -> xr.Dataset:
+    """Return a hotstart dataset wrapping the memory mapped checkpoint arrays.
+
+    State values get a Model.time_dim of length 1, holding the checkpointed
+    timestep.
+    """
+    path = Path(path)
+    buffer: np.ndarray | None = None
+    if (path / ARRAYS_FILE).stat().st_size:
+        buffer = np.memmap(path / ARRAYS_FILE, dtype=np.uint8, mode='c')
+
+    time_dim: str = manifest['time_dim']
+    data_vars: dict[str, xr.Variable] = {}
+    coords: dict[str, xr.Variable] = {time_dim: np.array([manifest['timestep']])}
+    for name, layout in manifest['variables'].items():
+        dtype: np.dtype = np.dtype(layout['dtype'])
+        shape: tuple[int, ...] = tuple(layout['shape'])
+        size: int = int(np.prod(shape)) * dtype.itemsize
+        if size:
+            array: np.ndarray = buffer[
+                layout['offset']:layout['offset'] + size
+            ].view(dtype).reshape(shape)
+        else:
+            array = np.empty(shape, dtype=dtype)
+        dims: tuple[str, ...] = tuple(layout['dims'])
+        if layout['kind'] == 'state':
+            array = array[np.newaxis]
+            dims = (time_dim,) + dims
+        variable = xr.Variable(dims, array, attrs=layout['attrs'])
+        if layout['kind'] == 'coord':
+            coords[name] = variable
+        else:
+            data_vars[name] = variable
+    # coordinates are assigned last, so the data variables set the dimension order
+    return xr.Dataset(data_vars, attrs=manifest['attrs']).assign_coords(coords)
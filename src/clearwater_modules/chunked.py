@@ -0,0 +1,116 @@
+"""Blockwise evaluation of execution plan steps on dask arrays ('dask' engine).
+
+Processes are elementwise, so a timestep can be computed chunk by chunk: the
+steps are wrapped into a single block function, mapped over the spatial chunks
+of their inputs with dask.array.map_blocks. Each timestep adds one task per
+chunk to a lazy graph, and nothing is computed until the model dataset is
+(i.e. with Model.dataset.compute(), or written with Dataset.to_zarr()).
+
+The chunks of different timesteps only depend on the same chunk of the previous
+timestep, so dask computes the chunks of a run in parallel, and when writing
+the dataset to disk, only holds the chunks being computed in memory.
+
+Requires dask, this module is only imported by the 'dask' engine.
+"""
+import uuid
+import dask.array as da
+import numpy as np
+import clearwater_modules.utils as utils
+from clearwater_modules.execution import PlanStep
+from typing import (
+    Any,
+    Iterable,
+    Optional,
+)
+
+
+def as_chunked(value: Any, chunks: tuple[tuple[int, ...], ...]) -> da.Array:
+    """Return a NumPy or dask array as a dask array with the given chunks."""
+    if isinstance(value, da.Array):
+        return value.rechunk(chunks)
+    return da.from_array(np.asarray(value), chunks=chunks)
+
+
+def _compute_block(
+    *blocks: np.ndarray,
+    steps: tuple[PlanStep, ...],
+    n_slots: int,
+    constants: dict[int, Any],
+    block_slots: tuple[int, ...],
+    outputs: tuple[int, ...],
+    out_dtype: np.dtype,
+    cast: Optional[np.dtype],
+) -> np.ndarray:
+    """Compute steps on a block of every input, returning the stacked outputs."""
+    values: list[Any] = [None] * n_slots
+    for i, value in constants.items():
+        values[i] = value
+    for i, block in zip(block_slots, blocks):
+        values[i] = block
+    for step in steps:
+        result = utils.as_array(step.process(*[values[i] for i in step.inputs]))
+        if cast is not None and np.asarray(result).dtype.kind == 'f':
+            result = np.asarray(result, dtype=cast)
+        values[step.output] = result
+
+    out: np.ndarray = np.empty((len(outputs),) + blocks[0].shape, dtype=out_dtype)
+    for j, i in enumerate(outputs):
+        out[j] = values[i]
+    return out
+
+
+def compute_steps(
+    steps: Iterable[PlanStep],
+    values: list[Any],
+    outputs: list[int],
+    dtype: np.dtype,
+    cast: Optional[np.dtype] = None,
+) -> list[Any]:
+    """Compute execution plan steps blockwise, lazily.
+
+    Args:
+        steps: The steps to compute, in order.
+        values: A value for every slot read before it is written: a dask array
+            (all chunked alike) or a value broadcast to every block.
+        outputs: The slots to return.
+        dtype: The dtype of the returned arrays.
+        cast: An optional dtype floating point results are cast to.
+
+    Returns:
+        A dask array for each output slot. If no input is a dask array the
+        steps are computed eagerly, and the output values are returned as is.
+    """
+    steps = tuple(steps)
+    block_slots: tuple[int, ...] = tuple(
+        i for i, value in enumerate(values) if isinstance(value, da.Array)
+    )
+    if not block_slots:
+        values = list(values)
+        for step in steps:
+            values[step.output] = utils.as_array(
+                step.process(*[values[i] for i in step.inputs])
+            )
+        return [values[i] for i in outputs]
+
+    arrays: list[da.Array] = [values[i] for i in block_slots]
+    stacked: da.Array = da.map_blocks(
+        _compute_block,
+        *arrays,
+        steps=steps,
+        n_slots=len(values),
+        constants={
+            i: value for i, value in enumerate(values)
+            if value is not None and i not in block_slots
+        },
+        block_slots=block_slots,
+        outputs=tuple(outputs),
+        out_dtype=dtype,
+        cast=cast,
+        dtype=dtype,
+        new_axis=0,
+        chunks=((len(outputs),),) + arrays[0].chunks,
+        meta=np.empty((0,) * (arrays[0].ndim + 1), dtype=dtype),
+        # processes are slow to tokenize, and every call is a new timestep
+        name=f'clearwater-steps-{uuid.uuid4().hex}',
+    )
+    return [stacked[j] for j in range(len(outputs))]
@@ -0,0 +1,292 @@
+"""Execution plans binding process arguments to integer slots.
+
+An ExecutionPlan is compiled once from a Model computation order. Every variable
+a process reads or writes gets an integer slot, so a timestep is computed on a
+list of arrays without looking up argument names:
+
+    values = [None] * len(plan.slots)
+    for i in plan.loaded:
+        values[i] = ...  # read the variable plan.slots[i]
+    plan.run(values)
+
+Hoisted steps (static-only variables, see sorter.classify_variables()) are
+kept in the plan, but computed once by the Model outside the timestep loop.
+
+Plans can be inspected (print(plan)), and serialized with to_dict() and
+rebuilt with from_dict(). Processes are referenced by their import path, so
+processes that can't be imported (i.e. specialized by specialize.py) can't be
+rebuilt.
+"""
+import concurrent.futures
+import dataclasses
+import functools
+import importlib
+import clearwater_modules.sorter as sorter
+from clearwater_modules.shared.types import (
+    Process,
+    Variable,
+)
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Optional,
+)
+
+PLAN_FORMAT_VERSION: int = 1
+
+
+@dataclasses.dataclass(frozen=True)
+class PlanStep:
+    """A process call in an ExecutionPlan.
+
+    Attributes:
+        name: The name of the variable the process computes.
+        process: The process function.
+        inputs: The slots of the process arguments, in argument order.
+        output: The slot the result is written to.
+        hoisted: True if the step is computed once, outside the timestep loop.
+    """
+    name: str
+    process: Process
+    inputs: tuple[int, ...]
+    output: int
+    hoisted: bool = False
+
+
+def process_path(process: Process) -> str:
+    """Return the 'module:qualname' import path of a process."""
+    name: str = getattr(process, '__qualname__', None) or process.__name__
+    return f'{process.__module__}:{name}'
+
+
+def import_process(path: str) -> Process:
+    """Import a process from a 'module:qualname' path."""
+    module_name, _, qualname = path.partition(':')
+    value: Any = importlib.import_module(module_name)
+    for attr in qualname.split('.'):
+        value = getattr(value, attr)
+    return value
+
+
+@dataclasses.dataclass(frozen=True)
+class ExecutionPlan:
+    """A computation order compiled to integer slots, see the module docstring.
+
+    Attributes:
+        slots: The variable name held in each slot.
+        steps: The process calls in computation order, hoisted steps first.
+        loaded: The slots read by the timestep loop before they are written
+            (i.e. static, state and hoisted variables), that must be loaded
+            every timestep.
+    """
+    slots: tuple[str, ...]
+    steps: tuple[PlanStep, ...]
+    loaded: tuple[int, ...]
+
+    @classmethod
+    def build(
+        cls,
+        computation_order: list[Variable],
+        hoisted: Optional[Iterable[str]] = None,
+    ) -> 'ExecutionPlan':
+        """Compile a computation order.
+
+        Args:
+            computation_order: The sorted dynamic and state variables.
+            hoisted: Names of variables computed once, outside the timestep loop.
+                They must not depend on variables computed in the loop.
+        """
+        hoisted = set(hoisted or [])
+        order: list[Variable] = (
+            [var for var in computation_order if var.name in hoisted] +
+            [var for var in computation_order if var.name not in hoisted]
+        )
+        slot_index: dict[str, int] = {}
+
+        def slot(name: str) -> int:
+            if name not in slot_index:
+                slot_index[name] = len(slot_index)
+            return slot_index[name]
+
+        steps: list[PlanStep] = []
+        # names already written, or loaded, before the current loop step
+        written: set[str] = set()
+        loaded: list[int] = []
+        for var in order:
+            inputs: list[int] = []
+            for arg in sorter.get_process_args(var.process):
+                inputs.append(slot(arg))
+                if var.name not in hoisted and arg not in written:
+                    written.add(arg)
+                    loaded.append(slot(arg))
+            steps.append(
+                PlanStep(
+                    name=var.name,
+                    process=var.process,
+                    inputs=tuple(inputs),
+                    output=slot(var.name),
+                    hoisted=var.name in hoisted,
+                )
+            )
+            if var.name not in hoisted:
+                written.add(var.name)
+
+        return cls(
+            slots=tuple(slot_index.keys()),
+            steps=tuple(steps),
+            loaded=tuple(loaded),
+        )
+
+    @functools.cached_property
+    def hoisted_steps(self) -> tuple[PlanStep, ...]:
+        """Return the steps computed once, outside the timestep loop."""
+        return tuple(step for step in self.steps if step.hoisted)
+
+    @functools.cached_property
+    def loop_steps(self) -> tuple[PlanStep, ...]:
+        """Return the steps computed every timestep."""
+        return tuple(step for step in self.steps if not step.hoisted)
+
+    @functools.cached_property
+    def loop_levels(self) -> tuple[tuple[PlanStep, ...], ...]:
+        """Return the loop steps grouped into levels of independent steps.
+
+        Computing the levels in order, with the steps of a level in any order
+        (or concurrently), gives the same result as computing the loop steps in
+        order. A step comes after the steps computing its inputs, and a step
+        writing a variable (i.e. a state variable) also comes after the steps
+        reading or writing its previous value.
+        """
+        levels: list[list[PlanStep]] = []
+        written: dict[int, int] = {}
+        read: dict[int, int] = {}
+        for step in self.loop_steps:
+            level: int = max(
+                [written[i] + 1 for i in step.inputs if i in written] +
+                [read.get(step.output, -1) + 1, written.get(step.output, -1) + 1],
+            )
+            for i in step.inputs:
+                read[i] = max(read.get(i, -1), level)
+            written[step.output] = level
+            read.pop(step.output, None)
+            if level == len(levels):
+                levels.append([])
+            levels[level].append(step)
+        return tuple(tuple(level) for level in levels)
+
+    def slot(self, name: str) -> int:
+        """Return the slot of a variable."""
+        return self.slots.index(name)
+
+    def args(self, step: PlanStep) -> list[str]:
+        """Return the argument names of a step."""
+        return [self.slots[i] for i in step.inputs]
+
+    def run(
+        self,
+        values: list[Any],
+        cast: Optional[Callable[[Any], Any]] = None,
+        processes: Optional[list[Process]] = None,
+        executor: Optional[concurrent.futures.Executor] = None,
+    ) -> list[Any]:
+        """Compute the loop steps, writing results to their slots.
+
+        Args:
+            values: A list with a value for every slot in ExecutionPlan.loaded.
+            cast: An optional function applied to every result.
+            processes: Optional functions called instead of the loop step
+                processes, in loop step order (i.e. profiled processes).
+            executor: An optional executor computing the steps of each of
+                ExecutionPlan.loop_levels concurrently.
+        """
+        if processes is None:
+            processes = [step.process for step in self.loop_steps]
+        if executor is not None:
+            by_name: dict[str, Process] = {
+                step.name: process
+                for step, process in zip(self.loop_steps, processes)
+            }
+            for level in self.loop_levels:
+                futures: list[tuple[PlanStep, concurrent.futures.Future]] = [
+                    (step, executor.submit(
+                        by_name[step.name], *[values[i] for i in step.inputs]
+                    ))
+                    for step in level
+                ]
+                for step, future in futures:
+                    result = future.result()
+                    values[step.output] = result if cast is None else cast(result)
+            return values
+        for step, process in zip(self.loop_steps, processes):
+            result = process(*[values[i] for i in step.inputs])
+            values[step.output] = result if cast is None else cast(result)
+        return values
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return a JSON serializable description of the plan."""
+        return {
+            'format_version': PLAN_FORMAT_VERSION,
+            'slots': list(self.slots),
+            'loaded': list(self.loaded),
+            'steps': [
+                {
+                    'name': step.name,
+                    'process': process_path(step.process),
+                    'inputs': list(step.inputs),
+                    'output': step.output,
+                    'hoisted': step.hoisted,
+                }
+                for step in self.steps
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> 'ExecutionPlan':
+        """Rebuild a plan from ExecutionPlan.to_dict(), importing its processes."""
+        if data.get('format_version') != PLAN_FORMAT_VERSION:
+            raise ValueError(
+                f'Unsupported plan format version: {data.get("format_version")}.'
+            )
+        steps: list[PlanStep] = []
+        for step in data['steps']:
+            try:
+                process: Process = import_process(step['process'])
+            except (ImportError, AttributeError) as e:
+                raise ValueError(
+                    f'Cannot import the process of {step["name"]}: {step["process"]}.'
+                ) from e
+            # i.e. a specialized process, whose path imports the original
+            if sorter.get_process_args(process) != [data['slots'][i] for i in step['inputs']]:
+                raise ValueError(
+                    f'The arguments of {step["process"]} do not match the plan.'
+                )
+            steps.append(
+                PlanStep(
+                    name=step['name'],
+                    process=process,
+                    inputs=tuple(step['inputs']),
+                    output=step['output'],
+                    hoisted=step['hoisted'],
+                )
+            )
+        return cls(
+            slots=tuple(data['slots']),
+            steps=tuple(steps),
+            loaded=tuple(data['loaded']),
+        )
+
+    def __str__(self) -> str:
+        lines: list[str] = [
+            f'ExecutionPlan: {len(self.slots)} slots, {len(self.steps)} steps '
+            f'({len(self.hoisted_steps)} hoisted), {len(self.loaded)} loaded'
+        ]
+        for step in self.steps:
+            inputs: str = ', '.join(
+                f'{self.slots[i]}[{i}]' for i in step.inputs
+            )
+            lines.append(
+                f'  {"H" if step.hoisted else " "} '
+                f'{step.name}[{step.output}] = {process_path(step.process)}({inputs})'
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,682 @@
+"""Builds fused numba kernels from a model computation order.
+
+Process functions are written for whole arrays and usually call xr.where or
+np.select. To fuse them, each process is recompiled with numba as a scalar
+(per-cell) function, with those array helpers swapped for scalar equivalents.
+Consecutive processes that compile are then generated into a single kernel that
+loops over the cells once, keeping intermediate values in local variables.
+Processes that can't be compiled are called as normal on the full arrays, so
+an ordered plan becomes a list of fused and array steps.
+
+Probing which processes compile, and compiling the kernels, takes seconds for
+large models. With a KernelCache, the fused layout of a computation order and
+the compiled kernels are stored on disk, so later runs (and other processes)
+of the same configuration load them instead.
+"""
+import ast
+import hashlib
+import importlib.util
+import inspect
+import json
+import marshal
+import os
+import sys
+import textwrap
+import types
+import warnings
+from pathlib import Path
+import numba
+import numpy as np
+import xarray as xr
+from numba.core.errors import NumbaError
+from numba.np.numpy_support import as_dtype
+import clearwater_modules.sorter as sorter
+from clearwater_modules.shared.types import (
+    Process,
+    Variable,
+)
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
+
+# bump to invalidate kernel caches when the generated code changes
+KERNEL_CACHE_VERSION: int = 1
+DEFAULT_CACHE_BYTES: int = 512 * 2**20
+
+
+@numba.njit
+def _scalar_where(condition, x, y):
+    if condition:
+        return x
+    return y
+
+
+@numba.njit
+def _scalar_select(condlist, choicelist, default=0.0):
+    for i in range(len(condlist)):
+        if condlist[i]:
+            return choicelist[i]
+    return default
+
+
+def _scalar_module(name: str, module: types.ModuleType, **overrides) -> types.ModuleType:
+    """Return a copy of a module with some attributes swapped for scalar versions."""
+    scalar_module = types.ModuleType(name)
+    scalar_module.__dict__.update(
+        {k: v for k, v in vars(module).items() if not k.startswith('__')}
+    )
+    scalar_module.__dict__.update(overrides)
+    return scalar_module
+
+
+SCALAR_GLOBALS: dict[str, types.ModuleType] = {
+    'xr': _scalar_module('xr', xr, where=_scalar_where),
+    'np': _scalar_module('np', np, where=_scalar_where, select=_scalar_select),
+}
+
+_JIT_CACHE: dict[Callable, numba.core.registry.CPUDispatcher] = {}
+
+
+class _ScalarTransformer(ast.NodeTransformer):
+    """Rewrites array-oriented source for per-cell compilation.
+
+    * List literals passed to np.select become tuples, inside a per-cell kernel
+        a list literal is a heap allocation for every cell.
+    * Calls to the warnings module are dropped.
+    """
+
+    def visit_Expr(self, node: ast.Expr) -> Optional[ast.Expr]:
+        call = node.value
+        if (
+            isinstance(call, ast.Call) and
+            isinstance(call.func, ast.Attribute) and
+            isinstance(call.func.value, ast.Name) and
+            call.func.value.id == 'warnings'
+        ):
+            return None
+        return self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call) -> ast.Call:
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Attribute) and node.func.attr == 'select':
+            for arg in list(node.args) + [keyword.value for keyword in node.keywords]:
+                if isinstance(arg, ast.List):
+                    arg.__class__ = ast.Tuple
+        return node
+
+
+def _scalar_source_function(process: Process, scalar_globals: dict) -> types.FunctionType:
+    """Rebuild a process from its source (see _ScalarTransformer)."""
+    tree: ast.Module = ast.parse(textwrap.dedent(inspect.getsource(process)))
+    tree.body[0].decorator_list = []
+    tree = ast.fix_missing_locations(_ScalarTransformer().visit(tree))
+    namespace: dict = {}
+    exec(compile(tree, inspect.getsourcefile(process), 'exec'), scalar_globals, namespace)
+    return namespace[process.__name__]
+
+
+def jit_process(process: Process) -> numba.core.registry.CPUDispatcher:
+    """Return a lazily compiled numba version of a process for scalar inputs.
+
+    Plain Python functions called by the process are compiled the same way.
+    """
+    if isinstance(process, numba.core.registry.CPUDispatcher):
+        return process
+    if process in _JIT_CACHE:
+        return _JIT_CACHE[process]
+
+    scalar_globals: dict = dict(process.__globals__)
+    for name in process.__code__.co_names:
+        if name in SCALAR_GLOBALS and scalar_globals.get(name) is not None:
+            scalar_globals[name] = SCALAR_GLOBALS[name]
+        elif isinstance(scalar_globals.get(name), types.FunctionType) and scalar_globals[name] is not process:
+            scalar_globals[name] = jit_process(scalar_globals[name])
+
+    if {'select', 'warnings'} & set(process.__code__.co_names):
+        scalar_function = _scalar_source_function(process, scalar_globals)
+    else:
+        scalar_function = types.FunctionType(
+            process.__code__,
+            scalar_globals,
+            process.__name__,
+            process.__defaults__,
+            process.__closure__,
+        )
+    _JIT_CACHE[process] = numba.njit(scalar_function)
+    return _JIT_CACHE[process]
+
+
+def compile_scalar_process(
+    process: Process,
+    arg_types: tuple,
+) -> Optional[numba.types.Type]:
+    """Compile a process for scalar argument types.
+
+    Returns:
+        The scalar return type, or None if the process can't be fused.
+    """
+    dispatcher = jit_process(process)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            dispatcher.compile(arg_types)
+    except (NumbaError, TypeError, ValueError, NotImplementedError):
+        return None
+    return_type = dispatcher.overloads[arg_types].signature.return_type
+    if not isinstance(return_type, (numba.types.Number, numba.types.Boolean)):
+        return None
+    return return_type
+
+
+def process_hash(process: Process, _seen: Optional[set] = None) -> str:
+    """Return a hash of the code of a process and the plain functions it calls.
+
+    The code includes constants folded in by specialize.py, and the file name
+    and line numbers, so editing a process changes its hash.
+    """
+    if isinstance(process, numba.core.registry.CPUDispatcher):
+        process = process.py_func
+    seen: set = set() if _seen is None else _seen
+    seen.add(process)
+    digest = hashlib.sha256(marshal.dumps(process.__code__))
+    digest.update(repr(process.__defaults__).encode())
+    for name in process.__code__.co_names:
+        value = process.__globals__.get(name)
+        if isinstance(value, numba.core.registry.CPUDispatcher):
+            value = value.py_func
+        if isinstance(value, types.FunctionType) and value not in seen:
+            digest.update(process_hash(value, seen).encode())
+    return digest.hexdigest()
+
+
+class KernelCache:
+    """An on-disk cache of fused kernels, shared by runs and processes.
+
+    Kernel sources are written as modules named by a hash of their key, and
+    compiled with numba's cache=True, so numba stores their machine code next
+    to them (in __pycache__). The fused layout of a computation order (which
+    processes fuse, and their return types) is stored as JSON, so a cached
+    configuration neither probes nor compiles the processes.
+
+    Entries are evicted least recently used first, once the files in the
+    cache directory exceed max_bytes.
+
+    Attributes:
+        path: The cache directory.
+        max_bytes: The size the cache is kept under.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_bytes: int = DEFAULT_CACHE_BYTES,
+    ) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def entry_id(key: str) -> str:
+        """Return the file name stem of a cache key."""
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    def _write(self, path: Path, text: str) -> None:
+        """Write a file atomically, so concurrent runs never read a partial file."""
+        temporary: Path = path.with_suffix(f'.{os.getpid()}.tmp')
+        temporary.write_text(text)
+        os.replace(temporary, path)
+
+    def read_layout(self, key: str) -> Optional[Any]:
+        """Return the layout stored for a key, or None."""
+        path: Path = self.path / f'l{self.entry_id(key)}.json'
+        try:
+            layout: Any = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return layout
+
+    def write_layout(self, key: str, layout: Any) -> None:
+        """Store a JSON serializable layout for a key."""
+        stem: str = f'l{self.entry_id(key)}'
+        self._write(self.path / f'{stem}.json', json.dumps(layout))
+        self.evict(keep=stem)
+
+    def jit(
+        self,
+        key: str,
+        source: str,
+        name: str,
+        namespace: dict[str, Any],
+    ) -> numba.core.registry.CPUDispatcher:
+        """Return a cached numba compiled function from generated source.
+
+        Args:
+            key: Identifies the source and the functions it calls.
+            source: The source defining the function.
+            name: The name of the function.
+            namespace: The globals the source refers to (i.e. processes).
+        """
+        stem: str = f'k{self.entry_id(key)}'
+        path: Path = self.path / f'{stem}.py'
+        if not path.exists():
+            self._write(path, source)
+            self.evict(keep=stem)
+        else:
+            os.utime(path)
+
+        module_name: str = f'clearwater_kernels_{stem}'
+        module: types.ModuleType = sys.modules.get(module_name)
+        if module is None:
+            spec = importlib.util.spec_from_file_location(module_name, path)
+            module = importlib.util.module_from_spec(spec)
+            module.__dict__.update(namespace)
+            spec.loader.exec_module(module)
+            # numba imports the module by name when loading a cached function
+            sys.modules[module_name] = module
+        return numba.njit(cache=True)(getattr(module, name))
+
+    def _entries(self) -> dict[str, list[Path]]:
+        """Return the files of each entry, keyed by file name stem."""
+        entries: dict[str, list[Path]] = {}
+        for path in self.path.glob('[kl]*.*'):
+            if path.suffix in ['.py', '.json']:
+                entries.setdefault(path.stem, []).insert(0, path)
+        pycache: Path = self.path / '__pycache__'
+        if pycache.exists():
+            for path in pycache.iterdir():
+                stem: str = path.name.split('.')[0]
+                if stem in entries:
+                    entries[stem].append(path)
+        return entries
+
+    def size(self) -> int:
+        """Return the size of the cached files in bytes."""
+        return sum(
+            path.stat().st_size
+            for paths in self._entries().values() for path in paths
+        )
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Remove least recently used entries until the cache fits max_bytes.
+
+        Args:
+            keep: The file name stem of an entry in use, that is never removed.
+        """
+        entries: list[tuple[float, int, list[Path]]] = []
+        total: int = 0
+        for stem, paths in self._entries().items():
+            if stem == keep:
+                continue
+            try:
+                size: int = sum(path.stat().st_size for path in paths)
+                entries.append((paths[0].stat().st_mtime, size, paths))
+            except OSError:
+                # i.e. removed by another process
+                continue
+            total += size
+        for _, size, paths in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                path.unlink(missing_ok=True)
+            total -= size
+
+
+class FusedStep:
+    """Computes one timestep of a computation order with fused numba kernels.
+
+    The plan is built from example values of every variable (i.e. from a
+    timestep computed with the array engine), which fixes the dtypes and which
+    inputs are scalars.
+
+    Args:
+        computation_order: The ordered variables to compute (dynamic + state).
+        values: A dict of example arrays for all static, state and dynamic variables.
+        keep: Variable names that must be written back to the buffers every
+            timestep (state and tracked variables). Other fused variables only
+            exist inside the kernel.
+        cache: An optional KernelCache to load the layout and kernels from.
+        cache_key: Identifies the configuration (i.e. the model) in the cache.
+            The processes, argument dtypes and keep are always part of the key.
+        dtype: An optional floating point dtype (i.e. Model.dtype) floating
+            point results are cast to. Defaults to the dtypes the processes return.
+    """
+
+    def __init__(
+        self,
+        computation_order: list[Variable],
+        values: dict[str, np.ndarray],
+        keep: list[str],
+        cache: Optional[KernelCache] = None,
+        cache_key: str = '',
+        dtype: Optional[np.dtype] = None,
+    ) -> None:
+        self._values: dict[str, np.ndarray] = values
+        self.dtype: Optional[np.dtype] = None if dtype is None else np.dtype(dtype)
+        self.grid_shape: tuple[int, ...] = np.shape(values[keep[0]])
+        self.size: int = int(np.prod(self.grid_shape))
+        self.steps: list[tuple[str, object, list[str], list[str]]] = []
+        self._cache: Optional[KernelCache] = cache
+
+        process_args: list[list[str]] = [
+            sorter.get_process_args(var.process) for var in computation_order
+        ]
+        self._cache_key: str = ''
+        layout: Optional[list[Optional[str]]] = None
+        if cache is not None:
+            self._cache_key = json.dumps([
+                KERNEL_CACHE_VERSION,
+                cache_key,
+                [
+                    [
+                        var.name,
+                        process_hash(var.process),
+                        [
+                            [arg, np.asarray(values[arg]).dtype.str, np.ndim(values[arg]) == 0]
+                            for arg in args
+                        ],
+                    ]
+                    for var, args in zip(computation_order, process_args)
+                ],
+                sorted(keep),
+            ])
+            layout = cache.read_layout(self._cache_key)
+
+        # split the computation order into runs of fusable processes
+        segments: list[tuple[bool, list[tuple[Variable, list[str], numba.types.Type]]]] = []
+        for i, (var, args) in enumerate(zip(computation_order, process_args)):
+            if layout is not None:
+                # the return dtype of each fusable process, None if not fusable
+                return_type = None if layout[i] is None \
+                    else numba.from_dtype(np.dtype(layout[i]))
+                fusable: bool = return_type is not None
+            else:
+                arg_types = tuple(
+                    numba.from_dtype(np.asarray(values[arg]).dtype) for arg in args
+                )
+                return_type = compile_scalar_process(var.process, arg_types)
+                fusable: bool = return_type is not None and all(
+                    np.ndim(values[arg]) == 0 or np.size(values[arg]) == self.size
+                    for arg in args
+                )
+            if len(segments) == 0 or segments[-1][0] != fusable:
+                segments.append((fusable, []))
+            segments[-1][1].append((var, args, return_type))
+        if cache is not None and layout is None:
+            cache.write_layout(
+                self._cache_key,
+                [
+                    as_dtype(return_type).str if fusable else None
+                    for fusable, members in segments
+                    for _, _, return_type in members
+                ],
+            )
+
+        needed_later: list[set[str]] = []
+        later: set[str] = set(keep)
+        for fusable, members in reversed(segments):
+            needed_later.insert(0, set(later))
+            for var, args, _ in members:
+                later.update(args)
+
+        for (fusable, members), needed in zip(segments, needed_later):
+            if not fusable:
+                for var, args, _ in members:
+                    self.steps.append(('array', var.process, args, [var.name]))
+            else:
+                self.steps.append(
+                    ('fused',) + self._build_kernel(members, needed, values)
+                )
+
+        self.fused_variables: list[str] = [
+            name for kind, _, _, outputs in self.steps
+            if kind == 'fused' for name in outputs
+        ]
+        # a multi-timestep kernel is only possible if everything fused
+        self._members = segments[0][1] if len(self.steps) == 1 and segments[0][0] else None
+        self._run_kernels: dict[tuple, Callable] = {}
+
+    def _member_lines(
+        self,
+        members: list[tuple[Variable, list[str], numba.types.Type]],
+        local: dict[str, str],
+        namespace: dict[str, object],
+        indent: str,
+    ) -> list[str]:
+        """Return the per-cell source lines computing each member, updating local names."""
+        lines: list[str] = []
+        for i, (var, args, _) in enumerate(members):
+            namespace[f'f_{i}'] = jit_process(var.process)
+            call_args: str = ', '.join(local[arg] for arg in args)
+            local[var.name] = f'v_{i}'
+            lines.append(f'{indent}v_{i} = f_{i}({call_args})')
+        return lines
+
+    def _input_lines(
+        self,
+        inputs: list[str],
+        local: dict[str, str],
+        indent: str,
+    ) -> tuple[list[str], list[str]]:
+        """Return source lines loading scalar inputs (once) and array inputs (per cell)."""
+        scalar_lines: list[str] = []
+        array_lines: list[str] = []
+        for i, name in enumerate(inputs):
+            local[name] = f'v_in_{i}'
+            if np.ndim(self._values[name]) == 0:
+                scalar_lines.append(f'    v_in_{i} = in_{i}')
+            else:
+                array_lines.append(f'{indent}v_in_{i} = in_{i}[i]')
+        return scalar_lines, array_lines
+
+    @staticmethod
+    def _kernel_inputs(members: list[tuple[Variable, list[str], numba.types.Type]]) -> list[str]:
+        """Return the names a run of members reads before computing them."""
+        computed: list[str] = [var.name for var, _, _ in members]
+        inputs: list[str] = []
+        for var, args, _ in members:
+            for arg in args:
+                # state processes read their own (previous) value
+                if arg not in inputs and (
+                    arg not in computed[:computed.index(var.name)]
+                ):
+                    inputs.append(arg)
+        return inputs
+
+    def _out_dtype(self, dtype: np.dtype) -> np.dtype:
+        """Return the dtype a result of dtype is stored as."""
+        if self.dtype is not None and dtype.kind == 'f':
+            return self.dtype
+        return dtype
+
+    def _flat(self, array: np.ndarray) -> np.ndarray | int | float | bool:
+        """Return an array flattened over the cells, or a 0-d array as a scalar."""
+        if np.ndim(array) == 0:
+            return np.asarray(array).item()
+        return np.asarray(array).reshape(-1)
+
+    def _jit(
+        self,
+        source: str,
+        name: str,
+        namespace: dict[str, object],
+    ) -> numba.core.registry.CPUDispatcher:
+        """Compile a generated kernel, through the KernelCache if any."""
+        if self._cache is None:
+            exec(source, namespace)
+            return numba.njit(namespace[name])
+        # the cache key identifies the processes the kernel calls
+        return self._cache.jit(self._cache_key + source, source, name, namespace)
+
+    def _build_kernel(
+        self,
+        members: list[tuple[Variable, list[str], numba.types.Type]],
+        needed: set[str],
+        values: dict[str, np.ndarray],
+    ) -> tuple[Callable, list[str], list[str]]:
+        """Generate and jit a kernel for a run of fusable processes."""
+        inputs: list[str] = self._kernel_inputs(members)
+        outputs: list[str] = [var.name for var, _, _ in members if var.name in needed]
+        out_dtypes: dict[str, np.dtype] = {
+            var.name: self._out_dtype(as_dtype(return_type)) for var, _, return_type in members
+        }
+
+        local: dict[str, str] = {}
+        namespace: dict[str, object] = {}
+        header, body = self._input_lines(inputs, local, indent=' ' * 8)
+        body += self._member_lines(members, local, namespace, indent=' ' * 8)
+        body += [
+            f'        out_{i}[i] = {local[name]}' for i, name in enumerate(outputs)
+        ]
+        arg_names: list[str] = [f'in_{i}' for i in range(len(inputs))]
+        arg_names += [f'out_{i}' for i in range(len(outputs))]
+
+        source: str = '\n'.join(
+            [f'def fused_kernel(n, {", ".join(arg_names)}):']
+            + header
+            + ['    for i in range(n):']
+            + body
+            + ['    return None']
+        )
+        kernel = self._jit(source, 'fused_kernel', namespace)
+        kernel.source = source
+
+        def run_kernel(*arrays: np.ndarray) -> list[np.ndarray]:
+            out_arrays: list[np.ndarray] = [
+                np.empty(self.size, dtype=out_dtypes[name]) for name in outputs
+            ]
+            kernel(
+                self.size,
+                *[self._flat(array) for array in arrays],
+                *out_arrays,
+            )
+            return [array.reshape(self.grid_shape) for array in out_arrays]
+
+        run_kernel.kernel = kernel
+        return run_kernel, inputs, outputs
+
+    def _build_run_kernel(
+        self,
+        forced: list[str],
+        recorded: list[str],
+        carry: list[str],
+    ) -> Callable:
+        """Generate and jit a kernel computing many timesteps.
+
+        Cells are the outer loop and timesteps the inner loop, so state values
+        are carried between timesteps in local variables.
+        """
+        members = self._members
+        computed: list[str] = [var.name for var, _, _ in members]
+        inputs: list[str] = self._kernel_inputs(members)
+        for name in forced + recorded + carry:
+            if name not in inputs and (name not in computed or name in carry):
+                inputs.append(name)
+
+        local: dict[str, str] = {}
+        namespace: dict[str, object] = {}
+        header, cell_lines = self._input_lines(inputs, local, indent=' ' * 8)
+        input_local: dict[str, str] = dict(local)
+        step_lines: list[str] = [
+            f'            {input_local[name]} = frc_{i}[t, i]' for i, name in enumerate(forced)
+        ]
+        step_lines += self._member_lines(members, local, namespace, indent=' ' * 12)
+        step_lines += [
+            f'            hist_{i}[t, i] = {local[name]}' for i, name in enumerate(recorded)
+        ]
+        step_lines += [
+            f'            {input_local[name]} = {local[name]}'
+            for name in carry if name in computed
+        ]
+        final_lines: list[str] = [
+            f'        final_{i}[i] = {input_local[name]}' for i, name in enumerate(carry)
+        ]
+        arg_names: list[str] = [f'in_{i}' for i in range(len(inputs))]
+        arg_names += [f'frc_{i}' for i in range(len(forced))]
+        arg_names += [f'hist_{i}' for i in range(len(recorded))]
+        arg_names += [f'final_{i}' for i in range(len(carry))]
+
+        source: str = '\n'.join(
+            [f'def fused_run_kernel(n, n_steps, {", ".join(arg_names)}):']
+            + header
+            + ['    for i in range(n):']
+            + cell_lines
+            + ['        for t in range(n_steps):']
+            + (step_lines if len(step_lines) > 0 else ['            pass'])
+            + final_lines
+            + ['    return None']
+        )
+        kernel = self._jit(source, 'fused_run_kernel', namespace)
+        kernel.source = source
+        kernel.inputs = inputs
+        return kernel
+
+    def run(
+        self,
+        n_steps: int,
+        buffers: dict[str, np.ndarray],
+        forcing: dict[str, np.ndarray],
+        history: dict[str, np.ndarray],
+        carry: list[str],
+    ) -> bool:
+        """Compute many timesteps in a single kernel call, if everything fused.
+
+        Args:
+            n_steps: The number of timesteps to compute.
+            buffers: The current values of all variables, carried variables are
+                updated in place with their values after the last timestep.
+            forcing: Arrays of shape (n_steps, *grid) overriding a variable at
+                the start of each timestep.
+            history: Arrays of shape (n_steps, *grid) to record each timestep in.
+            carry: The variables carried between timesteps (state/updateable).
+
+        Returns:
+            False if the computation order didn't fuse into a single kernel, or
+            the history arrays can't be written to as (n_steps, cells) views.
+        """
+        if self._members is None:
+            return False
+        flat_history: list[np.ndarray] = []
+        for array in history.values():
+            flat: np.ndarray = array.reshape(n_steps, self.size)
+            if not np.shares_memory(flat, array):
+                return False
+            flat_history.append(flat)
+        if any(np.ndim(self._values[name]) == 0 for name in forcing):
+            return False
+
+        key: tuple = (tuple(forcing), tuple(history), tuple(carry))
+        if key not in self._run_kernels:
+            self._run_kernels[key] = self._build_run_kernel(*[list(k) for k in key])
+        kernel: Callable = self._run_kernels[key]
+
+        final: list[np.ndarray] = [
+            np.empty(self.size, dtype=np.asarray(buffers[name]).dtype) for name in carry
+        ]
+        kernel(
+            self.size,
+            n_steps,
+            *[self._flat(buffers[name]) for name in kernel.inputs],
+            *[np.asarray(array).reshape(n_steps, self.size) for array in forcing.values()],
+            *flat_history,
+            *final,
+        )
+        for name, array in zip(carry, final):
+            buffers[name] = array.reshape(self.grid_shape)
+        return True
+
+    def __call__(self, buffers: dict[str, np.ndarray]) -> None:
+        """Compute one timestep, updating the buffers in place."""
+        for kind, func, args, outputs in self.steps:
+            if kind == 'array':
+                result = np.asarray(func(*[buffers[arg] for arg in args]))
+                buffers[outputs[0]] = result.astype(
+                    self._out_dtype(result.dtype), copy=False,
+                )
+            else:
+                results = func(*[buffers[arg] for arg in args])
+                for name, array in zip(outputs, results):
+                    buffers[name] = array
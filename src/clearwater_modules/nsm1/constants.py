@@ -277,6 +277,25 @@ DEFAULT_GLOBALPARAMETERS = GlobalParameters(
     use_POM = True         
 )
 
+# state variables frozen by NutrientBudget(prune_disabled_modules=True)
+MODULE_STATE_VARIABLES: dict[str, list[str]] = {
+    'use_Algae': ['Ap'],
+    'use_Balgae': ['Ab'],
+    'use_NH4': ['NH4'],
+    'use_NO3': ['NO3'],
+    'use_OrgN': ['OrgN'],
+    'use_N2': ['N2'],
+    'use_TIP': ['TIP'],
+    'use_OrgP': ['OrgP'],
+    'use_POC': ['POC'],
+    'use_DOC': ['DOC'],
+    'use_DIC': ['DIC'],
+    'use_POM': ['POM'],
+    'use_DOX': ['DOX'],
+    'use_Pathogen': ['PX'],
+    'use_Alk': ['Alk'],
+}
+
 class GlobalVars(TypedDict):
     vson: float
     vsoc: float
@@ -1,20 +1,52 @@
 """Water Nutrient Simulation Model 1 (NSM1) module."""
 import xarray as xr
 import numpy as np
+import numpy.typing as npt
 from enum import Enum
+from pathlib import Path
 from clearwater_modules.nsm1 import (
     constants,
 )
 from clearwater_modules import base
+import clearwater_modules.kernels as kernels
+import clearwater_modules.profiling as profiling
 import clearwater_modules.shared.processes as shared_processes
 from typing import (
     Optional,
+    Callable,
 )
 
 
 class NutrientBudget(base.Model):
-    """"""
+    """The Nutrient Simulation Model 1 (NSM1).
+
+    Arguments shared with every model are documented in base.Model.__init__.
+
+    Args:
+        algae_parameters ... pathogen_parameters: Static values of each
+            module, overriding the defaults in nsm1.constants.
+        global_parameters: The module switches (i.e. use_Algae, use_DOX),
+            overriding constants.DEFAULT_GLOBALPARAMETERS.
+        global_vars: Global static values (i.e. dt, depth, velocity), overriding
+            constants.DEFAULT_GLOBALVARS.
+        prune_disabled_modules: If True, the state variables of the modules
+            switched off in global_parameters (see
+            constants.MODULE_STATE_VARIABLES) are frozen at their initial
+            values, and constants are folded (fold_constants=True), so the
+            processes of disabled modules are left out of the computation
+            order.
+            NOTE: this changes the outputs, not only the cost. Without it,
+            Ap, Ab, N2, POC, DOC, DIC, POM, PX and DOX still change through
+            their X + dXdt * dt processes (which aren't gated by the
+            switches) when their module is off, while pruned they keep
+            their initial values.
+    """
     _variables: list[base.Variable] = []
+    _variable_modules: tuple[str, ...] = (
+        'clearwater_modules.nsm1.state_variables',
+        'clearwater_modules.nsm1.dynamic_variables',
+        'clearwater_modules.nsm1.static_variables',
+    )
 
     def __init__(
         self,
@@ -37,20 +69,39 @@ class NutrientBudget(base.Model):
         track_dynamic_variables: bool = True,
         hotstart_dataset: Optional[xr.Dataset] = None,
         time_dim: Optional[str] = None,
+        engine: base.EngineTypes = 'xarray',
+        history_length: Optional[int] = None,
+        history_sink: Optional[Callable[[xr.Dataset], None]] = None,
+        output_interval: int = 1,
+        output_aggregation: Optional[list[base.AggregationTypes]] = None,
+        output_variables: Optional[list[str]] = None,
+        dtype: Optional[npt.DTypeLike] = None,
+        frozen_variables: Optional[list[str]] = None,
+        fold_constants: bool = False,
+        threads: Optional[int] = None,
+        chunks: Optional[dict[str, int]] = None,
+        ensemble_dim: Optional[str] = None,
+        history_dir: Optional[str | Path] = None,
+        kernel_cache: Optional[str | Path | kernels.KernelCache] = None,
+        profile: bool | profiling.ProcessProfiler = False,
+        max_memory: Optional[int] = None,
+        memory_fallback: base.MemoryFallbackTypes = 'raise',
+        prune_disabled_modules: bool = False,
+        timestep: int = 0,
     ) -> None:
-        self.__algae_parameters: constants.AlgaeStaticVariables = constants.DEFAULT_ALGAE
-        self.__alkalinity_parameters: constants.AlkalinityStaticVariables = constants.DEFAULT_ALKALINITY
-        self.__balgae_parameters: constants.BalgaeStaticVariables = constants.DEFAULT_BALGAE
-        self.__carbon_parameters: constants.CarbonStaticVariables = constants.DEFAULT_CARBON
-        self.__CBOD_parameters: constants.CBODStaticVariables = constants.DEFAULT_CBOD
-        self.__DOX_parameters: constants.DOXStaticVariables = constants.DEFAULT_DOX
-        self.__nitrogen_parameters: constants.NitrogenStaticVariables = constants.DEFAULT_NITROGEN
-        self.__POM_parameters: constants.POMStaticVariables = constants.DEFAULT_POM
-        self.__N2_parameters: constants.N2StaticVariables = constants.DEFAULT_N2
-        self.__phosphorus_parameters: constants.PhosphorusStaticVariables = constants.DEFAULT_PHOSPHORUS
-        self.__pathogen_parameters: constants.PathogenStaticVariables = constants.DEFAULT_PATHOGEN
-        self.__global_parameters: constants.PathogenStaticVariables = constants.DEFAULT_GLOBALPARAMETERS
-        self.__global_vars: constants.PathogenStaticVariables = constants.DEFAULT_GLOBALVARS
+        self.__algae_parameters: constants.AlgaeStaticVariables = constants.DEFAULT_ALGAE.copy()
+        self.__alkalinity_parameters: constants.AlkalinityStaticVariables = constants.DEFAULT_ALKALINITY.copy()
+        self.__balgae_parameters: constants.BalgaeStaticVariables = constants.DEFAULT_BALGAE.copy()
+        self.__carbon_parameters: constants.CarbonStaticVariables = constants.DEFAULT_CARBON.copy()
+        self.__CBOD_parameters: constants.CBODStaticVariables = constants.DEFAULT_CBOD.copy()
+        self.__DOX_parameters: constants.DOXStaticVariables = constants.DEFAULT_DOX.copy()
+        self.__nitrogen_parameters: constants.NitrogenStaticVariables = constants.DEFAULT_NITROGEN.copy()
+        self.__POM_parameters: constants.POMStaticVariables = constants.DEFAULT_POM.copy()
+        self.__N2_parameters: constants.N2StaticVariables = constants.DEFAULT_N2.copy()
+        self.__phosphorus_parameters: constants.PhosphorusStaticVariables = constants.DEFAULT_PHOSPHORUS.copy()
+        self.__pathogen_parameters: constants.PathogenStaticVariables = constants.DEFAULT_PATHOGEN.copy()
+        self.__global_parameters: constants.PathogenStaticVariables = constants.DEFAULT_GLOBALPARAMETERS.copy()
+        self.__global_vars: constants.PathogenStaticVariables = constants.DEFAULT_GLOBALVARS.copy()
         
 
 
@@ -168,6 +219,16 @@ class NutrientBudget(base.Model):
         # TODO: make sure this feature works -> test it, but post demo
         #static_variable_values['use_sed_temp'] = use_sed_temp
 
+        # freeze the states of disabled modules, and fold the switches
+        if prune_disabled_modules:
+            frozen_variables = list(frozen_variables or [])
+            for switch, state_names in constants.MODULE_STATE_VARIABLES.items():
+                if not self.__global_parameters[switch]:
+                    frozen_variables += [
+                        name for name in state_names if name not in frozen_variables
+                    ]
+            fold_constants = True
+
         super().__init__(
             time_steps=time_steps,
             initial_state_values=initial_state_values,
@@ -176,6 +237,24 @@ class NutrientBudget(base.Model):
             track_dynamic_variables=track_dynamic_variables,
             hotstart_dataset=hotstart_dataset,
             time_dim=time_dim,
+            engine=engine,
+            history_length=history_length,
+            history_sink=history_sink,
+            output_interval=output_interval,
+            output_aggregation=output_aggregation,
+            output_variables=output_variables,
+            dtype=dtype,
+            frozen_variables=frozen_variables,
+            fold_constants=fold_constants,
+            threads=threads,
+            chunks=chunks,
+            ensemble_dim=ensemble_dim,
+            history_dir=history_dir,
+            kernel_cache=kernel_cache,
+            profile=profile,
+            max_memory=max_memory,
+            memory_fallback=memory_fallback,
+            timestep=timestep,
         )
 
     @property
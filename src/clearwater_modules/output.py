@@ -0,0 +1,173 @@
+"""Output writers streaming Model history to disk in time chunks.
+
+A writer is used as a Model.history_sink together with Model.history_length,
+so only the last history_length timesteps are held in memory:
+
+    writer = ChunkedWriter('tsm_output')
+    model = EnergyBudget(
+        ...,
+        engine='numpy',
+        history_length=24,
+        history_sink=writer,
+    )
+    model.run()
+    model.flush_history()
+    dataset = writer.read()
+
+Every time the ring buffer wraps, the completed chunk of timesteps is written
+and its slots are reused. NetCDF and npz chunks are written as separate files,
+so chunks written so far can be read while the model is still running.
+"""
+import importlib.util
+from pathlib import Path
+import numpy as np
+import xarray as xr
+from clearwater_modules.shared.types import OutputFormatTypes
+from typing import (
+    get_args,
+    Optional,
+)
+
+NETCDF_ENGINES: list[str] = ['netCDF4', 'h5netcdf', 'scipy']
+
+
+def _is_installed(module_name: str) -> bool:
+    """Return True if a module can be imported."""
+    return importlib.util.find_spec(module_name) is not None
+
+
+def available_formats() -> list[str]:
+    """Return the output formats that can be written in this environment."""
+    formats: list[str] = []
+    if any(_is_installed(engine) for engine in NETCDF_ENGINES):
+        formats.append('netcdf')
+    if _is_installed('zarr'):
+        formats.append('zarr')
+    formats.append('npz')
+    return formats
+
+
+class ChunkedWriter:
+    """Writes chunks of Model history to disk, see the module docstring.
+
+    Attributes:
+        path: The output directory (a store for 'zarr').
+        format: The output format.
+        time_dim: The model time dimension name.
+        chunks: (first, last) timesteps of each chunk written so far.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        format: Optional[OutputFormatTypes] = None,
+        time_dim: str = 'time_step',
+    ) -> None:
+        """Initialize the writer.
+
+        Args:
+            path: The output directory. Per-chunk files are named by their first
+                timestep. For 'zarr' this is the store that chunks are appended to.
+            format: 'netcdf', 'zarr' or 'npz'. Defaults to the first of
+                available_formats().
+            time_dim: The model time dimension name (Model.time_dim).
+        """
+        if format is None:
+            format = available_formats()[0]
+        if format not in get_args(OutputFormatTypes):
+            raise ValueError(
+                f'Invalid format: {format}. Must be one of {get_args(OutputFormatTypes)}.'
+            )
+        if format not in available_formats():
+            raise ImportError(
+                f'No backend is installed to write {format} output.'
+            )
+        self.path = Path(path)
+        self.format = format
+        self.time_dim = time_dim
+        self.chunks: list[tuple[int, int]] = []
+
+    def __call__(self, block: xr.Dataset) -> None:
+        """Write a chunk of timesteps (the Model.history_sink interface)."""
+        timesteps: np.ndarray = block[self.time_dim].values
+        first, last = int(timesteps[0]), int(timesteps[-1])
+
+        if self.format == 'zarr':
+            if self.chunks:
+                block[
+                    [
+                        name for name, data_array in block.data_vars.items()
+                        if self.time_dim in data_array.dims
+                    ]
+                ].to_zarr(self.path, append_dim=self.time_dim)
+            else:
+                block.to_zarr(self.path, mode='w')
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            file_path: Path = self._chunk_path(first)
+            if self.format == 'netcdf':
+                block.to_netcdf(file_path)
+            else:
+                self._write_npz(block, file_path)
+
+        self.chunks.append((first, last))
+
+    def _chunk_path(self, first_timestep: int) -> Path:
+        """Return the file path of a chunk."""
+        suffix: str = '.nc' if self.format == 'netcdf' else '.npz'
+        return self.path / f'chunk_{first_timestep:08d}{suffix}'
+
+    @staticmethod
+    def _write_npz(block: xr.Dataset, file_path: Path) -> None:
+        """Write a dataset as arrays, storing each variable's dims alongside it."""
+        arrays: dict[str, np.ndarray] = {}
+        for name, variable in block.variables.items():
+            arrays[name] = variable.values
+            arrays[f'{name}.dims'] = np.array(variable.dims, dtype=str)
+        np.savez(file_path, **arrays)
+
+    @staticmethod
+    def _read_npz(file_path: Path) -> xr.Dataset:
+        """Read a chunk written by ChunkedWriter._write_npz."""
+        with np.load(file_path) as arrays:
+            names: list[str] = [
+                name for name in arrays.files if not name.endswith('.dims')
+            ]
+            variables: dict[str, tuple] = {
+                name: (tuple(arrays[f'{name}.dims']), arrays[name])
+                for name in names
+            }
+        coords = {
+            name: value for name, value in variables.items()
+            if value[0] == (name,)
+        }
+        return xr.Dataset(
+            data_vars={
+                name: value for name, value in variables.items()
+                if name not in coords
+            },
+            coords=coords,
+        )
+
+    def read(self) -> xr.Dataset:
+        """Read all chunks written so far as a single dataset."""
+        if not self.chunks:
+            raise ValueError('No chunks have been written yet.')
+        if self.format == 'zarr':
+            return xr.open_zarr(self.path).load()
+
+        datasets: list[xr.Dataset] = []
+        for first, _ in self.chunks:
+            file_path: Path = self._chunk_path(first)
+            if self.format == 'netcdf':
+                with xr.open_dataset(file_path) as dataset:
+                    datasets.append(dataset.load())
+            else:
+                datasets.append(self._read_npz(file_path))
+        return xr.concat(
+            datasets,
+            dim=self.time_dim,
+            data_vars='minimal',
+            coords='minimal',
+            compat='override',
+        )
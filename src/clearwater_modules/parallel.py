@@ -0,0 +1,518 @@
+"""Spatial domain decomposition of a Model over a pool of worker processes.
+
+Processes are elementwise over the spatial dimensions, so a mesh can be split
+into tiles along one dimension, and each tile stepped independently:
+
+    with TiledModel(model, tiles=4) as tiled:
+        for forcing in driver:
+            tiled.increment_timestep(update_state_values=forcing)
+    model.dataset  # the reassembled results
+
+Each tile is stepped by a copy of the model, in its own worker process. The
+arrays written by the engine (temporal, aggregated and current variables) are
+moved to shared memory, and every worker writes its tile of them in place, so
+Model.dataset holds the whole mesh without gathering results. Updates between
+timesteps (and forcing passed to TiledModel.run()) are also passed through
+shared memory, the pipes to the workers only carry short commands.
+
+If a worker fails, the tiles of the other workers have already advanced, so
+every tile is reset to the timestep before the failed command, and a
+RuntimeError is raised. The model can then be stepped again from there.
+
+NOTE: workers unpickle the model class, so variables registered at runtime
+(i.e. outside of the model's modules) are only seen by workers started with
+the 'fork' start method.
+"""
+import gc
+import multiprocessing
+import multiprocessing.connection
+import traceback
+import numpy as np
+import xarray as xr
+from multiprocessing import shared_memory
+import clearwater_modules.utils as utils
+from clearwater_modules.base import Model
+from typing import (
+    Any,
+    Optional,
+)
+
+# (shared memory name, shape, dtype, axis of the tiled dimension)
+SharedArraySpec = tuple[str, tuple[int, ...], str, int]
+
+
+class SharedArray:
+    """A NumPy array allocated in shared memory."""
+
+    def __init__(self, shape: tuple[int, ...], dtype: np.dtype, axis: int) -> None:
+        self.axis = axis
+        self.memory = shared_memory.SharedMemory(
+            create=True,
+            size=max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1),
+        )
+        self.array: np.ndarray = np.ndarray(shape, dtype=dtype, buffer=self.memory.buf)
+
+    @property
+    def spec(self) -> SharedArraySpec:
+        return (self.memory.name, self.array.shape, self.array.dtype.str, self.axis)
+
+    def release(self) -> None:
+        """Free the shared memory, the array must not be used afterwards."""
+        del self.array
+        try:
+            self.memory.close()
+        except BufferError:
+            # views of the array are still referenced, the memory is unmapped
+            # once they are garbage collected
+            pass
+        self.memory.unlink()
+
+
+def _attach(
+    spec: SharedArraySpec,
+    tile: slice,
+    attached: dict[str, shared_memory.SharedMemory],
+) -> np.ndarray:
+    """Return the tile of an array in shared memory, attaching to it once."""
+    name, shape, dtype, axis = spec
+    if name not in attached:
+        attached[name] = shared_memory.SharedMemory(name=name)
+    array: np.ndarray = np.ndarray(shape, dtype=dtype, buffer=attached[name].buf)
+    return array[(slice(None),) * axis + (tile,)]
+
+
+def _snapshot(model: Model, n_steps: int) -> dict[str, Any]:
+    """Return what stepping a model n_steps overwrites, to restore it on failure.
+
+    That is the carried (state/updateable) values, the running aggregations,
+    the current variables and, with a ring buffer, the slots of the records
+    written. Records past the current one of a full history hold no results,
+    so they are only cleared on restore.
+    """
+    if model._buffers is None:
+        model._bind_buffers()
+    first_record: int = model._elapsed_timesteps // model.output_interval + 1
+    last_record: int = (model._elapsed_timesteps + n_steps) // model.output_interval
+    records: range = range(first_record, last_record + 1)
+    if model.history_length is not None and len(records) > model.history_length:
+        records = range(first_record, first_record + model.history_length)
+    slots: list[int] = [model._record_slot(record) for record in records]
+    histories: dict[Any, np.ndarray] = {
+        **model._history,
+        **model._aggregate_history,
+    }
+    return {
+        'timestep': model.timestep,
+        'window_steps': model._window_steps,
+        'buffers': {
+            var_name: np.array(model._buffers[var_name])
+            for var_name in model.state_variables_names + model.updateable_static_variables
+        },
+        'aggregates': {
+            var_name: {stat: accumulator.copy() for stat, accumulator in stats.items()}
+            for var_name, stats in model._aggregates.items()
+        },
+        'current': {
+            var_name: current.copy() for var_name, current in model._current.items()
+        },
+        'slots': slots,
+        'records': {
+            key: history[slots].copy() if model.history_length is not None else None
+            for key, history in histories.items()
+        },
+    }
+
+
+def _restore(model: Model, snapshot: dict[str, Any]) -> None:
+    """Reset a model to the timestep of a _snapshot()."""
+    model.timestep = snapshot['timestep']
+    if model._buffers is None:
+        model._bind_buffers()
+    histories: dict[Any, np.ndarray] = {
+        **model._history,
+        **model._aggregate_history,
+    }
+    for key, history in histories.items():
+        records: Optional[np.ndarray] = snapshot['records'][key]
+        if records is None:
+            history[snapshot['slots']] = np.nan
+        else:
+            history[snapshot['slots']] = records
+    for var_name, current in model._current.items():
+        current[...] = snapshot['current'][var_name]
+    model._buffers.update(
+        {var_name: value.copy() for var_name, value in snapshot['buffers'].items()}
+    )
+    for var_name, stats in model._aggregates.items():
+        for stat, accumulator in stats.items():
+            accumulator[...] = snapshot['aggregates'][var_name][stat]
+    model._window_steps = snapshot['window_steps']
+    model._window = None
+
+
+def _carried(model: Model) -> Optional[dict[str, Any]]:
+    """Return the values a model carries between records, None if it never stepped.
+
+    That is the carried (state/updateable) values, the running aggregations
+    and the number of timesteps they aggregate.
+    """
+    if model._buffers is None:
+        return None
+    return {
+        'buffers': {
+            var_name: model._buffers[var_name]
+            for var_name in model.state_variables_names + model.updateable_static_variables
+        },
+        'aggregates': model._aggregates,
+        'window_steps': model._window_steps,
+    }
+
+
+def _work(
+    connection: multiprocessing.connection.Connection,
+    model: Model,
+    tile: slice,
+    shared: dict[str, tuple[SharedArraySpec, tuple[str, ...], dict]],
+) -> None:
+    """Step a tile of a model on commands received from a TiledModel."""
+    attached: dict[str, shared_memory.SharedMemory] = {}
+    dataset: Optional[xr.Dataset] = model._dataset
+    try:
+        for var_name, (spec, dims, attrs) in shared.items():
+            dataset[var_name] = xr.DataArray(
+                _attach(spec, tile, attached),
+                dims=dims,
+                attrs=attrs,
+            )
+        model.dataset = dataset
+
+        snapshot: Optional[dict[str, Any]] = None
+        while True:
+            command, args = connection.recv()
+            if command == 'close':
+                break
+            if command == 'state':
+                connection.send(('ok', _carried(model)))
+                continue
+            try:
+                if command == 'rollback':
+                    if snapshot is not None:
+                        _restore(model, snapshot)
+                    snapshot = None
+                elif command == 'step':
+                    # a stale snapshot must not be restored if this one fails
+                    snapshot = None
+                    snapshot = _snapshot(model, 1)
+                    model.increment_timestep(
+                        update_state_values={
+                            var_name: xr.DataArray(
+                                _attach(spec, tile, attached),
+                                dims=model._timestep_dims(var_name),
+                            )
+                            for var_name, spec in args.items()
+                        }
+                    )
+                else:
+                    n_steps, forcing = args
+                    snapshot = None
+                    snapshot = _snapshot(model, n_steps)
+                    model.run(
+                        n_steps,
+                        forcing={
+                            var_name: _attach(spec, tile, attached)
+                            for var_name, spec in forcing.items()
+                        },
+                    )
+                connection.send(('ok', model.timestep))
+            except Exception:
+                connection.send(('error', traceback.format_exc()))
+    finally:
+        # views of the shared memory must be dropped before detaching
+        model = dataset = None
+        gc.collect()
+        for memory in attached.values():
+            memory.close()
+        connection.close()
+
+
+class TiledModel:
+    """Steps a Model in tiles along a spatial dimension, one worker process per tile.
+
+    Attributes:
+        model: The model, whose dataset holds the reassembled results.
+        dim: The tiled dimension.
+        tiles: The slice of Model.dataset[dim] stepped by each worker.
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        tiles: int,
+        dim: Optional[str] = None,
+        mp_context: Optional[str] = None,
+    ) -> None:
+        """Start the worker processes.
+
+        Args:
+            model: A model using the 'numpy' or 'numba' engine, it should not
+                be stepped directly until TiledModel.close() is called.
+            tiles: The number of tiles (and worker processes).
+            dim: The dimension to split into tiles. Defaults to the largest
+                dimension of the state variables (other than Model.time_dim).
+            mp_context: An optional multiprocessing start method ('fork',
+                'spawn' or 'forkserver'), defaults to the platform default.
+        """
+        if model.engine not in ['numpy', 'numba']:
+            raise ValueError(
+                "TiledModel requires the 'numpy' or 'numba' engine."
+            )
+        if model.history_sink is not None:
+            raise ValueError('TiledModel does not support history_sink.')
+        if model._elapsed_timesteps % model.output_interval != 0:
+            raise ValueError(
+                'TiledModel must start from a recorded timestep.'
+            )
+        spatial_dims: dict[str, int] = {}
+        for var_name in model.state_variables_names:
+            for dim_name in model._timestep_dims(var_name):
+                spatial_dims[dim_name] = model._dataset.sizes[dim_name]
+        if dim is None and spatial_dims:
+            dim = max(spatial_dims, key=spatial_dims.get)
+        if dim not in spatial_dims:
+            raise ValueError(
+                f'Cannot tile along {dim}, must be one of {list(spatial_dims)}.'
+            )
+        if not 1 <= tiles <= spatial_dims[dim]:
+            raise ValueError(
+                f'tiles must be between 1 and the size of {dim} ({spatial_dims[dim]}).'
+            )
+        self.model = model
+        self.dim = dim
+        bounds: np.ndarray = np.linspace(0, spatial_dims[dim], tiles + 1).astype(int)
+        self.tiles: list[slice] = [
+            slice(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+
+        # move the arrays written by the engine to shared memory
+        self._shared: dict[str, SharedArray] = {}
+        self._updates: dict[str, SharedArray] = {}
+        shared: dict[str, tuple[SharedArraySpec, tuple[str, ...], dict]] = {}
+        dataset: xr.Dataset = model._dataset
+        for var_name, data_array in dataset.data_vars.items():
+            if dim not in data_array.dims or \
+                    var_name in model._non_updateable_static_variables:
+                continue
+            array = SharedArray(
+                data_array.shape,
+                data_array.dtype,
+                data_array.dims.index(dim),
+            )
+            array.array[...] = data_array.values
+            self._shared[var_name] = array
+            shared[var_name] = (array.spec, data_array.dims, data_array.attrs)
+            dataset[var_name] = data_array.copy(data=array.array)
+        model.dataset = dataset
+
+        context = multiprocessing.get_context(mp_context)
+        tile_dataset: xr.Dataset = dataset.drop_vars(list(shared))
+        self._connections: list[multiprocessing.connection.Connection] = []
+        self._workers: list[multiprocessing.process.BaseProcess] = []
+        for tile in self.tiles:
+            tile_model: Model = model.__class__.__new__(model.__class__)
+            tile_model.__setstate__(
+                {
+                    **model.__getstate__(),
+                    'initial_state_values': None,
+                    'static_variable_values': None,
+                    '_dataset': tile_dataset.isel({dim: tile}),
+                }
+            )
+            connection, worker_connection = context.Pipe()
+            worker = context.Process(
+                target=_work,
+                args=(worker_connection, tile_model, tile, shared),
+                daemon=True,
+            )
+            worker.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._workers.append(worker)
+
+    @property
+    def dataset(self) -> xr.Dataset:
+        """The model dataset, holding the results of all tiles."""
+        return self.model.dataset
+
+    def _send(self, command: str, args: Any) -> list[str]:
+        """Send a command to every worker, and return the errors of those that failed."""
+        for connection in self._connections:
+            connection.send((command, args))
+        errors: list[str] = []
+        for connection in self._connections:
+            status, result = connection.recv()
+            if status == 'error':
+                errors.append(result)
+        return errors
+
+    def _broadcast(self, command: str, args: Any) -> None:
+        """Send a command to every worker, and wait for them to finish it.
+
+        If a worker fails, the tiles of the others have already advanced, so
+        every tile is reset to the timestep before the command (i.e.
+        Model.timestep) before raising.
+        """
+        if not self._workers:
+            raise ValueError('TiledModel is closed.')
+        errors: list[str] = self._send(command, args)
+        if errors:
+            errors += self._send('rollback', None)
+            self.model._window = None
+            raise RuntimeError(
+                f'A worker failed to step its tile, every tile was reset to '
+                f'timestep {self.model.timestep}:\n' + '\n'.join(errors)
+            )
+
+    def _tiled_axis(self, var_name: str, dims: tuple[str, ...]) -> int:
+        """Return the axis of TiledModel.dim in a variable's dimensions."""
+        if self.dim not in dims:
+            raise ValueError(
+                f'Variable {var_name} must have dimension {self.dim} to be tiled.'
+            )
+        return dims.index(self.dim)
+
+    def increment_timestep(
+        self,
+        update_state_values: Optional[dict[str, xr.DataArray]] = None,
+    ) -> xr.Dataset:
+        """Step every tile one timestep, see Model.increment_timestep()."""
+        if update_state_values is None:
+            update_state_values = {}
+        model: Model = self.model
+        updates: dict[str, SharedArraySpec] = {}
+        for var_name, value in update_state_values.items():
+            if var_name not in (model.state_variables_names + model.updateable_static_variables):
+                raise ValueError(
+                    f'Variable {var_name} cannot be updated between timesteps, skipping.',
+                )
+            dims: tuple[str, ...] = model._timestep_dims(var_name)
+            utils.validate_dims(value, dims)
+            if var_name not in self._updates:
+                self._updates[var_name] = SharedArray(
+                    tuple(model._dataset.sizes[dim] for dim in dims),
+                    model._dataset[var_name].dtype,
+                    self._tiled_axis(var_name, dims),
+                )
+            self._updates[var_name].array[...] = value.transpose(*dims).values
+            updates[var_name] = self._updates[var_name].spec
+
+        self._broadcast('step', updates)
+        model.timestep += 1
+        return self.dataset
+
+    def run(
+        self,
+        n_steps: Optional[int] = None,
+        forcing: Optional[dict[str, xr.DataArray | np.ndarray]] = None,
+    ) -> xr.Dataset:
+        """Run every tile for multiple timesteps, see Model.run()."""
+        model: Model = self.model
+        remaining: int = model._remaining_timesteps()
+        if n_steps is None:
+            n_steps = remaining
+        if n_steps > remaining:
+            raise ValueError(
+                f'Cannot run {n_steps} timesteps, only {remaining} remaining.'
+            )
+        forcing_arrays: dict[str, np.ndarray] = model._prep_forcing(
+            n_steps,
+            forcing or {},
+        )
+        arrays: dict[str, SharedArray] = {}
+        try:
+            for var_name, values in forcing_arrays.items():
+                arrays[var_name] = SharedArray(
+                    values.shape,
+                    model._dataset[var_name].dtype,
+                    self._tiled_axis(var_name, model._timestep_dims(var_name)) + 1,
+                )
+                arrays[var_name].array[...] = values
+            self._broadcast(
+                'run',
+                (n_steps, {var_name: array.spec for var_name, array in arrays.items()}),
+            )
+        finally:
+            for array in arrays.values():
+                array.release()
+        model.timestep += n_steps
+        return self.dataset
+
+    def close(self) -> None:
+        """Stop the workers, and move the model dataset out of shared memory.
+
+        The model can be stepped directly again afterwards. Between records
+        (i.e. with output_interval), the values the workers carry since the
+        last record are gathered into the model first.
+        """
+        carried: list[Optional[dict[str, Any]]] = []
+        if self._workers and self.model._elapsed_timesteps % self.model.output_interval != 0:
+            carried = self._gather_carried()
+        for connection in self._connections:
+            try:
+                connection.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.join()
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self._workers = []
+
+        model: Model = self.model
+        dataset: xr.Dataset = model._dataset
+        for var_name in self._shared:
+            dataset[var_name] = dataset[var_name].copy(deep=True)
+        model.dataset = dataset
+        model._window = None
+        for array in list(self._shared.values()) + list(self._updates.values()):
+            array.release()
+        self._shared = {}
+        self._updates = {}
+        if carried and all(tile is not None for tile in carried):
+            self._restore_carried(carried)
+
+    def _gather_carried(self) -> list[Optional[dict[str, Any]]]:
+        """Return the values carried by each worker, see _carried()."""
+        for connection in self._connections:
+            connection.send(('state', None))
+        return [connection.recv()[1] for connection in self._connections]
+
+    def _restore_carried(self, carried: list[dict[str, Any]]) -> None:
+        """Bind the model buffers, with the carried values of the tiles."""
+        model: Model = self.model
+        model._bind_buffers()
+
+        def join(var_name: str, tiles: list[np.ndarray]) -> np.ndarray:
+            dims: tuple[str, ...] = model._timestep_dims(var_name)
+            if self.dim not in dims or np.ndim(tiles[0]) == 0:
+                return tiles[0]
+            return np.concatenate(tiles, axis=dims.index(self.dim))
+
+        for var_name in carried[0]['buffers']:
+            model._buffers[var_name] = join(
+                var_name,
+                [tile['buffers'][var_name] for tile in carried],
+            )
+        for var_name, stats in model._aggregates.items():
+            for stat, accumulator in stats.items():
+                accumulator[...] = join(
+                    var_name,
+                    [tile['aggregates'][var_name][stat] for tile in carried],
+                )
+        model._window_steps = carried[0]['window_steps']
+
+    def __enter__(self) -> 'TiledModel':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,171 @@
+"""Per-process profiling of model timesteps.
+
+A ProcessProfiler wraps the processes of a Model computation order, and
+records for every process its wall time, number of calls, bytes allocated
+and the number of NaN values in its output, aggregated across timesteps:
+
+    model = NutrientBudget(..., engine='numpy', profile=True)
+    model.run()
+    print(model.profiler.table())
+    model.profiler.write_trace('nsm1_trace.json')
+
+The trace file is in the Chrome trace event format (open it in
+chrome://tracing or https://ui.perfetto.dev), and also holds the aggregated
+statistics under a 'processes' key.
+
+Bytes allocated are measured with tracemalloc (started by the profiler if
+it isn't tracing already) as the peak traced memory during a call above the
+memory traced before it, so they include temporary arrays.
+"""
+import dataclasses
+import json
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from clearwater_modules.shared.types import Process
+from typing import (
+    Any,
+    Optional,
+)
+
+DEFAULT_MAX_EVENTS: int = 100_000
+
+
+@dataclasses.dataclass
+class ProcessStats:
+    """The statistics of a process, aggregated across calls.
+
+    Attributes:
+        calls: The number of calls.
+        seconds: The total wall time of the calls.
+        bytes_allocated: The total bytes allocated by the calls.
+        nan_count: The total number of NaN values in the outputs.
+    """
+    calls: int = 0
+    seconds: float = 0.0
+    bytes_allocated: int = 0
+    nan_count: int = 0
+
+
+class ProcessProfiler:
+    """Records per-process statistics, see the module docstring.
+
+    Attributes:
+        stats: The ProcessStats of each variable, in order of first call.
+        events: (name, start, duration) of calls, in seconds since the
+            profiler was created (or reset), kept for the trace until max_events.
+        track_memory: Whether bytes allocated are measured (tracemalloc slows
+            down allocations, so it can be turned off for timings only).
+        max_events: The number of calls kept for the trace. Statistics keep
+            aggregating after the limit.
+    """
+
+    def __init__(
+        self,
+        track_memory: bool = True,
+        max_events: int = DEFAULT_MAX_EVENTS,
+    ) -> None:
+        self.track_memory = track_memory
+        self.max_events = max_events
+        self.stats: dict[str, ProcessStats] = {}
+        self.events: list[tuple[str, float, float]] = []
+        self._origin: float = time.perf_counter()
+        self._started_tracing: bool = False
+
+    def wrap(self, name: str, process: Process) -> Process:
+        """Return a function calling a process, and recording it under name."""
+        def profiled(*args):
+            return self.call(name, process, args)
+        profiled.__name__ = getattr(process, '__name__', name)
+        profiled.__wrapped__ = process
+        return profiled
+
+    def call(self, name: str, process: Process, args: tuple) -> Any:
+        """Call a process with args, and record the call under name."""
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.track_memory:
+            traced: int = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start: float = time.perf_counter()
+        result: Any = process(*args)
+        seconds: float = time.perf_counter() - start
+        allocated: int = 0
+        if self.track_memory:
+            allocated = max(tracemalloc.get_traced_memory()[1] - traced, 0)
+
+        nan_count: int = 0
+        dtype: Optional[np.dtype] = getattr(result, 'dtype', None)
+        if dtype is None or dtype.kind in 'fc':
+            nan_count = int(np.count_nonzero(np.isnan(result)))
+
+        stats: Optional[ProcessStats] = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = ProcessStats()
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.bytes_allocated += allocated
+        stats.nan_count += nan_count
+        if len(self.events) < self.max_events:
+            self.events.append((name, start - self._origin, seconds))
+        return result
+
+    def stop(self) -> None:
+        """Stop tracemalloc, if the profiler started it."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset(self) -> None:
+        """Clear the recorded statistics and events."""
+        self.stats = {}
+        self.events = []
+        self._origin = time.perf_counter()
+
+    def table(self) -> pd.DataFrame:
+        """Return the statistics of each process, slowest first.
+
+        Columns are calls, seconds (total), mean_ms (per call), percent (of
+        the total time of all processes), bytes_allocated and nan_count.
+        """
+        table = pd.DataFrame.from_dict(
+            {name: dataclasses.asdict(stats) for name, stats in self.stats.items()},
+            orient='index',
+            columns=[field.name for field in dataclasses.fields(ProcessStats)],
+        )
+        table.index.name = 'variable'
+        table.insert(2, 'mean_ms', 1e3 * table['seconds'] / table['calls'])
+        total: float = table['seconds'].sum()
+        table.insert(3, 'percent', 100.0 * table['seconds'] / total if total else 0.0)
+        return table.sort_values('seconds', ascending=False)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the events as a Chrome trace, with the aggregated statistics."""
+        return {
+            'traceEvents': [
+                {
+                    'name': name,
+                    'cat': 'process',
+                    'ph': 'X',
+                    'ts': start * 1e6,
+                    'dur': seconds * 1e6,
+                    'pid': 0,
+                    'tid': 0,
+                }
+                for name, start, seconds in self.events
+            ],
+            'displayTimeUnit': 'ms',
+            'processes': {
+                name: dataclasses.asdict(stats) for name, stats in self.stats.items()
+            },
+        }
+
+    def write_trace(self, path: str | Path) -> Path:
+        """Write ProcessProfiler.to_dict() to a JSON file, and return its path."""
+        path = Path(path)
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file)
+        return path
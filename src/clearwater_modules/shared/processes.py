@@ -3,16 +3,16 @@ import numba
 import xarray as xr
 
 
-@numba.njit
+@numba.njit(nogil=True)
 def celsius_to_kelvin(tempc: xr.DataArray) -> xr.DataArray:
     return tempc + 273.16
 
 
-@numba.njit
+@numba.njit(nogil=True)
 def kelvin_to_celsius(tempk: xr.DataArray) -> xr.DataArray:
     return tempk - 273.16
 
-@numba.njit
+@numba.njit(nogil=True)
 def arrhenius_correction(
     water_temp_c: xr.DataArray,
     rc20: xr.DataArray,
@@ -38,7 +38,7 @@ def arrhenius_correction(
     """
     return rc20 * theta**(water_temp_c - 20.0)
 
-@numba.njit
+@numba.njit(nogil=True)
 def compute_depth(
     surface_area: xr.DataArray,
     volume: xr.DataArray
@@ -51,7 +51,7 @@ def compute_depth(
     """
     return volume / surface_area
 
-@numba.njit
+@numba.njit(nogil=True)
 def TwaterK(
     TwaterC : xr.DataArray,
 ) -> xr.DataArray :
@@ -98,7 +98,7 @@ def kah_20(
     return da
 
 
-@numba.njit
+@numba.njit(nogil=True)
 def kah_tc(
     water_temp_c: xr.DataArray,
     kah_20: xr.DataArray,
@@ -146,7 +146,7 @@ def kaw_20(
     return da
 
 
-@numba.njit
+@numba.njit(nogil=True)
 def kaw_tc(
     water_temp_c: xr.DataArray,
     kaw_20: xr.DataArray,
@@ -162,7 +162,7 @@ def kaw_tc(
     return arrhenius_correction(water_temp_c, kaw_20, theta)
 
 
-@numba.njit
+@numba.njit(nogil=True)
 def ka_tc(
     kah_tc: xr.DataArray,
     kaw_tc: xr.DataArray,
@@ -199,7 +199,7 @@ def SOD_tc(
 
     return da
 
-@numba.njit
+@numba.njit(nogil=True)
 def L(
     lambda0: xr.DataArray,
     lambda1: xr.DataArray,
@@ -236,7 +236,7 @@ def L(
 
     return L
 
-@numba.njit
+@numba.njit(nogil=True)
 def PAR(
     use_Algae : bool,
     use_Balgae: bool,
@@ -253,7 +253,7 @@ def PAR(
     return xr.where (use_Algae or use_Balgae, q_solar * Fr_PAR)
 
 
-@numba.njit
+@numba.njit(nogil=True)
 def fdp(
     use_TIP: bool,
     Solid : xr.DataArray,
@@ -11,6 +11,11 @@ from typing import (
 Process = Callable[..., xr.DataArray | np.ndarray]
 InitialVariablesDict = dict[str, float | int | bool]
 VariableTypes = Literal['static', 'dynamic', 'state']
+EngineTypes = Literal['xarray', 'numpy', 'numba', 'dask']
+OutputFormatTypes = Literal['netcdf', 'zarr', 'npz']
+AggregationTypes = Literal['mean', 'min', 'max', 'sum']
+DependencyTypes = Literal['static', 'forcing', 'state']
+MemoryFallbackTypes = Literal['raise', 'stream', 'decimate']
 
 @dataclass(slots=True, frozen=True)
 class Variable:
@@ -4,10 +4,14 @@ The idea here is to make the manual ordering of processes unnecessary, allowing
 Importantly this assumes processes are given names that match the required arguments of other processes.
 """
 from clearwater_modules.shared.types import (
+    DependencyTypes,
     Process,
     Variable,
     SplitVariablesDict,
 )
+from typing import (
+    Iterable,
+)
 
 
 def split_variables(
@@ -33,51 +37,213 @@ def get_process_args(equation: Process) -> list[str]:
     return args
 
 
-def __rapid_sort(
-    static_vars: list[str],
-    state_vars: list[str],
-    variable_args_dict: dict[str, tuple[Variable, list[str]]],
-) -> list[Variable]:
-    """Sorts dynamic variables based on their required arguments."""
-    ordered_vars: list[Variable] = []
-    previous_len: int = len(variable_args_dict)
-    while len(variable_args_dict) > 0:
-        drop_keys: list[str] = []
-        for var_name, item in variable_args_dict.items():
-            var, args = item
-            ordered_names: list[str] = [var.name for var in ordered_vars]
-            if all(arg in ordered_names + static_vars + state_vars for arg in args):
-                ordered_vars.append(var)
-                drop_keys.append(var_name)
-        for key in drop_keys:
-            variable_args_dict.pop(key)
-        if len(variable_args_dict) == previous_len:
+def classify_variables(
+    computation_order: list[Variable],
+    forcing_vars: list[str],
+) -> dict[str, DependencyTypes]:
+    """Classify each variable in a computation order by what it depends on.
+
+    Args:
+        computation_order: The sorted dynamic and state variables.
+        forcing_vars: Names of inputs that can change between timesteps without
+            being computed (i.e. updateable static variables).
+
+    Returns:
+        A dict with variable names as keys, and as values:
+            'static': only depends on static variables (constant over time).
+            'forcing': depends on forcing variables, but not on state variables.
+            'state': a state variable, or depends on one.
+    """
+    ranks: dict[str, int] = {'static': 0, 'forcing': 1, 'state': 2}
+    kinds: list[DependencyTypes] = ['static', 'forcing', 'state']
+    state_vars: set[str] = {
+        var.name for var in computation_order if var.use == 'state'
+    }
+    classes: dict[str, DependencyTypes] = {}
+    for var in computation_order:
+        if var.use == 'state':
+            classes[var.name] = 'state'
+            continue
+        rank: int = 0
+        for arg in get_process_args(var.process):
+            if arg in state_vars:
+                rank = max(rank, ranks['state'])
+            elif arg in classes:
+                rank = max(rank, ranks[classes[arg]])
+            elif arg in forcing_vars:
+                rank = max(rank, ranks['forcing'])
+        classes[var.name] = kinds[rank]
+    return classes
+
+
+class DependencyGraph:
+    """A dependency graph of the dynamic and state variables of a model.
+
+    Edges point from a dynamic variable to the variables whose process takes it
+    as an argument. Static and state variable arguments are always available
+    (state processes read the previous timestep value), so they are not edges.
+
+    The graph can be updated incrementally with add_variable() and
+    remove_variable(), and sorted in O(V + E) with Kahn's algorithm.
+    """
+
+    def __init__(self, variables: Iterable[Variable] = ()) -> None:
+        self._variables: dict[str, Variable] = {}
+        self._static: set[str] = set()
+        self._args: dict[str, list[str]] = {}
+        # argument name -> names of the variables taking it
+        self._dependents: dict[str, set[str]] = {}
+        for variable in variables:
+            self.add_variable(variable)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._variables or name in self._static
+
+    @property
+    def names(self) -> list[str]:
+        """Return the names of all dynamic and state variables, in registration order."""
+        return list(self._variables.keys())
+
+    def add_variable(self, variable: Variable) -> None:
+        """Add (or replace) a variable."""
+        if variable.name in self:
+            self.remove_variable(variable.name)
+        if variable.use == 'static':
+            self._static.add(variable.name)
+            return
+        if variable.process is None:
+            raise ValueError(
+                f'Dynamic/state variable {variable.name} must be calculated by a process.'
+            )
+        args: list[str] = get_process_args(variable.process)
+        if variable.use == 'state' and variable.name in args:
+            args.remove(variable.name)
+
+        self._variables[variable.name] = variable
+        self._args[variable.name] = args
+        for arg in args:
+            self._dependents.setdefault(arg, set()).add(variable.name)
+
+    def remove_variable(self, name: str) -> None:
+        """Remove a variable, variables depending on it become unresolved."""
+        if name in self._static:
+            self._static.remove(name)
+            return
+        self._variables.pop(name)
+        for arg in self._args.pop(name):
+            self._dependents[arg].discard(name)
+
+    def _is_edge(self, arg: str) -> bool:
+        """Return True if an argument is computed by a dynamic variable."""
+        variable: Variable | None = self._variables.get(arg)
+        return variable is not None and variable.use != 'state'
+
+    def _is_available(self, arg: str) -> bool:
+        """Return True if an argument is always available (static or state)."""
+        if arg in self._static:
+            return True
+        variable: Variable | None = self._variables.get(arg)
+        return variable is not None and variable.use == 'state'
+
+    def predecessors(self, name: str) -> list[str]:
+        """Return the dynamic variables a variable's process takes as arguments."""
+        return [arg for arg in self._args[name] if self._is_edge(arg)]
+
+    def _successors(self, name: str) -> set[str]:
+        if not self._is_edge(name):
+            return set()
+        return self._dependents.get(name, set())
+
+    def successors(self, name: str) -> list[str]:
+        """Return the variables whose process takes a variable as an argument."""
+        index: dict[str, int] = {other: i for i, other in enumerate(self._variables)}
+        return sorted(self._successors(name), key=index.__getitem__)
+
+    def unresolved(self, name: str) -> list[str]:
+        """Return the arguments of a variable that no variable provides."""
+        return [
+            arg for arg in self._args[name]
+            if not self._is_edge(arg) and not self._is_available(arg)
+        ]
+
+    def _topological_order(self) -> list[str]:
+        """Return the variable names in a topological order (Kahn's algorithm)."""
+        in_degree: dict[str, int] = {}
+        ready: list[str] = []
+        for name in self._variables:
+            in_degree[name] = len(self.predecessors(name))
+            if in_degree[name] == 0 and not self.unresolved(name):
+                ready.append(name)
+
+        order: list[str] = []
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for successor in self._successors(name):
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0 and not self.unresolved(successor):
+                    ready.append(successor)
+
+        if len(order) != len(self._variables):
+            done: set[str] = set(order)
+            remaining: list[str] = [
+                name for name in self._variables if name not in done
+            ]
             raise ValueError(
                 f'Circular dependency detected in dynamic/state variables! '
-                f'Variables remaining: {list(variable_args_dict.keys())}'
+                f'Variables remaining: {remaining}'
             )
-        else:
-            previous_len = len(variable_args_dict)
-    return ordered_vars
+        return order
+
+    def levels(self) -> list[list[str]]:
+        """Return the variable names grouped by dependency depth.
+
+        Level 0 variables only depend on static and state variables, every other
+        variable depends on at least one variable of the previous level. The
+        variables within a level are independent, and in registration order.
+        """
+        level: dict[str, int] = {}
+        for name in self._topological_order():
+            level[name] = max(
+                (level[arg] + 1 for arg in self.predecessors(name)),
+                default=0,
+            )
+        levels: list[list[str]] = [[] for _ in range(max(level.values(), default=-1) + 1)]
+        for name in self._variables:
+            levels[level[name]].append(name)
+        return levels
+
+    def order(self) -> list[Variable]:
+        """Return the variables in computation order.
+
+        This reproduces the order of the original sorter, which made repeated
+        passes over the variables in registration order, adding every variable
+        whose arguments were already available. A variable is added in the
+        last pass of its predecessors, or the pass after if it was registered
+        before one of them.
+        """
+        index: dict[str, int] = {
+            name: i for i, name in enumerate(self._variables)
+        }
+        passes: dict[str, int] = {}
+        for name in self._topological_order():
+            passes[name] = max(
+                (
+                    passes[arg] + (index[arg] > index[name])
+                    for arg in self.predecessors(name)
+                ),
+                default=0,
+            )
+        buckets: list[list[Variable]] = [
+            [] for _ in range(max(passes.values(), default=-1) + 1)
+        ]
+        for name, variable in self._variables.items():
+            buckets[passes[name]].append(variable)
+        return [variable for bucket in buckets for variable in bucket]
 
 
 def sort_variables_for_computation(variables_dict: SplitVariablesDict) -> list[Variable]:
     """Sorts all non-static variables based on their required arguments."""
-    static_vars: list[str] = []
-    state_vars: list[str] = []
-    for static_var in variables_dict['static']:
-        static_vars.append(static_var.name)
-    for state_var in variables_dict['state']:
-        state_vars.append(state_var.name)
-
-    variable_args: dict[str, tuple[Variable, list[str]]] = {}
-    for var in variables_dict['dynamic'] + variables_dict['state']:
-        if var.process is None:
-            raise ValueError(
-                f'Dynamic/state variable {var.name} must be calculated by a process.'
-            )
-        arg_names: list[str] = get_process_args(var.process)
-        if var.use == 'state' and var.name in arg_names:
-            arg_names.remove(var.name)
-        variable_args[var.name] = (var, arg_names)
-    return __rapid_sort(static_vars, state_vars, variable_args)
+    return DependencyGraph(
+        variables_dict['static'] + variables_dict['dynamic'] + variables_dict['state']
+    ).order()
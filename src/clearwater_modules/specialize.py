@@ -0,0 +1,394 @@
+"""Specializes a computation order for inputs that are known at construction time.
+
+Module switches (i.e. NSM1 'use_*' statics) are usually applied inside process
+functions as xr.where(use_X, expression, 0), so the expression is computed every
+timestep even when the switch is off. Given the values of such constants:
+
+* Each process is recompiled from its source with the constants substituted and
+    folded (where/select calls with a constant condition keep only the selected
+    branch). A process that folds down to returning a constant is dropped, and
+    its value is substituted into the processes that use it.
+* Frozen state variables are removed from the computation order, so they keep
+    their initial (or externally updated) values.
+* Processes that no state or required variable depends on are removed.
+"""
+import ast
+import copy
+import dataclasses
+import inspect
+import linecache
+import textwrap
+import types
+import numpy as np
+import clearwater_modules.sorter as sorter
+from clearwater_modules.shared.types import (
+    Process,
+    Variable,
+)
+from typing import (
+    Any,
+    Iterable,
+    Optional,
+)
+
+ConstantValue = bool | int | float
+
+
+@dataclasses.dataclass(frozen=True)
+class SpecializedOrder:
+    """A computation order specialized by specialize_computation_order().
+
+    Attributes:
+        computation_order: The variables to compute every timestep.
+        constants: Variables whose process folded down to a constant value, and
+            were removed from the computation order.
+    """
+    computation_order: list[Variable]
+    constants: dict[str, ConstantValue]
+
+
+def _is_attribute_call(node: ast.AST, modules: Iterable[str], attr: str) -> bool:
+    """Return True if a node calls {module}.{attr} for one of the modules."""
+    return (
+        isinstance(node, ast.Call) and
+        isinstance(node.func, ast.Attribute) and
+        node.func.attr == attr and
+        isinstance(node.func.value, ast.Name) and
+        node.func.value.id in modules
+    )
+
+
+def _to_python(value: Any) -> Any:
+    """Convert a NumPy scalar to the equivalent Python value."""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _to_numpy(value: Any) -> Any:
+    """Convert a Python bool to a NumPy bool, so ~True evaluates like an array."""
+    if isinstance(value, bool):
+        return np.bool_(value)
+    return value
+
+
+class _ConstantNamer(ast.NodeTransformer):
+    """Replaces constants with names bound to their NumPy equivalent."""
+
+    def __init__(self, names: dict[str, Any]) -> None:
+        self.names: dict[str, Any] = names
+
+    def visit_Constant(self, node: ast.Constant) -> ast.Name:
+        name: str = f'_constant_{len(self.names)}'
+        self.names[name] = _to_numpy(node.value)
+        return ast.Name(id=name, ctx=ast.Load())
+
+
+class _ConstantFolder(ast.NodeTransformer):
+    """Substitutes and folds constants in a process function definition."""
+
+    def __init__(self, constants: dict[str, ConstantValue]) -> None:
+        self.constants: dict[str, ConstantValue] = dict(constants)
+        self.changed: bool = False
+        self.assign_counts: dict[str, int] = {}
+
+    def _constant(self, value: Any, node: ast.AST) -> ast.Constant:
+        self.changed = True
+        return ast.copy_location(ast.Constant(_to_python(value)), node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+                self.assign_counts[child.id] = self.assign_counts.get(child.id, 0) + 1
+        # an argument that is reassigned is not a constant
+        for name in self.assign_counts:
+            self.constants.pop(name, None)
+        node.decorator_list = []
+        node.body = self._visit_block(node.body, top_level=True)
+        return node
+
+    def _visit_block(self, body: list[ast.stmt], top_level: bool = False) -> list[ast.stmt]:
+        """Fold a block, splicing if statements with a constant test."""
+        new_body: list[ast.stmt] = []
+        for statement in body:
+            if isinstance(statement, ast.If):
+                statement.test = self.visit(statement.test)
+                if isinstance(statement.test, ast.Constant):
+                    self.changed = True
+                    branch = statement.body if statement.test.value else statement.orelse
+                    new_body.extend(self._visit_block(branch, top_level))
+                    continue
+                statement.body = self._visit_block(statement.body)
+                statement.orelse = self._visit_block(statement.orelse)
+                new_body.append(statement)
+                continue
+
+            statement = self.visit(statement)
+            target: Optional[str] = None
+            if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+                if isinstance(statement.targets[0], ast.Name):
+                    target = statement.targets[0].id
+            elif isinstance(statement, ast.AnnAssign) and isinstance(statement.target, ast.Name):
+                target = statement.target.id
+            if (
+                top_level and
+                target is not None and
+                self.assign_counts.get(target) == 1 and
+                isinstance(statement.value, ast.Constant)
+            ):
+                # a local assigned a constant once is substituted like an input
+                self.constants[target] = statement.value.value
+                self.changed = True
+                continue
+            new_body.append(statement)
+        return new_body
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if isinstance(node.ctx, ast.Load) and node.id in self.constants:
+            return self._constant(self.constants[node.id], node)
+        return node
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.operand, ast.Constant):
+            return self._evaluate_constants(node)
+        return node
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        left, right = node.left, node.right
+        if isinstance(left, ast.Constant) and isinstance(right, ast.Constant):
+            return self._evaluate_constants(node)
+        # a constant bool decides bitwise and/or of conditions on its own
+        for constant, other in [(left, right), (right, left)]:
+            if not isinstance(constant, ast.Constant) or not isinstance(constant.value, bool):
+                continue
+            if isinstance(node.op, ast.BitAnd):
+                return other if constant.value else self._constant(False, node)
+            if isinstance(node.op, ast.BitOr):
+                return self._constant(True, node) if constant.value else other
+        return node
+
+    def visit_Compare(self, node: ast.Compare) -> ast.AST:
+        self.generic_visit(node)
+        if all(isinstance(child, ast.Constant) for child in [node.left] + node.comparators):
+            return self._evaluate_constants(node)
+        return node
+
+    def visit_IfExp(self, node: ast.IfExp) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.test, ast.Constant):
+            self.changed = True
+            return node.body if node.test.value else node.orelse
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        self.generic_visit(node)
+        if _is_attribute_call(node, ['xr', 'np'], 'where'):
+            if len(node.args) == 3 and isinstance(node.args[0], ast.Constant):
+                self.changed = True
+                return node.args[1] if node.args[0].value else node.args[2]
+            return node
+        if _is_attribute_call(node, ['np'], 'select'):
+            return self._fold_select(node)
+        if (
+            isinstance(node.func, ast.Attribute) and
+            _is_attribute_call(node, ['np'], node.func.attr) and
+            not node.keywords and
+            all(isinstance(arg, ast.Constant) for arg in node.args)
+        ):
+            return self._evaluate_constants(node)
+        return node
+
+    def _evaluate_constants(self, node: ast.expr) -> ast.AST:
+        """Evaluate an expression whose operands are all constants.
+
+        Bools are evaluated as NumPy bools, so i.e. ~use_X gives the same
+        result as it does for the (array) static variable.
+        """
+        names: dict[str, Any] = {'np': np}
+        expression = ast.Expression(body=_ConstantNamer(names).visit(copy.deepcopy(node)))
+        ast.fix_missing_locations(expression)
+        try:
+            value = eval(compile(expression, '<constant>', 'eval'), names, {})
+        except Exception:
+            return node
+        if not isinstance(_to_python(value), ConstantValue):
+            return node
+        return self._constant(value, node)
+
+    def _fold_select(self, node: ast.Call) -> ast.AST:
+        """Drop constant False conditions, a constant True ends the select."""
+        arguments: dict[str, ast.expr] = dict(
+            zip(['condlist', 'choicelist', 'default'], node.args)
+        )
+        arguments.update({keyword.arg: keyword.value for keyword in node.keywords})
+        condlist = arguments.get('condlist')
+        choicelist = arguments.get('choicelist')
+        default: ast.expr = arguments.get('default', ast.Constant(0))
+        if (
+            not isinstance(condlist, (ast.List, ast.Tuple)) or
+            not isinstance(choicelist, (ast.List, ast.Tuple)) or
+            len(condlist.elts) != len(choicelist.elts)
+        ):
+            return node
+
+        conditions: list[ast.expr] = []
+        choices: list[ast.expr] = []
+        for condition, choice in zip(condlist.elts, choicelist.elts):
+            if isinstance(condition, ast.Constant):
+                self.changed = True
+                if not condition.value:
+                    continue
+                default = choice
+                break
+            conditions.append(condition)
+            choices.append(choice)
+        if not conditions:
+            self.changed = True
+            return default
+
+        condlist.elts = conditions
+        choicelist.elts = choices
+        node.args = []
+        node.keywords = [
+            ast.keyword(arg='condlist', value=condlist),
+            ast.keyword(arg='choicelist', value=choicelist),
+            ast.keyword(arg='default', value=default),
+        ]
+        return node
+
+
+@dataclasses.dataclass(frozen=True)
+class _Folded:
+    """The constant value a process folded down to."""
+    value: ConstantValue
+
+
+# specialized processes are reused, so their jitted kernels are cached too
+_FOLD_CACHE: dict[tuple, Process | _Folded] = {}
+
+
+def fold_process(
+    process: Process,
+    constants: dict[str, ConstantValue],
+) -> Process | _Folded:
+    """Return a process with constant arguments folded into its source.
+
+    The returned function only takes the arguments it still uses. If nothing
+    could be folded the process is returned unchanged, and if it folds down to
+    returning a constant, that value is returned.
+    """
+    if not isinstance(process, types.FunctionType):
+        return process
+    arg_names: list[str] = sorter.get_process_args(process)
+    used: dict[str, ConstantValue] = {
+        name: value for name, value in constants.items() if name in arg_names
+    }
+    if not used:
+        return process
+    key: tuple = (process, tuple(sorted(used.items())))
+    if key not in _FOLD_CACHE:
+        _FOLD_CACHE[key] = _fold_process(process, used)
+    return _FOLD_CACHE[key]
+
+
+def _fold_process(
+    process: Process,
+    constants: dict[str, ConstantValue],
+) -> Process | _Folded:
+    """Fold constants into a process (see fold_process)."""
+    try:
+        source: str = textwrap.dedent(inspect.getsource(process))
+    except (OSError, TypeError):
+        return process
+
+    function: ast.FunctionDef = ast.parse(source).body[0]
+    folder = _ConstantFolder(constants)
+    function = folder.visit(function)
+    if not folder.changed:
+        return process
+
+    statements: list[ast.stmt] = [
+        statement for statement in function.body
+        if not (
+            isinstance(statement, ast.Expr) and
+            isinstance(statement.value, ast.Constant)
+        )
+    ]
+    if (
+        len(statements) == 1 and
+        isinstance(statements[0], ast.Return) and
+        isinstance(statements[0].value, ast.Constant)
+    ):
+        return _Folded(statements[0].value.value)
+
+    used: set[str] = {
+        node.id for node in ast.walk(function)
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+    }
+    function.args.args = [arg for arg in function.args.args if arg.arg in used]
+    function.args.defaults = []
+
+    module = ast.fix_missing_locations(ast.Module(body=[function], type_ignores=[]))
+    source = ast.unparse(module) + '\n'
+    filename: str = f'<specialized {process.__module__}.{process.__qualname__}>'
+    linecache.cache[filename] = (
+        len(source),
+        None,
+        source.splitlines(keepends=True),
+        filename,
+    )
+    namespace: dict = {}
+    exec(compile(source, filename, 'exec'), process.__globals__, namespace)
+    return namespace[function.name]
+
+
+def specialize_computation_order(
+    computation_order: list[Variable],
+    constants: dict[str, ConstantValue],
+    frozen: Iterable[str],
+    required: Iterable[str],
+) -> SpecializedOrder:
+    """Specialize a computation order, see the module docstring.
+
+    Args:
+        computation_order: The sorted dynamic and state variables.
+        constants: Known values of (static) inputs to fold into the processes.
+        frozen: Names of state variables that are not computed.
+        required: Names of dynamic variables that must be computed (i.e.
+            recorded variables). If one folds down to a constant, it is still
+            computed by its original process, so it has the full shape.
+    """
+    frozen = set(frozen)
+    required = set(required)
+    known: dict[str, ConstantValue] = dict(constants)
+
+    order: list[Variable] = []
+    for var in computation_order:
+        if var.name in frozen:
+            continue
+        process = fold_process(var.process, known)
+        if isinstance(process, _Folded):
+            known[var.name] = process.value
+            if var.name not in required:
+                continue
+            process = var.process
+        if process is not var.process:
+            var = dataclasses.replace(var, process=process)
+        order.append(var)
+
+    # remove processes that no state or required variable depends on
+    needed: set[str] = set(required)
+    for var in reversed(order):
+        if var.use == 'state' or var.name in needed:
+            needed.add(var.name)
+            needed.update(sorter.get_process_args(var.process))
+
+    return SpecializedOrder(
+        computation_order=[var for var in order if var.name in needed],
+        constants={
+            name: value for name, value in known.items()
+            if name not in constants and name not in required
+        },
+    )
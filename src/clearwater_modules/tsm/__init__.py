@@ -1,4 +1,20 @@
-from clearwater_modules.tsm import state_variables
-from clearwater_modules.tsm import dynamic_variables
-from clearwater_modules.tsm import static_variables
-from clearwater_modules.tsm.model import EnergyBudget
+import importlib
+
+# imported on first access, the variable modules register their variables
+# when EnergyBudget is first constructed (see Model._variable_modules)
+_SUBMODULES: tuple[str, ...] = (
+    'constants',
+    'dynamic_variables',
+    'model',
+    'processes',
+    'state_variables',
+    'static_variables',
+)
+
+
+def __getattr__(name: str):
+    if name == 'EnergyBudget':
+        return importlib.import_module(f'{__name__}.model').EnergyBudget
+    if name in _SUBMODULES:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
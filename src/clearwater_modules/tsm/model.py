@@ -1,20 +1,30 @@
 """Temperature Simulation Model (TSM) module."""
 import xarray as xr
 import numpy as np
+import numpy.typing as npt
 from enum import Enum
+from pathlib import Path
 from clearwater_modules.tsm import (
     constants,
 )
 from clearwater_modules import base
+import clearwater_modules.kernels as kernels
+import clearwater_modules.profiling as profiling
 import clearwater_modules.shared.processes as shared_processes
 from typing import (
     Optional,
+    Callable,
 )
 
 
 class EnergyBudget(base.Model):
     """"""
     _variables: list[base.Variable] = []
+    _variable_modules: tuple[str, ...] = (
+        'clearwater_modules.tsm.state_variables',
+        'clearwater_modules.tsm.dynamic_variables',
+        'clearwater_modules.tsm.static_variables',
+    )
 
     def __init__(
         self,
@@ -27,9 +37,27 @@ class EnergyBudget(base.Model):
         track_dynamic_variables: bool = True,
         hotstart_dataset: Optional[xr.Dataset] = None,
         time_dim: Optional[str] = None,
+        engine: base.EngineTypes = 'xarray',
+        history_length: Optional[int] = None,
+        history_sink: Optional[Callable[[xr.Dataset], None]] = None,
+        output_interval: int = 1,
+        output_aggregation: Optional[list[base.AggregationTypes]] = None,
+        output_variables: Optional[list[str]] = None,
+        dtype: Optional[npt.DTypeLike] = None,
+        frozen_variables: Optional[list[str]] = None,
+        fold_constants: bool = False,
+        threads: Optional[int] = None,
+        chunks: Optional[dict[str, int]] = None,
+        ensemble_dim: Optional[str] = None,
+        history_dir: Optional[str | Path] = None,
+        kernel_cache: Optional[str | Path | kernels.KernelCache] = None,
+        profile: bool | profiling.ProcessProfiler = False,
+        max_memory: Optional[int] = None,
+        memory_fallback: base.MemoryFallbackTypes = 'raise',
+        timestep: int = 0,
     ) -> None:
-        self.__meteo_parameters: constants.Meteorological = constants.DEFAULT_METEOROLOGICAL
-        self.__temp_parameters: constants.Temperature = constants.DEFAULT_TEMPERATURE
+        self.__meteo_parameters: constants.Meteorological = constants.DEFAULT_METEOROLOGICAL.copy()
+        self.__temp_parameters: constants.Temperature = constants.DEFAULT_TEMPERATURE.copy()
 
         if meteo_parameters is None:
             meteo_parameters = {}
@@ -67,6 +95,24 @@ class EnergyBudget(base.Model):
             track_dynamic_variables=track_dynamic_variables,
             hotstart_dataset=hotstart_dataset,
             time_dim=time_dim,
+            engine=engine,
+            history_length=history_length,
+            history_sink=history_sink,
+            output_interval=output_interval,
+            output_aggregation=output_aggregation,
+            output_variables=output_variables,
+            dtype=dtype,
+            frozen_variables=frozen_variables,
+            fold_constants=fold_constants,
+            threads=threads,
+            chunks=chunks,
+            ensemble_dim=ensemble_dim,
+            history_dir=history_dir,
+            kernel_cache=kernel_cache,
+            profile=profile,
+            max_memory=max_memory,
+            memory_fallback=memory_fallback,
+            timestep=timestep,
         )
 
     @property
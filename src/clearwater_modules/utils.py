@@ -28,6 +28,25 @@ def validate_arrays(array: xr.DataArray, *args: xr.DataArray) -> None:
         #    )
 
 
+def validate_dims(array: xr.DataArray, dims: tuple[str, ...]) -> None:
+    """Validate that a DataArray has the expected dimensions."""
+    if not isinstance(array, xr.DataArray):
+        raise TypeError(
+            'All arguments must be of type xarray.DataArray.'
+        )
+    if tuple(array.dims) != tuple(dims):
+        raise ValueError(
+            f'Expected dimensions {tuple(dims)}, got {tuple(array.dims)}.'
+        )
+
+
+def as_array(value: xr.DataArray | np.ndarray) -> np.ndarray:
+    """Return the values of a DataArray, other values are returned as is."""
+    if isinstance(value, xr.DataArray):
+        return value.values
+    return value
+
+
 def _prep_inputs(
     input_dataset: xr.Dataset,
     var: Variable,
@@ -1,10 +1,16 @@
 """Shared pytest fixtures."""
 import pytest
+import numpy as np
 import xarray as xr
 from clearwater_modules.shared.types import (
     Variable,
     Process,
 )
+from clearwater_modules.tsm.model import EnergyBudget
+from typing import (
+    Any,
+    Callable,
+)
 
 
 @pytest.fixture(scope='session')
@@ -73,3 +79,64 @@ def dynamic_variables(process_functions) -> list[Variable]:
             process=func,
         ))
     return vars
+
+
+@pytest.fixture(scope='module')
+def varying_array(request) -> xr.DataArray:
+    """Return a spatially varying (y, x) array in [1, 2), 10x12 by default.
+
+    Request another shape with indirect parametrization, i.e.
+    @pytest.mark.parametrize('varying_array', [(3, 4)], indirect=True).
+    """
+    shape: tuple[int, int] = getattr(request, 'param', (10, 12))
+    rng = np.random.default_rng(seed=42)
+    return xr.DataArray(
+        rng.random(shape) + 1.0,
+        dims=['y', 'x'],
+        coords={'x': range(shape[1]), 'y': range(shape[0])},
+    )
+
+
+@pytest.fixture(scope='module')
+def initial_tsm_state(varying_array) -> dict[str, xr.DataArray]:
+    """Return spatially varying initial state values for the TSM model."""
+    return {
+        'water_temp_c': varying_array * 20.0,
+        'surface_area': varying_array,
+        'volume': varying_array * 100.0,
+    }
+
+
+@pytest.fixture(scope='module')
+def initial_nsm1_state(varying_array) -> dict[str, xr.DataArray]:
+    """Return spatially varying initial state values for the NSM1 model."""
+    return {
+        name: varying_array for name in [
+            'Ap', 'Ab', 'NH4', 'NO3', 'OrgN', 'N2', 'TIP', 'OrgP',
+            'POC', 'DOC', 'DIC', 'POM', 'CBOD', 'DOX', 'PX', 'Alk',
+        ]
+    }
+
+
+@pytest.fixture(scope='module')
+def tsm_kwargs() -> dict[str, Any]:
+    """Return the default EnergyBudget keyword arguments of make_tsm.
+
+    Override this fixture in a test module to change the defaults of its models,
+    requesting it to extend them, i.e. return {**tsm_kwargs, 'engine': 'numba'}.
+    """
+    return {'time_steps': 4, 'updateable_static_variables': ['air_temp_c']}
+
+
+@pytest.fixture
+def make_tsm(initial_tsm_state, tsm_kwargs) -> Callable[..., EnergyBudget]:
+    """Return a factory of TSM models with states initialized from initial_tsm_state.
+
+    The factory takes EnergyBudget keyword arguments, overriding tsm_kwargs.
+    """
+    def factory(**model_kwargs) -> EnergyBudget:
+        return EnergyBudget(
+            initial_state_values=initial_tsm_state.copy(),
+            **{**tsm_kwargs, **model_kwargs},
+        )
+    return factory
@@ -0,0 +1,94 @@
+"""Tests that the 'numpy' engine matches the default 'xarray' engine."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.tsm.model import EnergyBudget
+from clearwater_modules.nsm1.model import NutrientBudget
+
+
+@pytest.fixture(scope='module')
+def time_steps() -> int:
+    return 3
+
+
+def assert_datasets_equal(reference: xr.Dataset, other: xr.Dataset) -> None:
+    """Checks that two model datasets hold identical values."""
+    assert set(reference.data_vars) == set(other.data_vars)
+    for var_name in reference.data_vars:
+        assert reference[var_name].dims == other[var_name].dims
+        np.testing.assert_array_equal(
+            reference[var_name].values,
+            other[var_name].values,
+            err_msg=var_name,
+        )
+
+
+def test_invalid_engine(initial_tsm_state, time_steps) -> None:
+    """Checks that an unknown engine is rejected."""
+    with pytest.raises(ValueError):
+        EnergyBudget(
+            time_steps=time_steps,
+            initial_state_values=initial_tsm_state,
+            engine='fortran',
+        )
+
+
+def test_tsm_numpy_engine(initial_tsm_state, varying_array, time_steps) -> None:
+    """Checks the TSM results are identical, including state updates."""
+    models = [
+        EnergyBudget(
+            time_steps=time_steps,
+            initial_state_values=initial_tsm_state.copy(),
+            updateable_static_variables=['air_temp_c'],
+            engine=engine,
+        ) for engine in ['xarray', 'numpy']
+    ]
+    for model in models:
+        for i in range(time_steps):
+            update = {'air_temp_c': varying_array * (10.0 + i)} if i == 1 else None
+            ds = model.increment_timestep(update_state_values=update)
+        assert isinstance(ds, xr.Dataset)
+        assert ds.isnull().any() == False
+
+    assert_datasets_equal(models[0].dataset, models[1].dataset)
+
+
+def test_numpy_engine_writes_in_place(initial_tsm_state, time_steps) -> None:
+    """Checks that the engine writes into the model dataset arrays."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine='numpy',
+    )
+    water_temp = model.dataset['water_temp_c'].values
+    model.increment_timestep()
+    assert model.dataset['water_temp_c'].values is water_temp
+    assert not np.isnan(water_temp[1]).any()
+
+
+def test_numpy_engine_update_dims(initial_tsm_state, varying_array, time_steps) -> None:
+    """Checks that state updates must match the model dimensions."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine='numpy',
+    )
+    with pytest.raises(ValueError):
+        model.increment_timestep(
+            update_state_values={'water_temp_c': varying_array.rename(x='i')},
+        )
+
+
+def test_nsm1_numpy_engine(initial_nsm1_state) -> None:
+    """Checks the NSM1 results are identical."""
+    models = [
+        NutrientBudget(
+            time_steps=1,
+            initial_state_values=initial_nsm1_state,
+            engine=engine,
+        ) for engine in ['xarray', 'numpy']
+    ]
+    for model in models:
+        model.increment_timestep()
+
+    assert_datasets_equal(models[0].dataset, models[1].dataset)
@@ -0,0 +1,74 @@
+"""Test harness checking the 'numba' engine against the reference 'xarray' engine."""
+import pytest
+import numpy as np
+from clearwater_modules import kernels
+from clearwater_modules.base import Model
+from clearwater_modules.tsm import processes as tsm_processes
+from clearwater_modules.nsm1.model import NutrientBudget
+from clearwater_modules.nsm1 import processes as nsm1_processes
+
+RTOL = 1e-9
+
+
+def assert_engines_match(
+    reference: Model,
+    other: Model,
+    time_steps: int,
+    rtol: float = RTOL,
+) -> None:
+    """Steps both models and checks all dataset values match within a tolerance."""
+    for _ in range(time_steps):
+        reference.increment_timestep()
+        other.increment_timestep()
+
+    assert set(reference.dataset.data_vars) == set(other.dataset.data_vars)
+    for var_name in reference.dataset.data_vars:
+        np.testing.assert_allclose(
+            other.dataset[var_name].values,
+            reference.dataset[var_name].values,
+            rtol=rtol,
+            equal_nan=True,
+            err_msg=var_name,
+        )
+
+
+def test_jit_process_where() -> None:
+    """Checks xr.where/np.where processes compile for scalar inputs."""
+    jitted = kernels.jit_process(nsm1_processes.OrgN_NH4_Decay)
+    assert jitted(0.5, 2.0, True) == 1.0
+    assert jitted(0.5, 2.0, False) == 0.0
+    assert kernels.jit_process(nsm1_processes.OrgN_NH4_Decay) is jitted
+
+
+def test_jit_process_select() -> None:
+    """Checks np.select processes compile for scalar inputs, first match wins."""
+    jitted = kernels.jit_process(tsm_processes.mf_cp_water)
+    for water_temp_c in [-1.0, 3.0, 12.0, 30.0]:
+        assert jitted(water_temp_c) == tsm_processes.mf_cp_water(
+            np.array(water_temp_c)
+        )
+
+
+def test_tsm_numba_engine(make_tsm) -> None:
+    """Checks the fused TSM kernels match the reference engine."""
+    models = [
+        make_tsm(time_steps=3, engine=engine) for engine in ['xarray', 'numba']
+    ]
+    assert_engines_match(*models, time_steps=3)
+
+    fused_step = models[1]._fused_step
+    assert isinstance(fused_step, kernels.FusedStep)
+    assert 'water_temp_c' in fused_step.fused_variables
+
+
+def test_nsm1_numba_engine(initial_nsm1_state) -> None:
+    """Checks the fused NSM1 kernels match the reference engine."""
+    models = [
+        NutrientBudget(
+            time_steps=2,
+            initial_state_values=initial_nsm1_state.copy(),
+            engine=engine,
+        ) for engine in ['xarray', 'numba']
+    ]
+    assert_engines_match(*models, time_steps=2)
+    assert len(models[1]._fused_step.fused_variables) > 0
@@ -1,4 +1,6 @@
 """Tests that everything can be imported as we expect."""
+import subprocess
+import sys
 import pytest
 import clearwater_modules
 
@@ -15,3 +17,31 @@ def test_sub_modules(sub_modules) -> None:
     """Test that all sub-modules can be imported."""
     for sub_module in sub_modules:
         assert hasattr(clearwater_modules, sub_module)
+
+
+def test_lazy_import() -> None:
+    """Test that importing the package doesn't import the models or numba."""
+    code: str = (
+        'import sys, clearwater_modules; '
+        'assert "numba" not in sys.modules; '
+        'assert "clearwater_modules.tsm" not in sys.modules; '
+        'from clearwater_modules.tsm.model import EnergyBudget; '
+        'assert not EnergyBudget._variables; '
+        'assert "water_temp_c" in EnergyBudget.get_variable_names(); '
+        'assert clearwater_modules.tsm.EnergyBudget is EnergyBudget'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_failed_variable_import_retried() -> None:
+    """Test that the variable modules are imported again after a failed import."""
+    from clearwater_modules.base import Model
+
+    class BrokenModel(Model):
+        _variables = []
+        _variable_modules = ('clearwater_modules.no_such_variables',)
+
+    for _ in range(2):
+        with pytest.raises(ModuleNotFoundError):
+            BrokenModel.get_variable_names()
+    assert not BrokenModel.__dict__.get('_variables_loaded', False)
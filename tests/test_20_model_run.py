@@ -0,0 +1,124 @@
+"""Tests running multiple timesteps with Model.run()."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.tsm.model import EnergyBudget
+
+
+@pytest.fixture(scope='module')
+def time_steps() -> int:
+    return 4
+
+
+@pytest.fixture(scope='module')
+def air_temp_forcing(varying_array, time_steps) -> xr.DataArray:
+    """Return a time-indexed air temperature forcing DataArray."""
+    return xr.concat(
+        [varying_array * (10.0 + i) for i in range(time_steps)],
+        dim='time_step',
+    )
+
+
+@pytest.mark.parametrize('engine', ['xarray', 'numpy'])
+def test_run_matches_increment_timestep(
+    engine,
+    initial_tsm_state,
+    air_temp_forcing,
+    time_steps,
+) -> None:
+    """Checks run() gives the same results as an increment_timestep() loop."""
+    models = [
+        EnergyBudget(
+            time_steps=time_steps,
+            initial_state_values=initial_tsm_state.copy(),
+            updateable_static_variables=['air_temp_c'],
+            engine=engine,
+        ) for _ in range(2)
+    ]
+    for i in range(time_steps):
+        models[0].increment_timestep(
+            update_state_values={
+                'air_temp_c': air_temp_forcing.isel(time_step=i, drop=True),
+            }
+        )
+    ds = models[1].run(forcing={'air_temp_c': air_temp_forcing})
+
+    assert isinstance(ds, xr.Dataset)
+    assert models[1].timestep == time_steps
+    assert ds.isnull().any() == False
+    for var_name in models[0].temporal_variables:
+        np.testing.assert_array_equal(
+            models[0].dataset[var_name].values,
+            ds[var_name].values,
+        )
+
+
+def test_run_numpy_forcing(initial_tsm_state, air_temp_forcing, time_steps) -> None:
+    """Checks forcing can be a plain array with time as the first axis."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state,
+        updateable_static_variables=['air_temp_c'],
+        engine='numpy',
+    )
+    model.run(2, forcing={'air_temp_c': air_temp_forcing.values[:2]})
+    model.run(2, forcing={'air_temp_c': air_temp_forcing.values[2:]})
+    np.testing.assert_array_equal(
+        model.dataset['air_temp_c'].values[1:],
+        air_temp_forcing.values,
+    )
+
+
+def test_run_validation(initial_tsm_state, air_temp_forcing, time_steps) -> None:
+    """Checks bad run() arguments are caught before any timestep is computed."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state,
+        updateable_static_variables=['air_temp_c'],
+        engine='numpy',
+    )
+    with pytest.raises(ValueError):
+        model.run(time_steps + 1)
+    with pytest.raises(ValueError):
+        model.run(2, forcing={'air_temp_c': air_temp_forcing})
+    with pytest.raises(ValueError):
+        model.run(forcing={'wind_speed': air_temp_forcing})
+    assert model.timestep == 0
+
+
+def test_run_numba_single_kernel(
+    initial_tsm_state,
+    air_temp_forcing,
+    time_steps,
+) -> None:
+    """Checks a fully fused model runs all timesteps in one kernel call."""
+    reference = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        updateable_static_variables=['air_temp_c'],
+        engine='numpy',
+    )
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        updateable_static_variables=['air_temp_c'],
+        engine='numba',
+    )
+    reference.run(forcing={'air_temp_c': air_temp_forcing})
+    model.run(1, forcing={'air_temp_c': air_temp_forcing.isel(time_step=[0])})
+    assert model._fused_step._members is not None
+    model.run(forcing={'air_temp_c': air_temp_forcing.isel(time_step=slice(1, None))})
+    assert len(model._fused_step._run_kernels) == 1
+
+    for var_name in reference.temporal_variables:
+        np.testing.assert_allclose(
+            model.dataset[var_name].values,
+            reference.dataset[var_name].values,
+            rtol=1e-9,
+            err_msg=var_name,
+        )
+    np.testing.assert_allclose(
+        model._buffers['water_temp_c'],
+        reference._buffers['water_temp_c'],
+        rtol=1e-9,
+    )
@@ -0,0 +1,94 @@
+"""Tests the ring-buffer history mode (history_length / history_sink)."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.tsm.model import EnergyBudget
+
+
+@pytest.fixture(scope='module')
+def time_steps() -> int:
+    return 7
+
+
+@pytest.fixture(scope='module')
+def full_history(initial_tsm_state, time_steps) -> xr.Dataset:
+    """Return the reference dataset holding every timestep."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine='numpy',
+    )
+    return model.run()
+
+
+def assert_history_matches(reference: xr.Dataset, other: xr.Dataset) -> None:
+    """Checks the temporal variables of other match the same reference timesteps.
+
+    A tolerance allows for the 'numba' engine's floating point differences.
+    """
+    timesteps = other['time_step'].values
+    for var_name, data_array in other.data_vars.items():
+        if 'time_step' not in data_array.dims:
+            continue
+        np.testing.assert_allclose(
+            data_array.values,
+            reference[var_name].sel(time_step=timesteps).values,
+            rtol=1e-9,
+            err_msg=var_name,
+        )
+
+
+def test_history_length_requires_array_engine(initial_tsm_state, time_steps) -> None:
+    """Checks the invalid history options are rejected."""
+    with pytest.raises(ValueError):
+        EnergyBudget(
+            time_steps=time_steps,
+            initial_state_values=initial_tsm_state.copy(),
+            history_length=2,
+        )
+    with pytest.raises(ValueError):
+        EnergyBudget(
+            time_steps=time_steps,
+            initial_state_values=initial_tsm_state.copy(),
+            engine='numpy',
+            history_sink=print,
+        )
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'numba'])
+@pytest.mark.parametrize('use_run', [True, False])
+def test_ring_history(
+    initial_tsm_state,
+    time_steps,
+    full_history,
+    engine,
+    use_run,
+) -> None:
+    """Checks the ring keeps the last timesteps, and the sink gets all others."""
+    blocks: list[xr.Dataset] = []
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine=engine,
+        history_length=3,
+        history_sink=lambda block: blocks.append(block.copy(deep=True)),
+    )
+    assert model._dataset.sizes['time_step'] == 3
+
+    if use_run:
+        model.run(4)
+        model.run()
+    else:
+        for _ in range(time_steps):
+            model.increment_timestep()
+    window: xr.Dataset = model.dataset
+    np.testing.assert_array_equal(window['time_step'].values, [5, 6, 7])
+    assert_history_matches(full_history, window)
+
+    model.flush_history()
+    sunk = xr.concat(
+        [block[model.temporal_variables] for block in blocks],
+        dim='time_step',
+    )
+    np.testing.assert_array_equal(sunk['time_step'].values, np.arange(time_steps + 1))
+    assert_history_matches(full_history, sunk)
@@ -0,0 +1,65 @@
+"""Tests streaming model history to disk with output.ChunkedWriter."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules import output
+from clearwater_modules.tsm.model import EnergyBudget
+
+
+@pytest.fixture(scope='module')
+def time_steps() -> int:
+    return 7
+
+
+@pytest.fixture(scope='module')
+def full_history(initial_tsm_state, time_steps) -> xr.Dataset:
+    """Return the reference dataset holding every timestep."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine='numpy',
+    )
+    return model.run()
+
+
+def test_invalid_format(tmp_path) -> None:
+    """Checks an unknown output format is rejected."""
+    with pytest.raises(ValueError):
+        output.ChunkedWriter(tmp_path, format='hdf4')
+
+
+@pytest.mark.parametrize('format', ['netcdf', 'zarr', 'npz'])
+def test_chunked_writer(
+    tmp_path,
+    initial_tsm_state,
+    time_steps,
+    full_history,
+    format,
+) -> None:
+    """Checks the written chunks hold the full model history."""
+    if format not in output.available_formats():
+        pytest.skip(f'No {format} backend installed.')
+    writer = output.ChunkedWriter(tmp_path / 'output', format=format)
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine='numpy',
+        history_length=3,
+        history_sink=writer,
+    )
+    model.run()
+    assert writer.chunks == [(0, 2), (3, 5)]
+    model.flush_history()
+    assert writer.chunks[-1] == (6, 7)
+
+    written: xr.Dataset = writer.read()
+    np.testing.assert_array_equal(
+        written['time_step'].values,
+        np.arange(time_steps + 1),
+    )
+    for var_name in full_history.data_vars:
+        np.testing.assert_array_equal(
+            written[var_name].transpose(*full_history[var_name].dims).values,
+            full_history[var_name].values,
+            err_msg=var_name,
+        )
@@ -0,0 +1,140 @@
+"""Tests output decimation (output_interval) and aggregation (output_aggregation)."""
+import warnings
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.tsm.model import EnergyBudget
+
+
+@pytest.fixture(scope='module')
+def time_steps() -> int:
+    return 7
+
+
+@pytest.fixture(scope='module')
+def full_history(initial_tsm_state, time_steps) -> xr.Dataset:
+    """Return the reference dataset holding every timestep."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine='numpy',
+    )
+    return model.run()
+
+
+def test_invalid_output_options(initial_tsm_state, time_steps) -> None:
+    """Checks invalid output options are rejected."""
+    for kwargs in [
+        {'output_interval': 2},
+        {'output_interval': 0, 'engine': 'numpy'},
+        {'output_aggregation': ['median'], 'engine': 'numpy'},
+    ]:
+        with pytest.raises(ValueError):
+            EnergyBudget(
+                time_steps=time_steps,
+                initial_state_values=initial_tsm_state.copy(),
+                **kwargs,
+            )
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'numba'])
+def test_output_interval(initial_tsm_state, time_steps, full_history, engine) -> None:
+    """Checks only every Nth timestep is recorded."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine=engine,
+        output_interval=3,
+    )
+    dataset: xr.Dataset = model.run()
+    assert model.timestep == time_steps
+    np.testing.assert_array_equal(dataset['time_step'].values, [0, 3, 6])
+    for var_name in model.temporal_variables:
+        np.testing.assert_allclose(
+            dataset[var_name].values,
+            full_history[var_name].sel(time_step=[0, 3, 6]).values,
+            rtol=1e-9,
+            err_msg=var_name,
+        )
+
+
+def test_output_aggregation(initial_tsm_state, time_steps, full_history) -> None:
+    """Checks the aggregations reduce the timesteps since the last record."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine='numpy',
+        output_interval=3,
+        output_aggregation=['mean', 'min', 'max', 'sum'],
+    )
+    for _ in range(time_steps):
+        dataset: xr.Dataset = model.increment_timestep()
+
+    windows = full_history['water_temp_c'].isel(time_step=slice(1, 7)).values.reshape(
+        (2, 3) + dataset['water_temp_c'].shape[1:]
+    )
+    expected = {
+        'mean': windows.mean(axis=1),
+        'min': windows.min(axis=1),
+        'max': windows.max(axis=1),
+        'sum': windows.sum(axis=1),
+    }
+    for stat, values in expected.items():
+        aggregated = dataset[f'water_temp_c_{stat}']
+        np.testing.assert_array_equal(
+            aggregated.isel(time_step=0).values,
+            full_history['water_temp_c'].isel(time_step=0).values,
+        )
+        np.testing.assert_allclose(
+            aggregated.isel(time_step=slice(1, None)).values,
+            values,
+            rtol=1e-12,
+            err_msg=stat,
+        )
+
+
+def test_output_interval_ring_history(initial_tsm_state, time_steps, full_history) -> None:
+    """Checks decimated records are evicted to the history sink."""
+    blocks: list[xr.Dataset] = []
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine='numpy',
+        output_interval=2,
+        history_length=2,
+        history_sink=lambda block: blocks.append(block.copy(deep=True)),
+    )
+    model.run()
+    np.testing.assert_array_equal(model.dataset['time_step'].values, [4, 6])
+    model.flush_history()
+
+    sunk = xr.concat(
+        [block[model.temporal_variables] for block in blocks],
+        dim='time_step',
+    )
+    np.testing.assert_array_equal(sunk['time_step'].values, [0, 2, 4, 6])
+    for var_name in model.temporal_variables:
+        np.testing.assert_array_equal(
+            sunk[var_name].values,
+            full_history[var_name].sel(time_step=[0, 2, 4, 6]).values,
+            err_msg=var_name,
+        )
+
+
+def test_output_interval_tail(initial_tsm_state) -> None:
+    """Checks a warning is issued when the last timesteps can't be recorded."""
+    with pytest.warns(UserWarning, match='last 1 timesteps'):
+        EnergyBudget(
+            time_steps=7,
+            initial_state_values=initial_tsm_state.copy(),
+            engine='numpy',
+            output_interval=3,
+        )
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        EnergyBudget(
+            time_steps=6,
+            initial_state_values=initial_tsm_state.copy(),
+            engine='numpy',
+            output_interval=3,
+        )
@@ -0,0 +1,82 @@
+"""Tests recording a selection of variables with output_variables."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.tsm.model import EnergyBudget
+
+
+@pytest.fixture(scope='module')
+def time_steps() -> int:
+    return 3
+
+
+@pytest.fixture(scope='module')
+def full_history(initial_tsm_state, time_steps) -> xr.Dataset:
+    """Return the reference dataset recording every variable."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine='numpy',
+    )
+    return model.run()
+
+
+def test_invalid_output_variables(initial_tsm_state, time_steps) -> None:
+    """Checks statics and unrecorded states (with the 'xarray' engine) are rejected."""
+    for engine, output_variables in [
+        ('numpy', ['water_temp_c', 'wind_b']),
+        ('xarray', ['water_temp_c', 'q_net']),
+    ]:
+        with pytest.raises(ValueError):
+            EnergyBudget(
+                time_steps=time_steps,
+                initial_state_values=initial_tsm_state.copy(),
+                engine=engine,
+                output_variables=output_variables,
+            )
+
+
+def test_xarray_output_variables(initial_tsm_state, time_steps, full_history) -> None:
+    """Checks the 'xarray' engine only records the selected dynamic variables."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        output_variables=['water_temp_c', 'surface_area', 'volume', 'q_net'],
+    )
+    for _ in range(time_steps):
+        dataset: xr.Dataset = model.increment_timestep()
+    assert 'q_net' in dataset.data_vars
+    assert 'ri_number' not in dataset.data_vars
+    for var_name in ['water_temp_c', 'q_net']:
+        np.testing.assert_array_equal(
+            dataset[var_name].values,
+            full_history[var_name].values,
+            err_msg=var_name,
+        )
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'numba'])
+def test_output_variables(initial_tsm_state, time_steps, full_history, engine) -> None:
+    """Checks unrecorded variables get no history, but states hold their last value."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine=engine,
+        output_variables=['water_temp_c', 'q_net'],
+    )
+    dataset: xr.Dataset = model.run()
+    assert 'ri_number' not in dataset.data_vars
+    assert dataset['volume'].dims == ('y', 'x')
+    assert dataset['water_temp_c'].dims == ('time_step', 'y', 'x')
+    for var_name in ['water_temp_c', 'q_net']:
+        np.testing.assert_allclose(
+            dataset[var_name].values,
+            full_history[var_name].values,
+            rtol=1e-9,
+            err_msg=var_name,
+        )
+    np.testing.assert_allclose(
+        dataset['volume'].values,
+        full_history['volume'].isel(time_step=-1).values,
+        rtol=1e-9,
+    )
@@ -0,0 +1,116 @@
+"""Tests the single precision (dtype=np.float32) mode against float64."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.tsm.model import EnergyBudget
+from clearwater_modules.nsm1.model import NutrientBudget
+
+
+@pytest.fixture(scope='module')
+def time_steps() -> int:
+    return 3
+
+
+@pytest.fixture(scope='module')
+def float64_dataset(initial_tsm_state, time_steps) -> xr.Dataset:
+    """Return the float64 reference run."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine='numpy',
+    )
+    return model.run()
+
+
+def test_invalid_dtype(initial_tsm_state, time_steps) -> None:
+    """Checks non floating point dtypes are rejected."""
+    with pytest.raises(ValueError):
+        EnergyBudget(
+            time_steps=time_steps,
+            initial_state_values=initial_tsm_state.copy(),
+            dtype=np.int32,
+        )
+
+
+def test_nsm1_float32_storage(initial_array) -> None:
+    """Checks float32 storage, with compact bools and option flags."""
+    model = NutrientBudget(
+        time_steps=1,
+        initial_state_values={
+            name: initial_array for name in [
+                'Ap', 'Ab', 'NH4', 'NO3', 'OrgN', 'N2', 'TIP', 'OrgP',
+                'POC', 'DOC', 'DIC', 'POM', 'CBOD', 'DOX', 'PX', 'Alk',
+            ]
+        },
+        engine='numpy',
+        dtype=np.float32,
+    )
+    dataset: xr.Dataset = model.increment_timestep()
+    assert dataset['DOX'].dtype == np.float32
+    assert dataset['DOX_sat'].dtype == np.float32
+    assert dataset['use_DOX'].dtype == np.bool_
+    assert dataset['growth_rate_option'].dtype == np.int8
+    assert model._buffers['dDOXdt'].dtype == np.float32
+
+
+@pytest.mark.parametrize('engine', ['xarray', 'numpy', 'numba'])
+def test_tsm_float32(
+    initial_tsm_state,
+    time_steps,
+    float64_dataset,
+    engine,
+) -> None:
+    """Checks the float32 results stay close to the float64 results."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        engine=engine,
+        dtype='float32',
+    )
+    dataset: xr.Dataset = model.run()
+    assert dataset['water_temp_c'].dtype == np.float32
+    assert dataset['water_temp_c'].nbytes * 2 == float64_dataset['water_temp_c'].nbytes
+    for var_name in ['water_temp_c', 'q_net', 'density_water']:
+        np.testing.assert_allclose(
+            dataset[var_name].values,
+            float64_dataset[var_name].values,
+            rtol=1e-2,
+            err_msg=var_name,
+        )
+
+
+def test_numba_float32_variables(initial_tsm_state, time_steps) -> None:
+    """Checks fused kernels store every floating point variable in float32."""
+    model = EnergyBudget(
+        time_steps=time_steps,
+        initial_state_values=initial_tsm_state.copy(),
+        track_dynamic_variables=True,
+        engine='numba',
+        dtype=np.float32,
+    )
+    dataset: xr.Dataset = model.run()
+    assert len(model._fused_step.fused_variables) > 0
+    for var_name, data_array in dataset.data_vars.items():
+        if data_array.dtype.kind == 'f':
+            assert data_array.dtype == np.float32, var_name
+    for var_name, value in model._buffers.items():
+        if np.asarray(value).dtype.kind == 'f':
+            assert np.asarray(value).dtype == np.float32, var_name
+
+
+def test_aggregation_float32(initial_tsm_state) -> None:
+    """Checks decimated and aggregated records stay in float32."""
+    model = EnergyBudget(
+        time_steps=5,
+        initial_state_values=initial_tsm_state.copy(),
+        engine='numpy',
+        dtype=np.float32,
+        output_interval=2,
+        output_aggregation=['mean', 'max'],
+    )
+    dataset: xr.Dataset = model.run()
+    for stat in ['mean', 'max']:
+        assert dataset[f'water_temp_c_{stat}'].dtype == np.float32
+    for stats in model._aggregates.values():
+        for accumulator in stats.values():
+            assert accumulator.dtype == np.float32
@@ -0,0 +1,170 @@
+"""Tests specializing the NSM1 computation order by its module switches."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.nsm1 import constants
+from clearwater_modules.nsm1.model import NutrientBudget
+from clearwater_modules.tsm.model import EnergyBudget
+
+def only_switches(*enabled: str) -> dict[str, bool]:
+    """Return global parameters with only the given module switches enabled."""
+    return {
+        name: name in enabled
+        for name in constants.DEFAULT_GLOBALPARAMETERS.keys()
+    }
+
+
+def build_model(
+    initial_nsm1_state: dict[str, xr.DataArray],
+    global_parameters: dict[str, bool],
+    **kwargs,
+) -> NutrientBudget:
+    return NutrientBudget(
+        time_steps=2,
+        initial_state_values=initial_nsm1_state.copy(),
+        global_parameters=dict(global_parameters),
+        **kwargs,
+    )
+
+
+def test_frozen_variables_must_be_states(initial_nsm1_state) -> None:
+    """Checks only state variables can be frozen."""
+    with pytest.raises(ValueError):
+        build_model(
+            initial_nsm1_state,
+            only_switches(*constants.MODULE_STATE_VARIABLES.keys()),
+            frozen_variables=['use_DOX'],
+        )
+
+
+@pytest.mark.parametrize('engine', ['xarray', 'numpy', 'numba'])
+def test_all_modules_enabled(initial_nsm1_state, engine) -> None:
+    """Checks folding the default switches doesn't change the results."""
+    global_parameters = dict(constants.DEFAULT_GLOBALPARAMETERS)
+    reference: xr.Dataset = build_model(
+        initial_nsm1_state,
+        global_parameters,
+        engine='numpy',
+    ).run()
+    model = build_model(
+        initial_nsm1_state,
+        global_parameters,
+        engine=engine,
+        prune_disabled_modules=True,
+    )
+    assert model.frozen_variables == []
+    dataset: xr.Dataset = model.run()
+    for var_name in model.temporal_variables:
+        np.testing.assert_allclose(
+            dataset[var_name].values,
+            reference[var_name].values,
+            rtol=1e-9,
+            err_msg=var_name,
+        )
+
+
+@pytest.mark.parametrize('engine', ['xarray', 'numpy', 'numba'])
+def test_pathogen_only(initial_nsm1_state, engine) -> None:
+    """Checks a pathogen-only model only computes the pathogen processes."""
+    global_parameters = only_switches('use_Pathogen')
+    reference: xr.Dataset = build_model(
+        initial_nsm1_state,
+        global_parameters,
+        engine='numpy',
+    ).run()
+    model = build_model(
+        initial_nsm1_state,
+        global_parameters,
+        engine=engine,
+        track_dynamic_variables=False,
+        prune_disabled_modules=True,
+    )
+    assert 'PX' not in model.frozen_variables
+    assert 'DOX' in model.frozen_variables
+    # CBOD has no module switch, so only the pathogen and CBOD processes remain
+    assert len(model.computation_order) < 20
+    assert 'PX' in [var.name for var in model.computation_order]
+    dataset: xr.Dataset = model.run()
+
+    np.testing.assert_allclose(
+        dataset['PX'].values,
+        reference['PX'].values,
+        rtol=1e-9,
+    )
+    for var_name in model.frozen_variables:
+        np.testing.assert_array_equal(
+            dataset[var_name].isel(time_step=-1).values,
+            initial_nsm1_state[var_name].values,
+            err_msg=var_name,
+        )
+
+
+def test_dissolved_oxygen_only(initial_nsm1_state) -> None:
+    """Checks a DO-only model computes a fraction of the full computation order."""
+    full = build_model(
+        initial_nsm1_state,
+        dict(constants.DEFAULT_GLOBALPARAMETERS),
+        engine='numpy',
+        track_dynamic_variables=False,
+    )
+    reference: xr.Dataset = build_model(
+        initial_nsm1_state,
+        only_switches('use_DOX'),
+        engine='numpy',
+        track_dynamic_variables=False,
+    ).run()
+    model = build_model(
+        initial_nsm1_state,
+        only_switches('use_DOX'),
+        engine='numpy',
+        track_dynamic_variables=False,
+        prune_disabled_modules=True,
+    )
+    assert len(model.computation_order) < len(full.computation_order) / 2
+    assert 'DOX' in [var.name for var in model.computation_order]
+    dataset: xr.Dataset = model.run()
+
+    np.testing.assert_allclose(
+        dataset['DOX'].values,
+        reference['DOX'].values,
+        rtol=1e-9,
+    )
+
+
+def test_tracked_folded_variables(initial_nsm1_state) -> None:
+    """Checks recorded dynamic variables are computed even if they are constant."""
+    model = build_model(
+        initial_nsm1_state,
+        only_switches('use_Pathogen'),
+        engine='numpy',
+        track_dynamic_variables=False,
+        prune_disabled_modules=True,
+    )
+    assert 'dNH4dt' in model.folded_constants
+    model.track_dynamic_variables = True
+    assert 'dNH4dt' not in model.folded_constants
+    dataset: xr.Dataset = model.run()
+    np.testing.assert_array_equal(dataset['dNH4dt'].isel(time_step=-1).values, 0.0)
+
+
+def test_frozen_tsm_state(initial_array) -> None:
+    """Checks a frozen state keeps its value, unless it is updated."""
+    model = EnergyBudget(
+        time_steps=2,
+        initial_state_values={
+            'water_temp_c': initial_array * 20.0,
+            'surface_area': initial_array,
+            'volume': initial_array * 100.0,
+        },
+        engine='numpy',
+        frozen_variables=['water_temp_c'],
+    )
+    assert 'water_temp_c' not in [var.name for var in model.computation_order]
+    model.increment_timestep()
+    model.increment_timestep(
+        update_state_values={'water_temp_c': initial_array * 10.0},
+    )
+    np.testing.assert_array_equal(
+        model.dataset['water_temp_c'].values[:, 0, 0],
+        [20.0, 20.0, 10.0],
+    )
@@ -0,0 +1,78 @@
+"""Tests hoisting static-only dynamic variables out of the timestep loop."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.tsm.model import EnergyBudget
+
+STATIC_ONLY: list[str] = [
+    'air_temp_k',
+    'mixing_ratio_air',
+    'density_air',
+    'emissivity_air',
+    'q_longwave_down',
+]
+
+
+@pytest.mark.parametrize('engine', ['xarray', 'numpy', 'numba'])
+def test_static_only_hoisted(initial_tsm_state, engine) -> None:
+    """Checks static-only variables are computed once, and still recorded."""
+    model = EnergyBudget(
+        time_steps=3,
+        initial_state_values=initial_tsm_state.copy(),
+        track_dynamic_variables=True,
+        engine=engine,
+    )
+    step_names: list[str] = [var.name for var in model._step_order]
+    for var_name in STATIC_ONLY:
+        assert var_name not in step_names
+    assert 'water_temp_c' in step_names
+
+    dataset: xr.Dataset = model.run()
+    for var_name in STATIC_ONLY:
+        values: np.ndarray = dataset[var_name].values
+        assert np.isfinite(values[1:]).all()
+        np.testing.assert_array_equal(values[1:], values[1:2].repeat(3, axis=0))
+
+
+def test_updateable_static_not_hoisted(initial_tsm_state) -> None:
+    """Checks variables depending on an updateable static are computed every timestep."""
+    model = EnergyBudget(
+        time_steps=2,
+        initial_state_values=initial_tsm_state.copy(),
+        updateable_static_variables=['air_temp_c'],
+        track_dynamic_variables=True,
+        engine='numpy',
+    )
+    step_names: list[str] = [var.name for var in model._step_order]
+    assert 'air_temp_k' in step_names
+    assert 'emissivity_air' in step_names
+
+    model.increment_timestep()
+    model.increment_timestep(
+        update_state_values={
+            'air_temp_c': xr.full_like(initial_tsm_state['volume'], 10.0),
+        },
+    )
+    np.testing.assert_allclose(
+        model.dataset['air_temp_k'].isel(time_step=-1).values,
+        283.16,
+    )
+
+
+def test_replaced_dataset_recomputes(initial_tsm_state) -> None:
+    """Checks hoisted variables are recomputed if the dataset is replaced."""
+    model = EnergyBudget(
+        time_steps=2,
+        initial_state_values=initial_tsm_state.copy(),
+        track_dynamic_variables=True,
+        engine='numpy',
+    )
+    model.increment_timestep()
+    model.dataset = model.dataset.assign(
+        air_temp_c=xr.full_like(model.dataset['air_temp_c'], 10.0),
+    )
+    model.increment_timestep()
+    np.testing.assert_allclose(
+        model.dataset['air_temp_k'].isel(time_step=-1).values,
+        283.16,
+    )
@@ -0,0 +1,110 @@
+"""Tests the compiled execution plan (integer slot argument binding)."""
+import json
+import pytest
+import numpy as np
+from clearwater_modules.execution import ExecutionPlan
+from clearwater_modules.tsm.model import EnergyBudget
+from clearwater_modules.nsm1 import constants
+from clearwater_modules.nsm1.model import NutrientBudget
+from clearwater_modules.shared.types import Variable
+
+
+@pytest.fixture(scope='function')
+def tsm_model(initial_tsm_state) -> EnergyBudget:
+    return EnergyBudget(
+        time_steps=3,
+        initial_state_values=initial_tsm_state.copy(),
+        track_dynamic_variables=True,
+    )
+
+
+def test_plan_slots(tsm_model) -> None:
+    """Checks every process argument and output is bound to a slot."""
+    plan: ExecutionPlan = tsm_model.execution_plan
+    assert plan is tsm_model.execution_plan
+    assert len(plan.steps) == len(tsm_model.computation_order)
+    assert len(set(plan.slots)) == len(plan.slots)
+
+    for step in plan.steps:
+        assert plan.slots[step.output] == step.name
+    for step in plan.loop_steps:
+        for slot in step.inputs:
+            name: str = plan.slots[slot]
+            # inputs are loaded, or computed by an earlier step
+            assert slot in plan.loaded or plan.steps.index(
+                next(s for s in plan.steps if s.name == name)
+            ) < plan.steps.index(step)
+    assert 'water_temp_c' in [plan.slots[i] for i in plan.loaded]
+    assert 'water_temp_c' in str(plan)
+
+
+def test_plan_matches_legacy_computation(tsm_model, initial_tsm_state) -> None:
+    """Checks the xarray engine results match the numpy engine."""
+    reference = EnergyBudget(
+        time_steps=3,
+        initial_state_values=initial_tsm_state.copy(),
+        track_dynamic_variables=True,
+        engine='numpy',
+    )
+    reference.run()
+    tsm_model.run()
+    for var_name in tsm_model.temporal_variables:
+        np.testing.assert_allclose(
+            tsm_model.dataset[var_name].values,
+            reference.dataset[var_name].values,
+            rtol=1e-12,
+            err_msg=var_name,
+        )
+
+
+def test_plan_serialization(tsm_model) -> None:
+    """Checks a plan round trips through JSON."""
+    plan: ExecutionPlan = tsm_model.execution_plan
+    data: dict = json.loads(json.dumps(plan.to_dict()))
+    assert ExecutionPlan.from_dict(data) == plan
+
+    data['steps'][0]['inputs'] = data['steps'][0]['inputs'][:-1]
+    with pytest.raises(ValueError):
+        ExecutionPlan.from_dict(data)
+
+
+def test_specialized_plan_serialization(initial_array) -> None:
+    """Checks a plan of specialized processes can't be rebuilt from their paths."""
+    model = NutrientBudget(
+        time_steps=1,
+        initial_state_values={
+            name: initial_array for name in [
+                'Ap', 'Ab', 'NH4', 'NO3', 'OrgN', 'N2', 'TIP', 'OrgP',
+                'POC', 'DOC', 'DIC', 'POM', 'CBOD', 'DOX', 'PX', 'Alk',
+            ]
+        },
+        global_parameters=dict(constants.DEFAULT_GLOBALPARAMETERS),
+        fold_constants=True,
+    )
+    with pytest.raises(ValueError):
+        ExecutionPlan.from_dict(model.execution_plan.to_dict())
+
+
+def extra_process(water_temp_c: float) -> float:
+    return water_temp_c * 2.0
+
+
+def test_plan_invalidated_by_registration(tsm_model) -> None:
+    """Checks registering or unregistering a variable rebuilds the plan."""
+    plan: ExecutionPlan = tsm_model.execution_plan
+    variable = Variable(
+        name='double_water_temp_c',
+        long_name='Double water temperature',
+        units='degC',
+        description='A test variable.',
+        use='dynamic',
+        process=extra_process,
+    )
+    try:
+        EnergyBudget.register_variable(variable)
+        new_plan: ExecutionPlan = tsm_model.execution_plan
+        assert new_plan is not plan
+        assert 'double_water_temp_c' in new_plan.slots
+    finally:
+        EnergyBudget.unregister_variables('double_water_temp_c')
+    assert 'double_water_temp_c' not in tsm_model.execution_plan.slots
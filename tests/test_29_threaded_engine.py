@@ -0,0 +1,91 @@
+"""Tests computing independent processes concurrently (Model.threads)."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.execution import ExecutionPlan
+from clearwater_modules.shared.types import Variable
+from clearwater_modules.tsm.model import EnergyBudget
+from clearwater_modules.nsm1 import constants
+from clearwater_modules.nsm1.model import NutrientBudget
+
+
+def test_threads_require_numpy_engine(initial_tsm_state) -> None:
+    """Checks threads need the 'numpy' or 'xarray' engine and no profiler."""
+    for engine, threads, profile in [
+        ('numba', 2, False),
+        ('dask', 2, False),
+        ('numpy', 0, False),
+        ('numpy', 2, True),
+    ]:
+        with pytest.raises(ValueError):
+            EnergyBudget(
+                time_steps=1,
+                initial_state_values=initial_tsm_state,
+                engine=engine,
+                threads=threads,
+                profile=profile,
+            )
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'xarray'])
+def test_threaded_nsm1(initial_nsm1_state, engine) -> None:
+    """Checks the threaded engine gives the same results as the sequential one."""
+    datasets: list[xr.Dataset] = []
+    for threads in [None, 4]:
+        model = NutrientBudget(
+            time_steps=3,
+            initial_state_values=initial_nsm1_state,
+            global_parameters=dict(constants.DEFAULT_GLOBALPARAMETERS),
+            engine=engine,
+            threads=threads,
+        )
+        datasets.append(model.run())
+        model.close()
+    assert max(len(level) for level in model._process_levels) > 10
+    for var_name in model.temporal_variables:
+        np.testing.assert_array_equal(
+            datasets[1][var_name].values,
+            datasets[0][var_name].values,
+            err_msg=var_name,
+        )
+
+
+def make_variable(name: str, use: str, process) -> Variable:
+    return Variable(
+        name=name,
+        long_name=name,
+        units='m',
+        description='A test variable.',
+        use=use,
+        process=process,
+    )
+
+
+def rate(a: float) -> float:
+    return a * 2.0
+
+
+def state_update(s: float, rate: float) -> float:
+    return s + rate
+
+
+def after_update(s: float) -> float:
+    return s * 10.0
+
+
+def before_update(s: float) -> float:
+    return s * 10.0
+
+
+def test_loop_levels_order_state_hazards() -> None:
+    """Checks levels keep reads of a state before/after its update in order."""
+    plan = ExecutionPlan.build([
+        make_variable('rate', 'dynamic', rate),
+        make_variable('before_update', 'dynamic', before_update),
+        make_variable('s', 'state', state_update),
+        make_variable('after_update', 'dynamic', after_update),
+    ])
+    levels: list[list[str]] = [
+        [step.name for step in level] for level in plan.loop_levels
+    ]
+    assert levels == [['rate', 'before_update'], ['s'], ['after_update']]
@@ -10,6 +10,8 @@ from clearwater_modules.sorter import (
     split_variables,
     get_process_args,
     sort_variables_for_computation,
+    classify_variables,
+    DependencyGraph,
 )
 
 
@@ -68,3 +70,91 @@ def test_sort_variables(
     assert sorted_vars[0].name == 'dynamic_0'
     assert sorted_vars[1].name == 'dynamic_1'
     assert sorted_vars[2].name == 'dynamic_2'
+
+
+def state_equation(state_0: float, dynamic_2: float) -> float:
+    return state_0 + dynamic_2
+
+
+def test_classify_variables(all_variables: list[Variable]) -> None:
+    """Test the classify_variables function."""
+    sorted_vars = sort_variables_for_computation(split_variables(all_variables))
+    sorted_vars.append(Variable(
+        name='state_0',
+        long_name='State Variable 0',
+        units='m',
+        description='A state variable.',
+        use='state',
+        process=state_equation,
+    ))
+
+    # all dynamic variables only depend on the statics 'a' and 'b'
+    classes = classify_variables(sorted_vars, [])
+    assert classes == {
+        'dynamic_0': 'static',
+        'dynamic_1': 'static',
+        'dynamic_2': 'static',
+        'state_0': 'state',
+    }
+
+    # every dynamic variable depends on 'b', directly or through dynamic_0
+    classes = classify_variables(sorted_vars, ['b'])
+    assert classes['dynamic_1'] == 'forcing'
+    assert classes['dynamic_2'] == 'forcing'
+    assert classes['state_0'] == 'state'
+
+
+def test_dependency_graph(
+    dynamic_variables: list[Variable],
+    all_variables: list[Variable],
+) -> None:
+    """Test the DependencyGraph levels, predecessors and successors."""
+    graph = DependencyGraph(all_variables)
+    assert graph.names == ['dynamic_0', 'dynamic_1', 'dynamic_2']
+    assert graph.levels() == [['dynamic_0'], ['dynamic_1'], ['dynamic_2']]
+    assert graph.predecessors('dynamic_1') == ['dynamic_0']
+    assert graph.successors('dynamic_0') == ['dynamic_1']
+    assert graph.successors('dynamic_2') == []
+
+    # registration order doesn't change the computation order
+    reversed_graph = DependencyGraph(all_variables[:2] + dynamic_variables[::-1])
+    assert [var.name for var in reversed_graph.order()] == [
+        'dynamic_0', 'dynamic_1', 'dynamic_2',
+    ]
+
+
+def test_dependency_graph_updates(
+    dynamic_variables: list[Variable],
+    all_variables: list[Variable],
+) -> None:
+    """Test incrementally updating a DependencyGraph."""
+    graph = DependencyGraph(all_variables)
+    graph.remove_variable('dynamic_0')
+    assert graph.unresolved('dynamic_1') == ['dynamic_0']
+    with pytest.raises(ValueError):
+        graph.order()
+
+    graph.add_variable(dynamic_variables[0])
+    assert graph.names == ['dynamic_1', 'dynamic_2', 'dynamic_0']
+    assert graph.successors('dynamic_0') == ['dynamic_1']
+    assert [var.name for var in graph.order()] == [
+        'dynamic_0', 'dynamic_1', 'dynamic_2',
+    ]
+
+
+def test_circular_dependency(all_variables: list[Variable]) -> None:
+    """Test a circular dependency is detected."""
+    def cyclic_equation(dynamic_2: float) -> float:
+        return dynamic_2
+
+    graph = DependencyGraph(all_variables)
+    graph.add_variable(Variable(
+        name='dynamic_0',
+        long_name='Dynamic Variable 0',
+        units='m',
+        description='A dynamic variable.',
+        use='dynamic',
+        process=cyclic_equation,
+    ))
+    with pytest.raises(ValueError, match='Circular dependency'):
+        graph.order()
@@ -0,0 +1,156 @@
+"""Tests stepping a model in tiles on worker processes (parallel.TiledModel)."""
+import pickle
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.base import Model
+from clearwater_modules.parallel import TiledModel
+from clearwater_modules.tsm.model import EnergyBudget
+from clearwater_modules.nsm1 import constants
+from clearwater_modules.nsm1.model import NutrientBudget
+from typing import Any
+
+
+@pytest.fixture(scope='module')
+def tsm_kwargs(tsm_kwargs) -> dict[str, Any]:
+    return {**tsm_kwargs, 'engine': 'numpy'}
+
+
+def assert_same_results(model, reference) -> None:
+    for var_name in reference.temporal_variables:
+        np.testing.assert_allclose(
+            model.dataset[var_name].values,
+            reference.dataset[var_name].values,
+            rtol=1e-12,
+            err_msg=var_name,
+        )
+
+
+def test_tiled_updates(make_tsm, varying_array) -> None:
+    """Checks updates between timesteps and forcing reach every tile."""
+    air_temp_c: list[xr.DataArray] = [
+        xr.full_like(varying_array, 10.0 + i) + varying_array for i in range(4)
+    ]
+    reference = make_tsm()
+    for value in air_temp_c[:2]:
+        reference.increment_timestep(update_state_values={'air_temp_c': value})
+    reference.run(forcing={'air_temp_c': np.stack(air_temp_c[2:])})
+
+    model = make_tsm()
+    with TiledModel(model, tiles=3) as tiled:
+        assert tiled.dim == 'x'
+        assert tiled.tiles == [slice(0, 4), slice(4, 8), slice(8, 12)]
+        for value in air_temp_c[:2]:
+            tiled.increment_timestep(update_state_values={'air_temp_c': value})
+        with pytest.raises(ValueError):
+            tiled.run(3)
+        tiled.run(forcing={'air_temp_c': np.stack(air_temp_c[2:])})
+    assert model.timestep == 4
+    assert_same_results(model, reference)
+
+
+def test_tiled_nsm1(initial_nsm1_state) -> None:
+    """Checks a specialized, ring buffered model gives the same results in tiles."""
+    models: list[NutrientBudget] = [
+        NutrientBudget(
+            time_steps=3,
+            initial_state_values=initial_nsm1_state.copy(),
+            global_parameters=dict(constants.DEFAULT_GLOBALPARAMETERS),
+            engine='numpy',
+            history_length=2,
+            prune_disabled_modules=True,
+        )
+        for _ in range(2)
+    ]
+    models[0].run()
+    with TiledModel(models[1], tiles=2, dim='y', mp_context='spawn') as tiled:
+        tiled.run()
+    assert_same_results(models[1], models[0])
+    np.testing.assert_array_equal(models[1].dataset['time_step'].values, [2, 3])
+
+
+@pytest.mark.parametrize('history_length', [None, 2])
+def test_tiled_rollback(make_tsm, monkeypatch, history_length) -> None:
+    """Checks every tile is reset to the last common timestep if a worker fails."""
+    reference = make_tsm(history_length=history_length)
+    reference.run()
+
+    advance_arrays = Model._advance_arrays
+    failed: list[bool] = []
+
+    def fail_once(self, update_arrays) -> None:
+        # only the last (4 rows) tile fails, once per worker process
+        if self._dataset.sizes['y'] == 4 and self.timestep == 1 and not failed:
+            failed.append(True)
+            raise FloatingPointError('failed step')
+        advance_arrays(self, update_arrays)
+
+    monkeypatch.setattr(Model, '_advance_arrays', fail_once)
+    model = make_tsm(history_length=history_length)
+    with TiledModel(model, tiles=3, dim='y', mp_context='fork') as tiled:
+        tiled.increment_timestep()
+        with pytest.raises(RuntimeError, match='FloatingPointError'):
+            tiled.run()
+        assert model.timestep == 1
+        tiled.run()
+    assert model.timestep == reference.timestep
+    assert_same_results(model, reference)
+
+
+def test_tiled_close(make_tsm) -> None:
+    """Checks the model can be stepped directly after closing the tiles."""
+    reference = make_tsm()
+    reference.run()
+    model = make_tsm()
+    tiled = TiledModel(model, tiles=2)
+    tiled.run(2)
+    tiled.close()
+    with pytest.raises(ValueError):
+        tiled.run(1)
+    model.run()
+    assert_same_results(model, reference)
+
+
+def test_tiled_close_mid_window(make_tsm) -> None:
+    """Checks closing between records keeps the carried values and aggregations."""
+    kwargs: dict[str, Any] = {
+        'time_steps': 6,
+        'output_interval': 2,
+        'output_aggregation': ['mean', 'max'],
+    }
+    reference = make_tsm(**kwargs)
+    reference.run()
+    model = make_tsm(**kwargs)
+    with TiledModel(model, tiles=2) as tiled:
+        tiled.run(3)
+    model.run()
+    assert model.timestep == reference.timestep
+    assert_same_results(model, reference)
+    for stat in ['mean', 'max']:
+        np.testing.assert_allclose(
+            model.dataset[f'water_temp_c_{stat}'].values,
+            reference.dataset[f'water_temp_c_{stat}'].values,
+            rtol=1e-12,
+        )
+
+
+def test_tiled_validation(make_tsm) -> None:
+    """Checks invalid tilings are rejected."""
+    model = make_tsm()
+    with pytest.raises(ValueError):
+        TiledModel(model, tiles=2, dim='time_step')
+    with pytest.raises(ValueError):
+        TiledModel(model, tiles=13)
+    with pytest.raises(ValueError):
+        TiledModel(make_tsm(time_steps=1, engine='xarray'), tiles=2)
+
+
+def test_model_pickle(make_tsm) -> None:
+    """Checks a stepped model round trips through pickle."""
+    model = make_tsm(fold_constants=True)
+    model.increment_timestep()
+    copy: EnergyBudget = pickle.loads(pickle.dumps(model))
+    assert copy._buffers is None
+    model.increment_timestep()
+    copy.increment_timestep()
+    assert_same_results(copy, model)
@@ -0,0 +1,84 @@
+"""Tests the 'dask' engine (lazy, blockwise computation on chunked arrays)."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.nsm1 import constants
+from clearwater_modules.nsm1.model import NutrientBudget
+
+da = pytest.importorskip('dask.array')
+
+
+def assert_same_results(dataset: xr.Dataset, reference) -> None:
+    for var_name in reference.temporal_variables:
+        np.testing.assert_allclose(
+            dataset[var_name].values,
+            reference.dataset[var_name].values,
+            rtol=1e-12,
+            err_msg=var_name,
+        )
+
+
+def test_dask_matches_eager(make_tsm, varying_array) -> None:
+    """Checks the lazy dataset computes the same results as the 'numpy' engine."""
+    air_temp_c: list[xr.DataArray] = [
+        xr.full_like(varying_array, 10.0 + i) + varying_array for i in range(4)
+    ]
+    forcing: dict[str, np.ndarray] = {'air_temp_c': np.stack(air_temp_c[2:])}
+    reference = make_tsm(engine='numpy')
+    model = make_tsm(engine='dask', chunks={'x': 5, 'y': 4})
+    for value in air_temp_c[:2]:
+        reference.increment_timestep(update_state_values={'air_temp_c': value})
+        model.increment_timestep(update_state_values={'air_temp_c': value})
+    reference.run(forcing=forcing)
+    dataset: xr.Dataset = model.run(forcing=forcing)
+
+    assert dataset is model.dataset
+    assert isinstance(dataset['water_temp_c'].data, da.Array)
+    assert dataset['water_temp_c'].data.chunks == ((1,) * 5, (4, 4, 2), (5, 5, 2))
+    assert dataset['water_temp_c'].dims == reference.dataset['water_temp_c'].dims
+    assert_same_results(dataset.compute(), reference)
+
+
+def test_dask_nsm1(initial_nsm1_state) -> None:
+    """Checks a specialized NSM1 model gives the same results as the 'numpy' engine."""
+    models: list[NutrientBudget] = [
+        NutrientBudget(
+            time_steps=3,
+            initial_state_values=initial_nsm1_state.copy(),
+            global_parameters=dict(constants.DEFAULT_GLOBALPARAMETERS),
+            engine=engine,
+            fold_constants=True,
+        )
+        for engine in ['numpy', 'dask']
+    ]
+    models[0].run()
+    assert_same_results(models[1].run().compute(), models[0])
+
+
+def test_dask_replaced_dataset(make_tsm) -> None:
+    """Checks a run continues from a dataset previously returned by the engine."""
+    reference = make_tsm(engine='numpy')
+    reference.run()
+    model = make_tsm(engine='dask', chunks={'x': 6})
+    model.run(2)
+    model.dataset = model.dataset
+    model.run()
+    assert_same_results(model.dataset.compute(), reference)
+
+
+def test_dask_to_zarr(make_tsm, tmp_path) -> None:
+    """Checks the lazy dataset can be written to disk chunk by chunk."""
+    pytest.importorskip('zarr')
+    reference = make_tsm(engine='numpy')
+    reference.run()
+    model = make_tsm(engine='dask', chunks={'x': 6})
+    model.run().to_zarr(tmp_path / 'tsm.zarr')
+    assert_same_results(xr.open_zarr(tmp_path / 'tsm.zarr').compute(), reference)
+
+
+def test_dask_validation(make_tsm) -> None:
+    """Checks options the 'dask' engine doesn't support are rejected."""
+    with pytest.raises(ValueError):
+        make_tsm(engine='numpy', chunks={'x': 5})
+    with pytest.raises(ValueError):
+        make_tsm(engine='dask', history_length=2)
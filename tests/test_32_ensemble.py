@@ -0,0 +1,92 @@
+"""Tests running an ensemble of parameter sets along a member dimension."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.tsm import constants as tsm_constants
+from clearwater_modules.tsm.model import EnergyBudget
+from clearwater_modules.nsm1 import constants
+from clearwater_modules.nsm1.model import NutrientBudget
+
+WIND_A: list[float] = [0.2, 0.3, 0.5]
+
+
+@pytest.mark.parametrize('engine', ['xarray', 'numpy', 'numba'])
+@pytest.mark.parametrize('varying_array', [(3, 4)], indirect=True)
+def test_ensemble_matches_members(make_tsm, engine) -> None:
+    """Checks each member gives the results of a model with its parameters."""
+    ensemble = make_tsm(
+        meteo_parameters={'wind_a': xr.DataArray(WIND_A, dims='member')},
+        engine=engine,
+    )
+    dataset: xr.Dataset = ensemble.run()
+    assert dataset['water_temp_c'].dims == ('time_step', 'member', 'y', 'x')
+    assert dataset['wind_a'].dims == ('member', 'y', 'x')
+    # other statics stay 0-d
+    assert dataset['wind_b'].dims == ()
+    assert tsm_constants.DEFAULT_METEOROLOGICAL['wind_a'] == 0.3
+
+    for i, wind_a in enumerate(WIND_A):
+        member = make_tsm(meteo_parameters={'wind_a': wind_a}, engine='numpy')
+        member.run()
+        for var_name in member.temporal_variables:
+            np.testing.assert_allclose(
+                dataset[var_name].isel(member=i).values,
+                member.dataset[var_name].values,
+                rtol=1e-12,
+                err_msg=var_name,
+            )
+
+
+def test_ensemble_scalar_states() -> None:
+    """Checks scalar initial states get a single cell per member."""
+    model = EnergyBudget(
+        time_steps=2,
+        initial_state_values={
+            'water_temp_c': 20.0,
+            'surface_area': 1.0,
+            'volume': 100.0,
+        },
+        meteo_parameters={
+            'wind_a': xr.DataArray(WIND_A, dims='run', coords={'run': ['a', 'b', 'c']}),
+        },
+        ensemble_dim='run',
+        engine='numpy',
+    )
+    dataset: xr.Dataset = model.run()
+    assert dict(dataset['water_temp_c'].sizes) == {'time_step': 3, 'run': 3, 'x': 1, 'y': 1}
+    assert list(dataset['run'].values) == ['a', 'b', 'c']
+    temperature: np.ndarray = dataset['water_temp_c'].isel(time_step=-1).values.ravel()
+    assert len(np.unique(temperature)) == 3
+
+
+@pytest.mark.parametrize('varying_array', [(3, 4)], indirect=True)
+def test_ensemble_nsm1(initial_nsm1_state) -> None:
+    """Checks NSM1 parameters can vary by member."""
+    kbod_20: list[float] = [0.06, 0.12, 0.24]
+    model = NutrientBudget(
+        time_steps=2,
+        initial_state_values=initial_nsm1_state.copy(),
+        CBOD_parameters={'kbod_20': xr.DataArray(kbod_20, dims='member')},
+        global_parameters=dict(constants.DEFAULT_GLOBALPARAMETERS),
+        engine='numpy',
+    )
+    dataset: xr.Dataset = model.run()
+    assert constants.DEFAULT_CBOD['kbod_20'] == 0.12
+    cbod: np.ndarray = dataset['CBOD'].isel(time_step=-1).values
+    # faster decay leaves less CBOD
+    assert (cbod[0] > cbod[1]).all() and (cbod[1] > cbod[2]).all()
+
+
+@pytest.mark.parametrize('varying_array', [(3, 4)], indirect=True)
+def test_ensemble_size_mismatch(varying_array) -> None:
+    """Checks values with different numbers of members are rejected."""
+    with pytest.raises(ValueError):
+        EnergyBudget(
+            time_steps=1,
+            initial_state_values={
+                'water_temp_c': (varying_array * 20.0).expand_dims(member=2),
+                'surface_area': varying_array,
+                'volume': varying_array * 100.0,
+            },
+            meteo_parameters={'wind_a': xr.DataArray(WIND_A, dims='member')},
+        )
@@ -0,0 +1,71 @@
+"""Tests computing only the active (i.e. wet) cells with Model.active_mask."""
+import pytest
+import numpy as np
+import xarray as xr
+from typing import Any
+
+
+@pytest.fixture(scope='module')
+def mask() -> xr.DataArray:
+    rng = np.random.default_rng(seed=7)
+    return xr.DataArray(rng.random((10, 12)) > 0.5, dims=['y', 'x'])
+
+
+@pytest.fixture(scope='module')
+def tsm_kwargs(tsm_kwargs) -> dict[str, Any]:
+    # the masks below cover the three timesteps
+    return {**tsm_kwargs, 'time_steps': 3}
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'numba'])
+def test_masked_cells(make_tsm, mask, engine) -> None:
+    """Checks active cells match an unmasked run, and inactive cells hold their state."""
+    reference = make_tsm(engine=engine)
+    reference.run()
+    model = make_tsm(engine=engine)
+    model.increment_timestep(active_mask=mask)
+    dataset: xr.Dataset = model.run()
+
+    active: np.ndarray = mask.values
+    for var_name in model.temporal_variables:
+        np.testing.assert_allclose(
+            dataset[var_name].values[:, active],
+            reference.dataset[var_name].values[:, active],
+            rtol=1e-12,
+            err_msg=var_name,
+        )
+    water_temp_c: np.ndarray = dataset['water_temp_c'].values[:, ~active]
+    np.testing.assert_array_equal(water_temp_c, water_temp_c[:1].repeat(4, axis=0))
+    assert np.isnan(dataset['q_net'].values[1:, ~active]).all()
+
+
+def test_time_varying_mask(make_tsm, mask) -> None:
+    """Checks a mask with a time dimension is set every timestep of a run."""
+    masks = xr.concat(
+        [mask, ~mask, xr.ones_like(mask)],
+        dim='time_step',
+    )
+    model = make_tsm(engine='numpy')
+    dataset: xr.Dataset = model.run(active_mask=masks)
+    q_net: np.ndarray = dataset['q_net'].values
+    assert np.isnan(q_net[1][~mask.values]).all()
+    assert np.isnan(q_net[2][mask.values]).all()
+    assert np.isfinite(q_net[3]).all()
+    # an all True mask computes every cell without compacting
+    assert model._active_index is None
+
+    model.active_mask = None
+    assert model.active_mask is None
+
+
+def test_mask_validation(make_tsm, mask) -> None:
+    """Checks invalid masks are rejected."""
+    model = make_tsm(engine='numpy')
+    with pytest.raises(ValueError):
+        model.active_mask = mask.transpose('x', 'y')
+    with pytest.raises(ValueError):
+        model.active_mask = mask.isel(x=slice(0, 5))
+    with pytest.raises(ValueError):
+        model.run(active_mask=mask.expand_dims(time_step=2))
+    with pytest.raises(ValueError):
+        make_tsm().active_mask = mask
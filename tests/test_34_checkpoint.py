@@ -0,0 +1,143 @@
+"""Tests writing model checkpoints and restoring models from them."""
+import json
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules import base
+from clearwater_modules.tsm.model import EnergyBudget
+from clearwater_modules.nsm1 import constants
+from clearwater_modules.nsm1.model import NutrientBudget
+
+
+@pytest.mark.parametrize('engine', ['xarray', 'numpy', 'numba'])
+def test_restart_matches_run(make_tsm, tmp_path, engine) -> None:
+    """Checks a run restarted from a checkpoint matches an uninterrupted run."""
+    reference = make_tsm(time_steps=5, engine='numpy')
+    reference.run()
+    model = make_tsm(time_steps=3, engine=engine)
+    model.run()
+    model.checkpoint(tmp_path / 'tsm')
+
+    restored: EnergyBudget = EnergyBudget.restore(
+        tmp_path / 'tsm',
+        time_steps=3,
+        engine=engine,
+    )
+    assert restored.updateable_static_variables == ['air_temp_c']
+    dataset: xr.Dataset = restored.run()
+    # dynamic variables are not checkpointed, the first record only holds states
+    np.testing.assert_array_equal(
+        dataset['water_temp_c'].isel(time_step=0).values,
+        model.dataset['water_temp_c'].isel(time_step=-1).values,
+    )
+    assert np.isnan(dataset['q_net'].isel(time_step=0).values).all()
+    for var_name in reference.temporal_variables:
+        np.testing.assert_allclose(
+            dataset[var_name].isel(time_step=slice(1, None)).values,
+            reference.dataset[var_name].isel(time_step=slice(4, None)).values,
+            rtol=1e-12,
+            err_msg=var_name,
+        )
+
+
+# time_steps of the restored model, to run the four timesteps left
+@pytest.mark.parametrize(
+    'engine, output_interval, history_length, time_steps',
+    [
+        ('numpy', 2, None, 4),
+        ('numba', 2, 2, 4),
+        ('xarray', 1, None, 5),
+        ('dask', 1, None, 4),
+    ],
+)
+def test_restore_continues_timesteps(
+    make_tsm,
+    tmp_path,
+    engine,
+    output_interval,
+    history_length,
+    time_steps,
+) -> None:
+    """Checks a model restored mid-run continues from the checkpointed timestep."""
+    if engine == 'dask':
+        pytest.importorskip('dask')
+    kwargs: dict = {
+        'engine': engine,
+        'output_interval': output_interval,
+        'history_length': history_length,
+    }
+    reference = make_tsm(time_steps=8, **kwargs)
+    reference.run()
+    model = make_tsm(time_steps=8, **kwargs)
+    model.run(4)
+    model.checkpoint(tmp_path / 'tsm')
+
+    restored: EnergyBudget = EnergyBudget.restore(
+        tmp_path / 'tsm',
+        time_steps=time_steps,
+        **kwargs,
+    )
+    assert restored.timestep == 4
+    restored.run()
+    assert restored.timestep == reference.timestep
+    dataset: xr.Dataset = restored.dataset
+    labels: np.ndarray = dataset['time_step'].values
+    assert labels[-1] == 8
+    assert labels[0] == (4 if history_length is None else 6)
+    for var_name in reference.state_variables_names:
+        np.testing.assert_allclose(
+            dataset[var_name].sel(time_step=labels[1:]).values,
+            reference.dataset[var_name].sel(time_step=labels[1:]).values,
+            rtol=1e-12,
+            err_msg=var_name,
+        )
+
+
+def test_restore_nsm1(initial_nsm1_state, tmp_path) -> None:
+    """Checks Model.restore() rebuilds the checkpointed class, from a ring buffered run."""
+    kwargs: dict = {
+        'global_parameters': dict(constants.DEFAULT_GLOBALPARAMETERS),
+        'engine': 'numpy',
+    }
+    reference = NutrientBudget(3, initial_nsm1_state.copy(), **kwargs)
+    reference.run()
+    model = NutrientBudget(2, initial_nsm1_state.copy(), history_length=1, **kwargs)
+    model.run()
+    model.checkpoint(tmp_path / 'nsm1')
+
+    restored = base.Model.restore(tmp_path / 'nsm1', time_steps=2, engine='numpy')
+    assert isinstance(restored, NutrientBudget)
+    restored.run()
+    assert restored.timestep == reference.timestep
+    for var_name in reference.state_variables_names:
+        np.testing.assert_allclose(
+            restored.dataset[var_name].isel(time_step=-1).values,
+            reference.dataset[var_name].isel(time_step=-1).values,
+            rtol=1e-12,
+            err_msg=var_name,
+        )
+
+
+def test_checkpoint_size(make_tsm, tmp_path) -> None:
+    """Checks checkpoints only hold the current timestep, not the history."""
+    sizes: list[int] = []
+    for time_steps in [1, 20]:
+        model = make_tsm(time_steps=time_steps, engine='numpy')
+        model.run()
+        path = model.checkpoint(tmp_path / f'tsm_{time_steps}')
+        sizes.append((path / 'arrays.bin').stat().st_size)
+    assert sizes[0] == sizes[1]
+
+
+def test_schema_mismatch(make_tsm, tmp_path) -> None:
+    """Checks checkpoints of a different variable schema are rejected."""
+    model = make_tsm(time_steps=1, engine='numpy')
+    path = model.checkpoint(tmp_path / 'tsm')
+    with pytest.raises(ValueError):
+        NutrientBudget.restore(path, time_steps=2)
+
+    manifest: dict = json.loads((path / 'manifest.json').read_text())
+    manifest['schema_hash'] = '0' * 64
+    (path / 'manifest.json').write_text(json.dumps(manifest))
+    with pytest.raises(ValueError):
+        EnergyBudget.restore(path, time_steps=2)
@@ -0,0 +1,66 @@
+"""Tests holding the model history in memory mapped files (Model.history_dir)."""
+import pytest
+import numpy as np
+import xarray as xr
+from clearwater_modules.tsm.model import EnergyBudget
+
+
+@pytest.mark.parametrize('engine', ['xarray', 'numpy', 'numba'])
+def test_memmap_history(make_tsm, tmp_path, engine) -> None:
+    """Checks the dataset wraps the history files, and they hold the results."""
+    reference = make_tsm(engine=engine)
+    reference.run()
+    model = make_tsm(engine=engine, history_dir=tmp_path)
+    dataset: xr.Dataset = model.run()
+    model.close()
+
+    assert sorted(path.stem for path in tmp_path.iterdir()) == sorted(model.temporal_variables)
+    for var_name in model.temporal_variables:
+        history: np.ndarray = np.load(tmp_path / f'{var_name}.npy', mmap_mode='r')
+        assert history.shape == dataset[var_name].shape
+        np.testing.assert_array_equal(history, dataset[var_name].values)
+        np.testing.assert_array_equal(history, reference.dataset[var_name].values)
+
+
+def test_memmap_ring_history(make_tsm, tmp_path) -> None:
+    """Checks ring buffered and aggregated histories are memory mapped too."""
+    model = make_tsm(
+        engine='numpy',
+        history_length=2,
+        output_aggregation=['max'],
+        history_dir=tmp_path,
+    )
+    model.run()
+    model.close()
+    history: np.ndarray = np.load(tmp_path / 'water_temp_c_max.npy', mmap_mode='r')
+    assert history.shape == (2, 10, 12)
+    np.testing.assert_array_equal(
+        history,
+        model._dataset['water_temp_c_max'].values,
+    )
+
+
+def test_memmap_hotstart(make_tsm, tmp_path) -> None:
+    """Checks a restored model can hold its history in memory mapped files."""
+    model = make_tsm(engine='numpy')
+    model.run(2)
+    model.checkpoint(tmp_path / 'checkpoint')
+    restored: EnergyBudget = EnergyBudget.restore(
+        tmp_path / 'checkpoint',
+        time_steps=3,
+        engine='numpy',
+        history_dir=tmp_path / 'history',
+    )
+    restored.run()
+    model.run()
+    np.testing.assert_array_equal(
+        np.load(tmp_path / 'history' / 'water_temp_c.npy'),
+        model.dataset['water_temp_c'].isel(time_step=slice(2, None)).values,
+    )
+
+
+def test_memmap_validation(make_tsm, tmp_path) -> None:
+    """Checks the 'dask' engine rejects memory mapped history."""
+    pytest.importorskip('dask')
+    with pytest.raises(ValueError):
+        make_tsm(engine='dask', history_dir=tmp_path)
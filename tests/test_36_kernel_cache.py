@@ -0,0 +1,55 @@
+"""Tests the on-disk cache of fused numba kernels (Model.kernel_cache)."""
+import pytest
+import numpy as np
+from clearwater_modules import kernels
+from typing import Any
+
+
+@pytest.fixture(scope='module')
+def tsm_kwargs(tsm_kwargs) -> dict[str, Any]:
+    return {**tsm_kwargs, 'engine': 'numba'}
+
+
+def test_cached_kernels(make_tsm, tmp_path, monkeypatch) -> None:
+    """Checks a cached configuration matches an uncached run, without probing processes."""
+    reference = make_tsm()
+    reference.run()
+    model = make_tsm(kernel_cache=tmp_path)
+    model.run()
+    assert isinstance(model.kernel_cache, kernels.KernelCache)
+    assert list(tmp_path.glob('l*.json')) and list(tmp_path.glob('k*.py'))
+
+    def probe(*args, **kwargs):
+        raise AssertionError('cached layouts should not be probed')
+
+    monkeypatch.setattr(kernels, 'compile_scalar_process', probe)
+    cached = make_tsm(kernel_cache=tmp_path)
+    cached.run()
+    for var_name in reference.temporal_variables:
+        np.testing.assert_array_equal(
+            cached.dataset[var_name].values,
+            reference.dataset[var_name].values,
+            err_msg=var_name,
+        )
+
+    # a different configuration misses the cache
+    with pytest.raises(AssertionError):
+        make_tsm(kernel_cache=tmp_path, dtype=np.float32).run()
+
+
+def test_cache_eviction(make_tsm, tmp_path) -> None:
+    """Checks the cache is kept under its size limit."""
+    cache = kernels.KernelCache(tmp_path, max_bytes=50_000)
+    make_tsm(kernel_cache=cache).run()
+    # entries in use are only evicted by later writes
+    cache.evict()
+    assert 0 < cache.size() <= 50_000
+    cache.max_bytes = 0
+    cache.evict()
+    assert cache.size() == 0
+
+
+def test_cache_validation(make_tsm, tmp_path) -> None:
+    """Checks the kernel cache requires the 'numba' engine."""
+    with pytest.raises(ValueError):
+        make_tsm(time_steps=1, engine='numpy', kernel_cache=tmp_path)
@@ -0,0 +1,77 @@
+"""Tests the per-process profiling of model timesteps (Model.profiler)."""
+import json
+import pytest
+import numpy as np
+from clearwater_modules import profiling
+
+
+@pytest.mark.parametrize('engine', ['xarray', 'numpy', 'numba'])
+def test_profiled_run(make_tsm, engine) -> None:
+    """Checks every process is recorded each timestep, without changing results."""
+    reference = make_tsm(engine=engine)
+    reference.run()
+    model = make_tsm(engine=engine, profile=True)
+    model.run()
+    model.close()
+    for var_name in model.temporal_variables:
+        # unfused numba processes may differ from fused kernels in the last digit
+        np.testing.assert_allclose(
+            model.dataset[var_name].values,
+            reference.dataset[var_name].values,
+            rtol=1e-12,
+            err_msg=var_name,
+        )
+
+    stats: dict[str, profiling.ProcessStats] = model.profiler.stats
+    for name, _, _ in model._process_args:
+        assert stats[name].calls == model.timestep
+    for name, _, _ in model._hoisted_args:
+        assert stats[name].calls == 1
+    assert stats['q_net'].seconds > 0.0
+    # a 10x12 float64 result at least
+    assert stats['q_net'].bytes_allocated >= model.timestep * 960
+
+    table = model.profiler.table()
+    assert list(table.columns) == [
+        'calls', 'seconds', 'mean_ms', 'percent', 'bytes_allocated', 'nan_count',
+    ]
+    assert (np.diff(table['seconds'].values) <= 0.0).all()
+    assert table['percent'].sum() == pytest.approx(100.0)
+
+
+def test_nan_count() -> None:
+    """Checks NaN outputs are counted, and bytes aren't measured without track_memory."""
+    profiler = profiling.ProcessProfiler(track_memory=False)
+    process = profiler.wrap('ratio', lambda a, b: a / b)
+    with np.errstate(invalid='ignore'):
+        process(np.array([0.0, 1.0, 0.0]), np.array([0.0, 1.0, 0.0]))
+    process(1.0, 2.0)
+    assert profiler.stats['ratio'] == profiling.ProcessStats(
+        calls=2,
+        seconds=profiler.stats['ratio'].seconds,
+        bytes_allocated=0,
+        nan_count=2,
+    )
+
+
+def test_write_trace(make_tsm, tmp_path) -> None:
+    """Checks the Chrome trace export holds an event per call, up to max_events."""
+    profiler = profiling.ProcessProfiler(max_events=10)
+    model = make_tsm(engine='numpy', profile=profiler)
+    assert model.profiler is profiler
+    model.run()
+    model.close()
+    trace: dict = json.loads(profiler.write_trace(tmp_path / 'trace.json').read_text())
+    assert len(trace['traceEvents']) == 10
+    assert {event['ph'] for event in trace['traceEvents']} == {'X'}
+    assert trace['processes']['q_net']['calls'] == model.timestep
+
+    profiler.reset()
+    assert profiler.stats == {} and profiler.events == []
+
+
+def test_profile_validation(make_tsm) -> None:
+    """Checks the 'dask' engine rejects profiling."""
+    pytest.importorskip('dask')
+    with pytest.raises(ValueError):
+        make_tsm(engine='dask', profile=True)
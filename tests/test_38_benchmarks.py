@@ -0,0 +1,125 @@
+"""Tests the benchmark suite and its command line interface."""
+import json
+import pytest
+from clearwater_modules.benchmarks import cli
+from clearwater_modules.benchmarks import suite
+
+
+@pytest.fixture(scope='module')
+def results() -> list[suite.BenchmarkResult]:
+    cases: list[suite.BenchmarkCase] = suite.make_cases(
+        gridsizes=[3],
+        steps=[2],
+        engines=['numpy'],
+    )
+    return suite.run_suite(cases, isolate=False)
+
+
+def test_run_suite(results) -> None:
+    """Checks every combination is timed, and reports its throughput."""
+    assert [result.case.key for result in results] == [
+        'tsm-3x3-2-numpy-untracked',
+        'tsm-3x3-2-numpy-tracked',
+        'nsm1-3x3-2-numpy-untracked',
+        'nsm1-3x3-2-numpy-tracked',
+    ]
+    for result in results:
+        assert result.seconds > 0.0
+        assert result.cell_steps_per_second == pytest.approx(9 * result.steps_per_second)
+        assert result.peak_rss_bytes is None or result.peak_rss_bytes > 0
+
+    with pytest.raises(ValueError):
+        suite.make_cases(models=['gsm'])
+
+
+def test_isolated_case() -> None:
+    """Checks cases can run in a fresh process."""
+    case = suite.BenchmarkCase('tsm', 2, 1, 'numpy', False)
+    results: list[suite.BenchmarkResult] = suite.run_suite([case])
+    assert results[0].case == case
+
+
+def test_dask_case_computes(monkeypatch) -> None:
+    """Checks the lazy 'dask' engine is computed within the timed steps."""
+    pytest.importorskip('dask')
+    computed: list[int] = []
+
+    def compute(model) -> None:
+        computed.append(model.timestep)
+        model.dataset.compute()
+
+    monkeypatch.setattr(suite, 'compute', compute)
+    suite.run_case(suite.BenchmarkCase('tsm', 2, 2, 'dask', False))
+    assert computed == [1, 3]
+
+
+def test_results_round_trip(results, tmp_path) -> None:
+    """Checks results written to JSON read back equal."""
+    path = suite.write_results(results, tmp_path / 'results.json')
+    assert suite.read_results(path) == results
+    data: dict = json.loads(path.read_text())
+    assert 'python' in data['machine']
+    assert set(data['results'][0]) >= {
+        'steps_per_second', 'cell_steps_per_second', 'peak_rss_bytes',
+    }
+
+
+def test_compare(results) -> None:
+    """Checks cases slower than the baseline beyond the tolerance regress."""
+    baseline: list[suite.BenchmarkResult] = [
+        suite.BenchmarkResult(
+            result.case,
+            result.init_seconds,
+            result.warmup_seconds,
+            # twice as fast for the first case, slightly faster for the others
+            result.seconds / (2.0 if i == 0 else 1.1),
+            result.peak_rss_bytes,
+        )
+        for i, result in enumerate(results)
+    ]
+    comparison = suite.compare(results, baseline[:-1], tolerance=0.25)
+    assert list(comparison.index) == [result.case.key for result in results[:-1]]
+    assert list(comparison['regressed']) == [True, False, False]
+    assert comparison['change'].iloc[0] == pytest.approx(-0.5)
+
+
+def test_cli_baseline(tmp_path, capsys) -> None:
+    """Checks the command fails when a case regressed from the baseline."""
+    args: list[str] = [
+        '--models', 'tsm',
+        '--gridsizes', '2',
+        '--steps', '2',
+        '--engines', 'numpy',
+        '--track-dynamic-variables', 'false',
+        '--no-isolate',
+    ]
+    assert cli.main(args + ['--output', str(tmp_path / 'baseline.json')]) == 0
+    baseline: dict = json.loads((tmp_path / 'baseline.json').read_text())
+    baseline['results'][0]['seconds'] /= 100.0
+    (tmp_path / 'baseline.json').write_text(json.dumps(baseline))
+
+    assert cli.main(
+        args + [
+            '--output', str(tmp_path / 'results.json'),
+            '--baseline', str(tmp_path / 'baseline.json'),
+        ]
+    ) == 1
+    assert 'tsm-2x2-2-numpy-untracked' in capsys.readouterr().out.splitlines()[-1]
+
+
+def test_threaded_cases() -> None:
+    """Checks threads only multiply the cases of the threaded engines."""
+    cases: list[suite.BenchmarkCase] = suite.make_cases(
+        models=['tsm'],
+        gridsizes=[2],
+        steps=[1],
+        engines=['numpy', 'numba'],
+        track_dynamic_variables=[False],
+        threads=[1, 2],
+    )
+    assert [(case.engine, case.threads) for case in cases] == [
+        ('numpy', 1), ('numpy', 2), ('numba', None),
+    ]
+    assert cases[1].key == 'tsm-2x2-1-numpy-untracked-2threads'
+    result: suite.BenchmarkResult = suite.run_case(cases[1])
+    assert suite.BenchmarkResult.from_dict(result.to_dict()) == result
@@ -0,0 +1,96 @@
+"""Tests the memory report and the max_memory budget of models."""
+import pytest
+import numpy as np
+from clearwater_modules import base
+from typing import Any
+
+# float64 bytes of a 10x12 grid
+RECORD: int = 960
+
+
+@pytest.fixture(scope='module')
+def tsm_kwargs(tsm_kwargs) -> dict[str, Any]:
+    return {**tsm_kwargs, 'time_steps': 20}
+
+
+def test_memory_report(make_tsm) -> None:
+    """Checks the report breaks down the dataset and engine buffers."""
+    model = make_tsm(engine='numpy')
+    report = model.memory_report()
+    assert list(report.index.get_level_values('category').unique()) == list(
+        base.MEMORY_CATEGORIES
+    )
+    assert report.loc[('state_history', 'water_temp_c'), 'bytes'] == 21 * RECORD
+    assert report.loc[('dynamic_history', 'q_net'), 'bytes'] == 21 * RECORD
+    assert report.loc[('statics', 'wind_a'), 'bytes'] == 8
+    assert report.loc['scratch', 'projected'].all()
+    # the projection matches the history allocated
+    projected: dict[str, int] = model._projected_memory(21)
+    totals = report['bytes'].groupby('category').sum()
+    for category in ['state_history', 'dynamic_history']:
+        assert totals[category] == projected[category]
+
+    model.run(1)
+    report = model.memory_report()
+    assert not report['projected'].any()
+    assert report.loc[('scratch', 'water_temp_c'), 'bytes'] == RECORD
+    # static buffers are the dataset arrays
+    assert 'wind_a' not in report.loc['scratch'].index
+
+
+def test_memory_report_memmap(make_tsm, tmp_path) -> None:
+    """Checks memory mapped history is reported as not in memory."""
+    model = make_tsm(engine='numpy', history_dir=tmp_path)
+    report = model.memory_report()
+    assert not report.loc['state_history', 'in_memory'].any()
+    assert report.loc['statics', 'in_memory'].all()
+    # memory mapped history doesn't count towards the budget
+    make_tsm(
+        engine='numpy',
+        history_dir=tmp_path / 'budget',
+        max_memory=report.loc[report['in_memory'], 'bytes'].sum() + 10 * RECORD,
+    )
+
+
+def test_max_memory_raise(make_tsm) -> None:
+    """Checks a model that doesn't fit the budget is refused."""
+    size: int = make_tsm(engine='numpy').memory_report()['bytes'].sum()
+    make_tsm(engine='numpy', max_memory=size)
+    with pytest.raises(MemoryError):
+        make_tsm(engine='numpy', max_memory=size // 2)
+    with pytest.raises(ValueError):
+        make_tsm(max_memory=size, memory_fallback='stream')
+    with pytest.raises(ValueError):
+        make_tsm(engine='numpy', memory_fallback='spill')
+
+
+@pytest.mark.parametrize('fallback', ['stream', 'decimate'])
+def test_max_memory_fallback(make_tsm, fallback) -> None:
+    """Checks the history is reduced to fit the budget, and the run still completes."""
+    reference = make_tsm(engine='numpy')
+    reference.run()
+    size: int = reference.memory_report()['bytes'].sum()
+    with pytest.warns(UserWarning):
+        model = make_tsm(
+            engine='numpy',
+            max_memory=size // 3,
+            memory_fallback=fallback,
+        )
+    assert model.memory_report()['bytes'].sum() <= size // 3
+    model.run()
+    n_records: int = model.dataset.sizes['time_step']
+    assert 1 < n_records < 21
+    if fallback == 'stream':
+        assert model.history_length == n_records
+    else:
+        assert 20 // model.output_interval + 1 == n_records
+        # the interval divides the timesteps, so the last one is recorded
+        assert 20 % model.output_interval == 0
+        assert model.dataset['time_step'][-1].item() == 20
+    np.testing.assert_allclose(
+        model.dataset['water_temp_c'].isel(time_step=-1).values,
+        reference.dataset['water_temp_c'].sel(
+            time_step=model.dataset['time_step'][-1].item()
+        ).values,
+        rtol=1e-12,
+    )
@@ -146,8 +146,8 @@ def test_static_array(
             assert len(model.dataset[var.name].dims) == 3
             assert model.dataset[var.name].shape == (time_steps + 1, 10, 10)
         else:
-            assert len(model.dataset[var.name].dims) == 2
-            assert model.dataset[var.name].shape == (10, 10)
+            assert len(model.dataset[var.name].dims) == 0
+            assert model.dataset[var.name].shape == ()
 
 
 def test_state_array(
@@ -196,8 +196,8 @@ def test_computation_no_dynamics(model: Model) -> None:
 
 def test_static_variable_dims(model: Model) -> None:
     """
-    Test that static variables remain 2-dimensional after increment_timestep() 
-    unless specified as updateable.
+    Test that uniform static variables remain 0-dimensional after
+    increment_timestep() unless specified as updateable.
     """
     ds = model.increment_timestep()
     for var_name in model.static_variables_names:
@@ -205,7 +205,7 @@ def test_static_variable_dims(model: Model) -> None:
         if var_name in model.updateable_static_variables:
             assert len(ds[var_name].dims) == 3
         else:
-            assert len(ds[var_name].dims) == 2
+            assert len(ds[var_name].dims) == 0
 
 
 def test_variable_attributes(model: Model) -> None: